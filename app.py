@@ -3,7 +3,7 @@
 import os
 import logging
 from datetime import timedelta
-from flask import Flask, request, render_template, send_from_directory # Keep render_template for error handlers
+from flask import Flask, request, render_template # Keep render_template for error handlers
 from dotenv import load_dotenv
 
 # Load environment variables first
@@ -29,6 +29,10 @@ app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-producti
 app.config['SESSION_PERMANENT'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7) # Example: 1 week
 
+# Optional server-side sessions (SESSION_BACKEND=sqlite|filesystem, see utils/session_store.py)
+from utils.session_store import init_session_store
+init_session_store(app)
+
 # --- Import and Register Blueprints ---
 # Imports must come *after* app = Flask(...) if blueprints need 'app',
 # but here they only need helpers/decorators from utils.
@@ -44,14 +48,42 @@ app.register_blueprint(admin_bp) # url_prefix='/admin' is set in routes/admin.py
 app.register_blueprint(api_bp)   # url_prefix='/api' is set in routes/api.py
 app.register_blueprint(public_bp) # Public access routes
 
+# --- Request Timing (before compression, so it is included in the total) ---
+from utils.request_timing import init_request_timing
+init_request_timing(app)
+
+# --- Response Compression ---
+from utils.compression import init_compression
+init_compression(app)
+
+# --- Fingerprinted Static Assets ---
+from utils.static_assets import init_static_assets
+static_assets = init_static_assets(app)
+
+# --- CSS/JS Bundles ---
+from utils.asset_bundles import init_asset_bundles
+init_asset_bundles(app)
+
+# --- Template Bytecode & Fragment Caching ---
+from utils.template_cache import init_template_cache
+init_template_cache(app)
+
+# --- Metrics (/metrics, Prometheus text format) ---
+from utils.metrics import init_metrics
+init_metrics(app)
+
+# --- Admin request profiling (?_profile=cprofile|sample) ---
+from utils.profiler import init_profiler
+init_profiler(app)
+
 
 # --- Global Routes (Static files, Error Handlers) ---
 
 # Static files route (kept global)
 @app.route('/static/<path:path>')
 def serve_static(path):
-    # Use Flask's built-in static handling if possible, otherwise use this
-    return send_from_directory('static', path)
+    # Fingerprinted URLs get immutable cache headers (see utils/static_assets.py)
+    return static_assets.send(path)
 
 # Error handlers (kept global)
 @app.errorhandler(404)
@@ -2,17 +2,19 @@
 import os
 import json
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 
 from utils.decorators import admin_required
 from utils.helpers import (
     get_projects, get_project, save_project, get_project_calendar, 
     save_project_calendar, generate_calendar, DATA_DIR, logger, 
     recalculate_shoot_days, save_project_workspace, get_project_workspace,
-    update_day_from_form
+    update_day_from_form, get_project_dir
 )
 from utils.calendar_generator import calculate_department_counts, calculate_location_counts
 from utils.access_manager import ProjectAccessManager
+from utils.template_cache import reference_data_version, revision_of
+from utils.streaming import render_streamed
 
 # Define Blueprint: Set url_prefix and template_folder
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin', template_folder='../templates/admin')
@@ -111,6 +113,11 @@ def admin_calendar(project_id):
             except Exception as e:
                 logger.error(f"Failed to save updated project with isVersioned: {str(e)}")
 
+        # Fragment cache keys, taken before loading so cached markup is never older than its key
+        project_dir = get_project_dir(project_id, user_id)
+        calendar_revision = revision_of(os.path.join(project_dir, name) for name in ('main.json', 'workspace.json', 'calendar.json'))
+        reference_version = reference_data_version()
+
         calendar_data = get_project_calendar(project_id, user_id)
 
         # --- Load supporting data ---
@@ -163,7 +170,8 @@ def admin_calendar(project_id):
             logger.error(f"Error calculating counts: {str(e)}")
 
         # Renders 'admin/calendar.html' - Corrected template path!
-        return render_template('admin/calendar.html', project=project, calendar=calendar_data, locations=locations)
+        return render_streamed('admin/calendar.html', project=project, calendar=calendar_data, locations=locations,
+                               calendar_revision=calendar_revision, reference_version=reference_version)
     
     except Exception as e:
         logger.error(f"Error in admin_calendar for project {project_id}: {str(e)}")
@@ -264,7 +272,7 @@ def admin_day(project_id, date):
             
             # Calculate sun times for days with locations
             from utils.calendar_generator import calculate_sun_times_for_calendar
-            calendar_data = calculate_sun_times_for_calendar(calendar_data)
+            calendar_data = calculate_sun_times_for_calendar(calendar_data, include_enhanced=True)
 
             # Save the calendar
             if project.get('isVersioned'):
@@ -6,8 +6,14 @@ import shutil
 from flask import Blueprint, jsonify, request, session # <-- Ensure this line is correct
 
 from utils.decorators import admin_required # Absolute import
-from utils.helpers import get_projects, get_project, save_project, get_project_calendar, save_project_calendar, generate_calendar, DATA_DIR, PROJECTS_DIR, logger, update_all_projects_department_counts, recalculate_shoot_days, get_project_versions, create_project_version, publish_project_version, get_project_workspace, save_project_workspace, migrate_project_to_versioned_structure # Absolute import
-from utils.geocoding import geocode_address, get_popular_film_locations # Absolute import
+from utils.helpers import get_projects, get_project, save_project, get_project_calendar, save_project_calendar, generate_calendar, DATA_DIR, PROJECTS_DIR, logger, update_all_projects_department_counts, recalculate_shoot_days, get_project_versions, create_project_version, publish_project_version, get_project_workspace, save_project_workspace, migrate_project_to_versioned_structure, get_project_dir # Absolute import
+from utils.geocoding import RateLimitExceeded, geocode_address, autocomplete_location, get_popular_film_locations, get_cache_stats, clear_geocoding_cache # Absolute import
+from utils.bulk_geocoding import start_bulk_geocoding_job, get_bulk_geocoding_job, locations_lock # Absolute import
+from utils.http_cache import conditional_response, file_signature, last_modified_of, make_etag # Absolute import
+from utils.calendar_ranges import parse_range_args, slice_calendar, calendar_summary # Absolute import
+from utils.calendar_generator import calculate_department_counts, calculate_location_counts # Absolute import
+from utils.file_utils import save_json_file_atomic
+from utils.login_throttle import retry_after_header
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -68,23 +74,51 @@ def api_project(project_id):
              return jsonify({'error': str(e)}), 500
 
 # --- Calendar API Routes ---
+def _load_working_calendar(project_id, user_id):
+    """Workspace calendar for versioned projects, otherwise calendar.json"""
+    project = get_project(project_id, user_id)
+    if project and project.get('isVersioned'):
+        workspace = get_project_workspace(project_id, user_id)
+        if workspace:
+            return workspace.get('calendarData', {"days": []})
+    
+    # Fallback to existing behavior
+    return get_project_calendar(project_id, user_id)
+
+def _calendar_dependencies(project_id, user_id):
+    # Workspace saves rewrite workspace.json, so its mtime stands in for lastModified
+    project_dir = get_project_dir(project_id, user_id)
+    return [os.path.join(project_dir, name) for name in ('main.json', 'workspace.json', 'calendar.json')]
+
 @api_bp.route('/projects/<project_id>/calendar', methods=['GET', 'POST'])
 @admin_required
 def api_project_calendar(project_id):
-    """Get or update project calendar"""
+    """Get or update project calendar
+
+    GET accepts ?month=YYYY-MM or ?from=YYYY-MM-DD&to=YYYY-MM-DD to return only
+    those days (plus 'range' and 'months' for paging); without them the whole
+    calendar is returned as before.
+    """
     if request.method == 'GET':
-        # Check if project is versioned
         from flask import session
         user_id = session.get('user_id')
-        project = get_project(project_id, user_id)
-        if project and project.get('isVersioned'):
-            workspace = get_project_workspace(project_id, user_id)
-            if workspace:
-                return jsonify(workspace.get('calendarData', {"days": []}))
         
-        # Fallback to existing behavior
-        calendar_data = get_project_calendar(project_id, user_id)
-        return jsonify(calendar_data)
+        try:
+            date_from, date_to = parse_range_args(request.args)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid date range: {e}'}), 400
+        ranged = bool(date_from or date_to)
+        
+        dependencies = _calendar_dependencies(project_id, user_id)
+        etag = make_etag('calendar', project_id, user_id, date_from, date_to, file_signature(dependencies))
+        
+        def build():
+            calendar_data = _load_working_calendar(project_id, user_id)
+            if ranged:
+                calendar_data = slice_calendar(calendar_data or {"days": []}, date_from, date_to)
+            return jsonify(calendar_data)
+        
+        return conditional_response(etag, build, last_modified=last_modified_of(dependencies))
     elif request.method == 'POST':
         try:
             calendar_data = request.get_json()
@@ -108,6 +142,24 @@ def api_project_calendar(project_id):
             logger.error(f"Error saving calendar for {project_id}: {e}")
             return jsonify({'error': str(e)}), 500
 
+@api_bp.route('/projects/<project_id>/calendar/summary', methods=['GET'])
+@admin_required
+def api_calendar_summary(project_id):
+    """Counters, day-type totals and month list for a calendar, without its days"""
+    user_id = session.get('user_id')
+    dependencies = _calendar_dependencies(project_id, user_id)
+    # Counts depend on the department/location/area definitions too
+    dependencies += [os.path.join(DATA_DIR, name) for name in ('departments.json', 'locations.json', 'areas.json')]
+    etag = make_etag('calendar-summary', project_id, user_id, file_signature(dependencies))
+    
+    def build():
+        calendar_data = _load_working_calendar(project_id, user_id) or {"days": []}
+        calendar_data = calculate_department_counts(calendar_data)
+        calendar_data = calculate_location_counts(calendar_data)
+        return jsonify(calendar_summary(calendar_data))
+    
+    return conditional_response(etag, build, last_modified=last_modified_of(dependencies))
+
 @api_bp.route('/projects/<project_id>/calendar/generate', methods=['POST'])
 @admin_required
 def api_generate_calendar(project_id):
@@ -228,7 +280,7 @@ def api_move_calendar_day(project_id):
         
         # Recalculate sun times for all days (handles moved days with new dates)
         from utils.calendar_generator import calculate_sun_times_for_calendar
-        calendar_data = calculate_sun_times_for_calendar(calendar_data)
+        calendar_data = calculate_sun_times_for_calendar(calendar_data, include_enhanced=True)
         
         save_project_calendar(project_id, calendar_data, user_id)
 
@@ -331,11 +383,14 @@ def api_locations():
             # Normalize the location data
             location_data = normalize_location_data(location_data)
 
-            locations = []
-            if os.path.exists(locations_file):
-                 with open(locations_file, 'r') as f: locations = json.load(f)
-            locations.append(location_data)
-            with open(locations_file, 'w') as f: json.dump(locations, f, indent=2)
+            # Same lock as the bulk geocoding write-back, so neither loses the other's changes
+            with locations_lock:
+                locations = []
+                if os.path.exists(locations_file):
+                     with open(locations_file, 'r') as f: locations = json.load(f)
+                locations.append(location_data)
+                if not save_json_file_atomic(locations_file, locations):
+                    return jsonify({'error': 'Could not save location'}), 500
             return jsonify(location_data), 201
         except Exception as e:
              logger.error(f"API Error creating location: {e}")
@@ -346,6 +401,12 @@ def api_locations():
 @admin_required
 def api_location(location_id):
     """Get, update or delete a location"""
+    # Same lock as the bulk geocoding write-back, so neither loses the other's changes
+    with locations_lock:
+        return _api_location_locked(location_id)
+
+def _api_location_locked(location_id):
+    """api_location body; the caller holds locations_lock"""
     locations_file = os.path.join(DATA_DIR, 'locations.json')
     if not os.path.exists(locations_file): return jsonify({'error': 'Locations file not found'}), 404
     try:
@@ -376,7 +437,8 @@ def api_location(location_id):
             location_data = normalize_location_data(location_data)
             
             locations[location_index] = location_data
-            with open(locations_file, 'w') as f: json.dump(locations, f, indent=2)
+            if not save_json_file_atomic(locations_file, locations):
+                return jsonify({'error': 'Could not save location'}), 500
             return jsonify(location_data)
         except Exception as e:
              logger.error(f"API Error updating location {location_id}: {e}")
@@ -384,7 +446,8 @@ def api_location(location_id):
     elif request.method == 'DELETE':
         try:
             del locations[location_index]
-            with open(locations_file, 'w') as f: json.dump(locations, f, indent=2)
+            if not save_json_file_atomic(locations_file, locations):
+                return jsonify({'error': 'Could not save locations'}), 500
             return jsonify({'success': True})
         except Exception as e:
              logger.error(f"API Error deleting location {location_id}: {e}")
@@ -403,30 +466,59 @@ def api_geocode():
         
         limit = int(request.args.get('limit', 5))
         
-        # Geocode the query
-        results = geocode_address(query, limit)
+        # Autocomplete mode answers from the offline gazetteer without touching the network
+        autocomplete = request.args.get('autocomplete', '').lower() in ('1', 'true', 'yes')
+        if autocomplete:
+            results = autocomplete_location(query, limit)
+        else:
+            # Geocode the query
+            results = geocode_address(query, limit)
         
         # Convert to JSON-serializable format
-        response_data = []
-        for result in results:
-            response_data.append({
-                'display_name': result.display_name,
-                'latitude': result.latitude,
-                'longitude': result.longitude,
-                'city': result.city,
-                'country': result.country,
-                'formatted_address': result.formatted_address
-            })
+        response_data = [result.to_dict() for result in results]
         
         return jsonify({
             'query': query,
+            'source': 'gazetteer' if autocomplete else 'geocoder',
             'results': response_data
         })
         
+    except RateLimitExceeded as e:
+        # Nominatim is busy and the gazetteer had nothing; the client can retry shortly
+        response = jsonify({'error': 'Geocoding service is busy, please try again shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = retry_after_header(e.retry_after)
+        return response
     except Exception as e:
         logger.error(f"Geocoding API error: {e}")
         return jsonify({'error': 'Geocoding service temporarily unavailable'}), 500
 
+@api_bp.route('/geocode/cache', methods=['GET', 'DELETE'])
+@admin_required
+def api_geocode_cache():
+    """Inspect or clear the persistent geocoding cache"""
+    if request.method == 'DELETE':
+        clear_geocoding_cache()
+        return jsonify({'success': True})
+    return jsonify(get_cache_stats())
+
+@api_bp.route('/locations/geocode-missing', methods=['POST'])
+@admin_required
+def api_geocode_missing_locations():
+    """Start a background job that geocodes every location without coordinates"""
+    dry_run = bool((request.get_json(silent=True) or {}).get('dryRun'))
+    job = start_bulk_geocoding_job(dry_run=dry_run)
+    return jsonify(job.to_dict()), 202
+
+@api_bp.route('/locations/geocode-missing/<job_id>', methods=['GET'])
+@admin_required
+def api_geocode_missing_locations_status(job_id):
+    """Progress and report for a bulk geocoding job"""
+    job = get_bulk_geocoding_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
 @api_bp.route('/popular-locations', methods=['GET'])
 @admin_required
 def api_popular_locations():
@@ -886,13 +978,20 @@ def api_project_version(project_id, version_id):
     try:
         from flask import session
         user_id = session.get('user_id')
-        versions = get_project_versions(project_id, user_id)
-        version = next((v for v in versions if v['id'] == version_id), None)
-        
-        if not version:
-            return jsonify({'error': 'Version not found'}), 404
-            
-        return jsonify(version)
+        # Validated against versions.json itself, so a 304 skips reading and parsing it.
+        # isLatestPublished and publishedAt change when other versions are published,
+        # which rewrites the file, so clients revalidate rather than cache for good
+        versions_file = os.path.join(get_project_dir(project_id, user_id), 'versions.json')
+        etag = make_etag('version', project_id, version_id, user_id, file_signature([versions_file]))
+
+        def build():
+            versions = get_project_versions(project_id, user_id)
+            version = next((v for v in versions if v['id'] == version_id), None)
+            if not version:
+                return jsonify({'error': 'Version not found'}), 404
+            return jsonify(version)
+
+        return conditional_response(etag, build, last_modified=last_modified_of([versions_file]))
     except Exception as e:
         logger.error(f"Error getting version {version_id} for project {project_id}: {str(e)}")
         return jsonify({'error': str(e)}), 500
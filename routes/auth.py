@@ -1,10 +1,11 @@
 # routes/auth.py
 import os
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, make_response
 from utils.user_helpers import (
     authenticate_user, create_user, validate_password_strength, 
     initialize_user_system, get_user_by_id
 )
+from utils.login_throttle import get_login_throttle, client_ip, retry_after_header
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -31,10 +32,19 @@ def login():
         if not username_or_email or not password:
             error = 'Please enter both username/email and password'
         else:
-            # Try to authenticate user
-            user_data, auth_error = authenticate_user(username_or_email, password)
+            throttle = get_login_throttle()
+            # Hashing is capped so logins can't starve other requests; the slot is
+            # taken first so a busy server doesn't spend the user's attempts
+            with throttle.hashing_slot() as acquired:
+                if not acquired:
+                    return _server_busy('login.html', throttle.hash_wait_seconds, next=next_page)
+                retry_after = throttle.check(client_ip(), username_or_email)
+                if retry_after:
+                    return _too_many_attempts(retry_after, next_page)
+                user_data, auth_error = authenticate_user(username_or_email, password)
             
             if user_data:
+                throttle.record_success(username_or_email)
                 # Set session data
                 session['user_id'] = user_data['id']
                 session['user_role'] = user_data.get('role', 'admin')
@@ -49,10 +59,25 @@ def login():
                 else:
                     return redirect(next_page or url_for('main.dashboard'))
             else:
+                throttle.record_failure(username_or_email)
                 error = auth_error or 'Invalid credentials'
 
     return render_template('login.html', error=error, next=next_page)
 
+def _too_many_attempts(retry_after, next_page):
+    """429 login page with a Retry-After header"""
+    error = 'Too many login attempts. Please wait a moment and try again.'
+    response = make_response(render_template('login.html', error=error, next=next_page), 429)
+    response.headers['Retry-After'] = retry_after_header(retry_after)
+    return response
+
+def _server_busy(template, retry_after, **context):
+    """429 page for when every password-hashing slot stayed busy"""
+    error = 'The server is busy. Please wait a moment and try again.'
+    response = make_response(render_template(template, error=error, **context), 429)
+    response.headers['Retry-After'] = retry_after_header(retry_after)
+    return response
+
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
     """User registration page"""
@@ -79,8 +104,13 @@ def register():
                 error = password_error
         
         if not error:
-            # Try to create user
-            user_data, create_error = create_user(username, email, password, role='admin')
+            # Try to create user; hashing the new password takes a slot like a login does
+            throttle = get_login_throttle()
+            with throttle.hashing_slot() as acquired:
+                if not acquired:
+                    return _server_busy('admin/register.html', throttle.hash_wait_seconds,
+                                        username=username, email=email)
+                user_data, create_error = create_user(username, email, password, role='admin')
             
             if user_data:
                 flash('Account created successfully! Please log in.', 'success')
@@ -1,14 +1,25 @@
 # routes/main.py
 import os
 import json
-from flask import Blueprint, render_template, redirect, url_for, flash, send_from_directory, request, session
+import glob
+from datetime import date
+from flask import Blueprint, render_template, redirect, url_for, flash, send_from_directory, request, session, abort
 
 from utils.decorators import viewer_required
-from utils.helpers import get_project, get_project_calendar, DATA_DIR, logger, get_projects, get_project_versions
+from utils.helpers import get_project, get_project_calendar, DATA_DIR, logger, get_projects, get_project_versions, get_project_dir
+from utils.http_cache import conditional_response, file_signature, make_etag, page_last_modified, RENDER_REVISION
 from utils.calendar_generator import calculate_department_counts, calculate_location_counts
+from utils.calendar_ranges import calendar_summary, filter_days, group_months, initial_months, parse_month
+from utils.template_cache import reference_data_version, revision_of
+from utils.streaming import render_streamed
+from utils.session_store import owns_project
+from utils.request_timing import timed
 
 main_bp = Blueprint('main', __name__)
 
+# Months rendered server-side on first paint; the rest load as the user scrolls
+VIEWER_INITIAL_MONTHS = int(os.environ.get('VIEWER_INITIAL_MONTHS', 2))
+
 @main_bp.route('/')
 def welcome():
     """Welcome page - no authentication required"""
@@ -24,13 +35,46 @@ def dashboard():
 
 # In routes/main.py, replace the entire viewer function with this:
 
+def _viewer_dependencies(project_id, user_id):
+    """Every file the viewer page can be built from (owner, any-owner and legacy copies)"""
+    paths = [os.path.join(DATA_DIR, name) for name in ('departments.json', 'locations.json', 'areas.json')]
+    if user_id:
+        owner_dir = get_project_dir(project_id, user_id)
+        paths += [os.path.join(owner_dir, name) for name in ('main.json', 'workspace.json', 'calendar.json')]
+    paths += sorted(glob.glob(os.path.join(DATA_DIR, 'users', '*', 'projects', project_id, 'versions.json')))
+    paths.append(os.path.join(get_project_dir(project_id), 'versions.json'))
+    return paths
+
 @main_bp.route('/viewer/<project_id>')
 def viewer(project_id):
     """Calendar viewer that supports both admin (owner) and public access."""
     # --- Inputs / session ---
     user_id = session.get('user_id')
     requested_version_id = request.args.get('version')
+    # ?all=1 renders every month up front instead of lazy-loading them
+    render_all = request.args.get('all') == '1'
+
+    # Revalidate from file metadata only; a 304 skips loading and sun/count calculations
+    # (the date is included because the initially rendered months follow today)
+    dependencies = _viewer_dependencies(project_id, user_id)
+    today = date.today()
+    etag = make_etag(RENDER_REVISION, project_id, requested_version_id, user_id, render_all, today,
+                     session.get('user_role'), session.get('theme'), file_signature(dependencies))
+    return conditional_response(
+        etag,
+        lambda: _build_viewer(project_id, user_id, requested_version_id, render_all=render_all),
+        last_modified=page_last_modified(dependencies, today)
+    )
 
+@timed('storage')
+def _resolve_viewer_calendar(project_id, user_id, requested_version_id):
+    """Pick the project and calendar the viewer shows
+
+    Returns:
+        dict with project, calendar, versions and current_version_id; 'error' is
+        set instead when the requested version is missing or not accessible, and
+        'no_published_version' when there is nothing to show publicly
+    """
     # --- Helpers (local to route) ---
     def _json_load(path):
         try:
@@ -90,7 +134,7 @@ def viewer(project_id):
 
     # --- Determine owner project (if logged in) ---
     project = None
-    if user_id:
+    if user_id and owns_project(project_id):
         project = get_project(project_id, user_id)
 
     # --- Load versions ---
@@ -124,13 +168,11 @@ def viewer(project_id):
         # Find the requested version
         version_obj = next((v for v in versions if v.get('id') == requested_version_id), None)
         if not version_obj:
-            flash('Version not found', 'error')
-            return redirect(url_for('main.viewer', project_id=project_id))
+            return {'error': 'Version not found'}
 
         # Public users can only view published versions
         if not project and not version_obj.get('isPublished'):
-            flash('Version not accessible', 'error')
-            return redirect(url_for('main.viewer', project_id=project_id))
+            return {'error': 'Version not accessible'}
 
         calendar_data = version_obj.get('calendarData', {"days": []})
 
@@ -161,16 +203,22 @@ def viewer(project_id):
                 calendar_data = get_project_calendar(project_id, user_id)
             else:
                 # Nothing to show publicly
-                return render_template(
-                    'viewer.html',
-                    project=project or {"id": project_id, "title": "Calendar Not Available"},
-                    calendar=None,
-                    no_published_version=True,
-                    versions=[],
-                    locations=[]
-                )
-
-    # --- Supporting data (unchanged) ---
+                return {
+                    'project': project or {"id": project_id, "title": "Calendar Not Available"},
+                    'calendar': None,
+                    'no_published_version': True,
+                }
+
+    return {
+        'project': project,
+        'calendar': calendar_data,
+        'versions': versions,
+        'current_version_id': requested_version_id,
+    }
+
+@timed('storage')
+def _load_supporting_data():
+    """departments, locations and areas lists used by the viewer"""
     departments = []
     departments_file = os.path.join(DATA_DIR, 'departments.json')
     if os.path.exists(departments_file):
@@ -198,7 +246,47 @@ def viewer(project_id):
         except Exception as e:
             logger.error(f"Error loading areas in viewer route: {str(e)}")
 
-    # Attach supporting data & metrics
+    return departments, locations, areas
+
+def _annotate_days(days):
+    """Add sun times to just the days about to be rendered"""
+    from utils.calendar_generator import calculate_sun_times_for_calendar
+    calculate_sun_times_for_calendar({'days': days}, include_enhanced=True)
+
+def _build_viewer(project_id, user_id, requested_version_id, render_all=False):
+    """Load, annotate and render the viewer page
+
+    Only the current and next month are rendered (unless render_all); the other
+    months are placeholders that static/js/calendar-lazy.js fills from viewer_rows.
+    """
+    # Fragment cache keys, taken before loading so cached markup is never older than its key
+    calendar_revision = revision_of(_viewer_dependencies(project_id, user_id))
+    reference_version = reference_data_version()
+
+    resolved = _resolve_viewer_calendar(project_id, user_id, requested_version_id)
+    if resolved.get('error'):
+        flash(resolved['error'], 'error')
+        return redirect(url_for('main.viewer', project_id=project_id))
+    if resolved.get('no_published_version'):
+        return render_template(
+            'viewer.html',
+            project=resolved['project'],
+            calendar=None,
+            client_calendar=None,
+            no_published_version=True,
+            versions=[],
+            locations=[]
+        )
+
+    project = resolved['project']
+    calendar_data = resolved['calendar']
+    versions = resolved['versions']
+    requested_version_id = resolved['current_version_id']
+    departments, locations, areas = _load_supporting_data()
+
+    # Attach supporting data & metrics (counters cover the whole schedule)
+    calendar_months = []
+    client_calendar = None
     if calendar_data is not None:
         calendar_data['departments'] = departments
         calendar_data['locationAreas'] = areas
@@ -206,8 +294,25 @@ def viewer(project_id):
         calendar_data = calculate_department_counts(calendar_data)
         calendar_data = calculate_location_counts(calendar_data)
 
-        from utils.calendar_generator import calculate_sun_times_for_calendar
-        calendar_data = calculate_sun_times_for_calendar(calendar_data)
+        months = group_months(calendar_data.get('days', []))
+        rendered = {m['month'] for m in months} if render_all else set(initial_months(months, VIEWER_INITIAL_MONTHS))
+        rows_by_month = {key: [] for key in rendered}
+        for day in calendar_data.get('days', []):
+            if (day.get('date') or '')[:7] in rows_by_month:
+                rows_by_month[day['date'][:7]].append(day)
+        _annotate_days([day for rows in rows_by_month.values() for day in rows])
+        for month in months:
+            # None marks a month left for the browser to fetch
+            month['rows'] = rows_by_month.get(month['month'])
+        calendar_months = months
+
+        # The page carries only the rendered months' days plus a summary of the
+        # whole schedule; calendar-lazy.js merges the rest in as months load
+        summary = calendar_summary(calendar_data)
+        client_calendar = {key: value for key, value in calendar_data.items() if key != 'days'}
+        client_calendar['days'] = [day for month in months if month['rows'] for day in month['rows']]
+        client_calendar['loadedMonths'] = sorted(rendered)
+        client_calendar['summary'] = {key: summary[key] for key in ('totalDays', 'shootDays', 'dayTypes', 'dateRange', 'months')}
 
     # Build versions list for selector (published only for public)
     published_versions = [v for v in versions if v.get('isPublished')]
@@ -216,15 +321,52 @@ def viewer(project_id):
         return (v.get('publishedAt') or '', v.get('versionNumber') or '0')
     published_versions.sort(key=_ver_sort_key)
 
-    return render_template(
+    return render_streamed(
         'viewer.html',
         project=project,
         calendar=calendar_data,
+        client_calendar=client_calendar,
+        calendar_months=calendar_months,
         locations=locations,
         versions=published_versions,
-        current_version_id=requested_version_id
+        current_version_id=requested_version_id,
+        calendar_revision=calendar_revision,
+        reference_version=reference_version
     )
 
+@main_bp.route('/viewer/<project_id>/rows')
+def viewer_rows(project_id):
+    """Table rows for one month of the viewer (?month=YYYY-MM), loaded on scroll"""
+    user_id = session.get('user_id')
+    requested_version_id = request.args.get('version')
+    month = request.args.get('month', '')
+    try:
+        month_from, month_to = parse_month(month)
+    except ValueError:
+        abort(400)
+
+    dependencies = _viewer_dependencies(project_id, user_id)
+    etag = make_etag(RENDER_REVISION, 'rows', project_id, requested_version_id, month, user_id,
+                     session.get('user_role'), file_signature(dependencies))
+
+    def build():
+        calendar_revision, reference_version = revision_of(dependencies), reference_data_version()
+        resolved = _resolve_viewer_calendar(project_id, user_id, requested_version_id)
+        calendar_data = resolved.get('calendar')
+        if resolved.get('error') or calendar_data is None:
+            abort(404)
+
+        _, _, areas = _load_supporting_data()
+        calendar_data['locationAreas'] = areas
+        calendar_data = calculate_location_counts(calendar_data)
+        days = filter_days(calendar_data.get('days', []), month_from, month_to)
+        _annotate_days(days)
+        return render_template('components/_calendar_rows.html', days=days, calendar=calendar_data,
+                               project_id=project_id, month=month, current_version_id=resolved.get('current_version_id'),
+                               calendar_revision=calendar_revision, reference_version=reference_version)
+
+    return conditional_response(etag, build, last_modified=page_last_modified(dependencies))
+
 @main_bp.route('/help')
 def help():
     """Help and about page"""
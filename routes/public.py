@@ -1,5 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, session
 from utils.access_manager import ProjectAccessManager
+from utils.compression import send_precompressed
+from utils.session_store import grant_public_access
 import logging
 
 # Create blueprint
@@ -12,25 +14,24 @@ access_manager = ProjectAccessManager()
 def view_calendar_by_token(access_token):
     """Direct calendar access via shareable link"""
     try:
-        # Get calendar data to validate token and get project info
-        calendar_data = access_manager.get_calendar_by_token(access_token)
+        # Resolve the token from the in-memory registry
+        access_entry = access_manager.resolve_access_token(access_token)
         
-        if not calendar_data:
+        if not access_entry:
             logging.warning(f"Invalid access token attempted: {access_token}")
             abort(404)
         
         # Extract project info
-        access_info = calendar_data.get('access', {})
-        project_id = access_info.get('project_id')
+        project_id = access_entry.get('project_id')
         
         if not project_id:
             logging.error(f"No project ID found for token {access_token}")
             abort(404)
         
+        access_manager.update_access_stats(access_token)
+        
         # Set session flag for public access
-        session['public_access'] = True
-        session['access_method'] = 'link'
-        session['access_code'] = access_info.get('access_code', '')
+        grant_public_access('link', access_entry.get('code', ''))
         
         # Redirect to existing viewer page
         return redirect(url_for('main.viewer', project_id=project_id))
@@ -39,6 +40,19 @@ def view_calendar_by_token(access_token):
         logging.error(f"Error accessing calendar by token {access_token}: {str(e)}")
         abort(500)
 
+@public_bp.route('/calendar/<access_token>/calendar.json')
+def calendar_payload_by_token(access_token):
+    """Published calendar JSON for a shareable link, served from its precompressed variant"""
+    payload = access_manager.get_payload_file(access_token)
+    if not payload:
+        abort(404)
+    
+    payload_hash, payload_path = payload
+    # The token can be repointed or revoked, so clients revalidate against the content hash
+    response = send_precompressed(payload_path, 'application/json', etag=payload_hash, max_age=0)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 @public_bp.route('/access', methods=['GET', 'POST'])
 def access_code_entry():
     """Access code entry page"""
@@ -58,25 +72,24 @@ def access_code_entry():
         return render_template('public/access_entry.html')
     
     try:
-        # Get calendar data to validate code and get project info
-        calendar_data = access_manager.get_calendar_by_code(access_code)
+        # Resolve the code from the in-memory registry
+        access_entry = access_manager.resolve_access_code(access_code)
         
-        if not calendar_data:
+        if not access_entry:
             flash('Invalid access code. Please check and try again.', 'error')
             return render_template('public/access_entry.html')
         
         # Extract project info
-        access_info = calendar_data.get('access', {})
-        project_id = access_info.get('project_id')
+        project_id = access_entry.get('project_id')
         
         if not project_id:
             flash('Invalid access code. Please try again.', 'error')
             return render_template('public/access_entry.html')
         
+        access_manager.update_access_stats(access_code)
+        
         # Set session flag for public access
-        session['public_access'] = True
-        session['access_method'] = 'code'
-        session['access_code'] = access_code
+        grant_public_access('code', access_code)
         
         # Redirect to existing viewer page
         return redirect(url_for('main.viewer', project_id=project_id))
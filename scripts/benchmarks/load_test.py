@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+Film Scheduler load test
+Seeds a sandbox with synthetic production data (see synthetic_data.py), then has
+concurrent virtual users replay a realistic mix of requests against the app,
+either in-process through the WSGI test client or against a local gunicorn:
+
+    # In-process, 8 virtual users for 30 seconds
+    python scripts/benchmarks/load_test.py --scale medium --concurrency 8 --duration 30
+
+    # Real server with the production worker layout (or try more workers/threads)
+    python scripts/benchmarks/load_test.py --target gunicorn --workers 1 --threads 2 --concurrency 16
+
+The mix (weights, adjustable with --mix) covers public viewer hits, access-code
+entry, admin day saves, move-day and publish. Reports throughput, latency
+percentiles and error rates per request type. While the test runs, and again at
+the end, every JSON file in the data directory is parsed and each calendar is
+checked (same days, same shoot days, unique versions, every successful publish
+still present), so torn or lost writes from concurrent requests show up. Exits 1
+on corruption, lost writes or when the error rate exceeds --max-error-rate.
+"""
+
+import os
+import sys
+import atexit
+import json
+import time
+import random
+import socket
+import logging
+import argparse
+import threading
+import subprocess
+from collections import Counter as CounterDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_data import (
+    add_scale_arguments, scale_from_args, create_sandbox, activate_sandbox, remove_sandbox, generate_dataset
+)
+from run_benchmarks import percentile
+
+DEFAULT_MIX = 'viewer=70,access_code=10,day_save=12,move_day=6,publish=2'
+
+
+# --- Clients ---
+
+class WSGIClient:
+    """Requests through Flask's test client (one per virtual user, so each keeps its own cookies)"""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method: str, path: str, **kwargs) -> Tuple[int, bytes]:
+        response = self._client.open(path, method=method, **kwargs)
+        try:
+            return response.status_code, response.get_data()
+        finally:
+            response.close()
+
+
+class HTTPClient:
+    """Requests over HTTP to a running server"""
+
+    def __init__(self, base_url: str, timeout: float = 30):
+        import requests
+        self._session = requests.Session()
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def request(self, method: str, path: str, **kwargs) -> Tuple[int, bytes]:
+        response = self._session.request(method, self.base_url + path, allow_redirects=False,
+                                          timeout=self.timeout, **kwargs)
+        return response.status_code, response.content
+
+
+class GunicornServer:
+    """A local gunicorn serving the sandbox"""
+
+    def __init__(self, sandbox: str, workers: int, threads: int):
+        self.sandbox = sandbox
+        self.workers = workers
+        self.threads = threads
+        self.port = self._free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.log_path = os.path.join(sandbox, 'gunicorn.log')
+        self._process: Optional[subprocess.Popen] = None
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+
+    def start(self, timeout: float = 30):
+        import requests
+        command = [sys.executable, '-m', 'gunicorn', '--bind', f"127.0.0.1:{self.port}",
+                   '--workers', str(self.workers), '--threads', str(self.threads), 'app:app']
+        with open(self.log_path, 'ab') as log:
+            self._process = subprocess.Popen(command, cwd=self.sandbox, env=dict(os.environ),
+                                             stdout=log, stderr=subprocess.STDOUT)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with code {self._process.returncode}, see {self.log_path}")
+            try:
+                if requests.get(self.base_url + '/health', timeout=1).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"gunicorn did not become ready within {timeout:.0f}s, see {self.log_path}")
+
+    def stop(self):
+        if self._process and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+
+# --- Virtual users and the request mix ---
+
+class VirtualUser:
+    """One simulated person: a public viewer session plus an admin session for one owner
+
+    Args:
+        index: Position among the virtual users (also picks the admin account)
+        make_client: Returns a new client with its own cookie jar
+        seed: Data the scenarios pick from (projects, dates, the access manager)
+        record: Called with (name, status, seconds, error) for every request
+    """
+
+    def __init__(self, index: int, make_client: Callable, seed: Dict, record: Callable, rng_seed: int):
+        self.index = index
+        self.rng = random.Random(rng_seed + index)
+        self.public = make_client()
+        self.admin = make_client()
+        self.seed = seed
+        self.record = record
+        self.owner = seed['users'][index % len(seed['users'])]
+        self.own_projects = [project for project in seed['projects'] if project['user_id'] == self.owner['id']]
+        self.publish_count = 0
+        self.published: List[Tuple[str, str, str]] = []  # (project id, owner id, version number)
+
+    def call(self, name: str, client, method: str, path: str, expected=(200,), expect_json=False, **kwargs):
+        started = time.perf_counter()
+        error = None
+        try:
+            status, body = client.request(method, path, **kwargs)
+            if status not in expected:
+                error = f"HTTP {status}"
+            elif expect_json:
+                try:
+                    payload = json.loads(body)
+                    if isinstance(payload, dict) and payload.get('success') is False:
+                        error = f"success=false: {payload.get('message', '')[:80]}"
+                except ValueError:
+                    error = 'invalid JSON response'
+        except Exception as e:
+            status, error = 0, f"{type(e).__name__}: {e}"
+        self.record(name, status, time.perf_counter() - started, error)
+        return error is None
+
+    def login(self):
+        self.call('login', self.admin, 'POST', '/login', expected=(302,),
+                  data={'username': self.owner['username'], 'password': self.seed['password']})
+
+    # Scenarios
+
+    def viewer(self):
+        project = self.rng.choice(self.seed['projects'])
+        self.call('viewer', self.public, 'GET', f"/viewer/{project['id']}")
+        if self.rng.random() < 0.5:
+            month = self.rng.choice(project['months'])
+            self.call('viewer_rows', self.public, 'GET', f"/viewer/{project['id']}/rows?month={month}")
+
+    def access_code(self):
+        project = self.rng.choice(self.seed['projects'])
+        # Publishing changed content retires the old code, so read the current one
+        access = self.seed['access_manager'].get_project_access_info(project['user_id'], project['id'])
+        self.call('access_code', self.public, 'POST', '/access', expected=(302,),
+                  data={'access_code': access['access_code']})
+
+    def day_save(self):
+        project = self.rng.choice(self.own_projects)
+        date = self.rng.choice(project['dates'])
+        self.call('day_save', self.admin, 'POST', f"/admin/day/{project['id']}/{date}", expect_json=True,
+                  headers={'X-Requested-With': 'XMLHttpRequest'},
+                  data={'notes': f"Load test {self.index}-{self.rng.randrange(10 ** 6)}",
+                        'extras': str(self.rng.randint(0, 60))})
+
+    def move_day(self):
+        project = self.rng.choice(self.own_projects)
+        if len(project['shoot_dates']) < 2:
+            return
+        from_date, to_date = self.rng.sample(project['shoot_dates'], 2)
+        self.call('move_day', self.admin, 'POST', f"/api/projects/{project['id']}/calendar/move-day",
+                  json={'fromDate': from_date, 'toDate': to_date, 'mode': 'swap'})
+
+    def publish(self):
+        project = self.rng.choice(self.own_projects)
+        self.publish_count += 1
+        # Unique per virtual user so concurrent publishes never collide on a number
+        version_number = f"{100 + self.index}.{self.publish_count}"
+        if self.call('publish', self.admin, 'POST', f"/admin/project/{project['id']}/publish",
+                     data={'version_number': version_number, 'notes': 'Load test'}):
+            self.published.append((project['id'], project['user_id'], version_number))
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """'viewer=70,publish=2' -> {'viewer': 70.0, 'publish': 2.0}"""
+    mix = {}
+    for part in value.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if not hasattr(VirtualUser, name) or name in ('call', 'login'):
+            raise ValueError(f"Unknown scenario '{name}'")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("The mix needs at least one scenario with a positive weight")
+    return mix
+
+
+# --- Seeding and corruption checks ---
+
+def seed_run_data(manifest: Dict) -> Dict:
+    """Publish every project, then collect its dates and shoot days plus what must stay true after the run"""
+    from utils.helpers import get_project, get_project_calendar
+    from utils.access_manager import ProjectAccessManager
+
+    access_manager = ProjectAccessManager()
+    projects = []
+    for entry in manifest['projects']:
+        project = get_project(entry['id'], entry['user_id'])
+        calendar_data = get_project_calendar(entry['id'], entry['user_id'])
+        days = calendar_data.get('days', [])
+        access_manager.publish_calendar_with_access(entry['user_id'], entry['id'], calendar_data, project)
+        projects.append({
+            'id': entry['id'],
+            'user_id': entry['user_id'],
+            'dates': [day['date'] for day in days],
+            'shoot_dates': [day['date'] for day in days if day.get('isShootDay')],
+            'months': sorted({day['date'][:7] for day in days}),
+        })
+    return {'users': manifest['users'], 'password': manifest['password'], 'projects': projects,
+            'access_manager': access_manager}
+
+def _json_files(data_dir: str):
+    for root, dirs, files in os.walk(data_dir):
+        dirs[:] = [d for d in dirs if d != 'cache']
+        for name in files:
+            # .tmp- files are atomic writes in progress
+            if name.endswith('.json') and not name.startswith('.tmp-'):
+                yield os.path.join(root, name)
+
+def scan_json_files(data_dir: str) -> Tuple[int, List[str]]:
+    """Parse every JSON file; returns (files read, problems)"""
+    checked, problems = 0, []
+    for path in _json_files(data_dir):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                json.load(f)
+            checked += 1
+        except FileNotFoundError:
+            continue  # Replaced or removed while scanning
+        except (ValueError, UnicodeDecodeError) as e:
+            problems.append(f"{os.path.relpath(path, data_dir)}: {e}")
+    return checked, problems
+
+def check_project_data(seed: Dict, published: List[Tuple[str, str, str]]) -> List[str]:
+    """Invariants the mix must not break
+
+    Swaps and day saves keep every day and shoot day, version ids stay unique and
+    every publish that succeeded is still in versions.json (a missing one was
+    overwritten by a concurrent write).
+    """
+    from utils.helpers import get_project_calendar, get_project_versions
+
+    problems = []
+    for project in seed['projects']:
+        days = get_project_calendar(project['id'], project['user_id']).get('days', [])
+        dates = [day.get('date') for day in days]
+        if sorted(dates) != sorted(project['dates']):
+            problems.append(f"{project['id']}: {len(dates)} days, expected {len(project['dates'])} (days lost or duplicated)")
+        shoot_dates = sorted(day.get('date') for day in days if day.get('isShootDay'))
+        if shoot_dates != sorted(project['shoot_dates']):
+            problems.append(f"{project['id']}: shoot days changed ({len(shoot_dates)}, expected {len(project['shoot_dates'])})")
+
+        ids = [version.get('id') for version in get_project_versions(project['id'], project['user_id'])]
+        if len(ids) != len(set(ids)):
+            problems.append(f"{project['id']}: duplicate version ids")
+
+    for project_id, user_id, version_number in published:
+        versions = get_project_versions(project_id, user_id)
+        if not any(version.get('versionNumber') == version_number for version in versions):
+            problems.append(f"{project_id}: published version {version_number} was lost")
+    return problems
+
+
+class CorruptionWatcher(threading.Thread):
+    """Re-parses the data directory's JSON files in the background while the test runs"""
+
+    def __init__(self, data_dir: str, interval: float):
+        super().__init__(daemon=True)
+        self.data_dir = data_dir
+        self.interval = interval
+        self.scans = 0
+        self.files_checked = 0
+        self.problems: List[str] = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            checked, problems = scan_json_files(self.data_dir)
+            self.scans += 1
+            self.files_checked += checked
+            self.problems.extend(problems)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# --- Running and reporting ---
+
+class Results:
+    """Thread-safe collection of (name, status, seconds, error) samples"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.messages: CounterDict = CounterDict()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, status: int, seconds: float, error: Optional[str]):
+        with self._lock:
+            self.samples.setdefault(name, []).append(seconds)
+            if error:
+                self.errors[name] = self.errors.get(name, 0) + 1
+                self.messages[f"{name}: {error}"] += 1
+
+    def total(self) -> int:
+        return sum(len(values) for values in self.samples.values())
+
+    def total_errors(self) -> int:
+        return sum(self.errors.values())
+
+def run_load(users: List[VirtualUser], mix: Dict[str, float], duration: float,
+             max_requests: Optional[int], results: Results, think_time: float) -> float:
+    """Run every virtual user in its own thread; returns the elapsed seconds"""
+    names, weights = list(mix), list(mix.values())
+    deadline = time.perf_counter() + duration
+    budget = {'remaining': max_requests}
+    budget_lock = threading.Lock()
+
+    def take_turn() -> bool:
+        if max_requests is None:
+            return True
+        with budget_lock:
+            if budget['remaining'] <= 0:
+                return False
+            budget['remaining'] -= 1
+            return True
+
+    def loop(user: VirtualUser):
+        user.login()
+        while time.perf_counter() < deadline and take_turn():
+            getattr(user, user.rng.choices(names, weights)[0])()
+            if think_time:
+                time.sleep(user.rng.uniform(0, 2 * think_time))
+
+    threads = [threading.Thread(target=loop, args=(user,), daemon=True) for user in users]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+def summarize(results: Results, elapsed: float) -> Dict:
+    report = {'elapsed_seconds': round(elapsed, 3), 'requests': results.total(), 'errors': results.total_errors(),
+              'throughput_rps': results.total() / elapsed if elapsed else 0.0, 'by_request': {}}
+    for name, samples in sorted(results.samples.items()):
+        values = sorted(sample * 1000 for sample in samples)
+        report['by_request'][name] = {
+            'n': len(values),
+            'errors': results.errors.get(name, 0),
+            'rps': len(values) / elapsed if elapsed else 0.0,
+            'p50': percentile(values, 0.50),
+            'p90': percentile(values, 0.90),
+            'p95': percentile(values, 0.95),
+            'p99': percentile(values, 0.99),
+            'max': values[-1],
+        }
+    return report
+
+def print_report(report: Dict, messages: CounterDict):
+    print(f"{'request':<14} {'n':>7} {'err':>6} {'err%':>7} {'req/s':>8} {'p50':>9} {'p90':>9} {'p95':>9} "
+          f"{'p99':>9} {'max':>9}   (ms)")
+    for name, stats in report['by_request'].items():
+        error_rate = stats['errors'] / stats['n'] if stats['n'] else 0.0
+        print(f"{name:<14} {stats['n']:>7} {stats['errors']:>6} {error_rate:>7.1%} {stats['rps']:>8.1f} "
+              f"{stats['p50']:>9.1f} {stats['p90']:>9.1f} {stats['p95']:>9.1f} {stats['p99']:>9.1f} {stats['max']:>9.1f}")
+    error_rate = report['errors'] / report['requests'] if report['requests'] else 0.0
+    print(f"\nTotal: {report['requests']} requests in {report['elapsed_seconds']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s), {report['errors']} errors ({error_rate:.2%})")
+    if messages:
+        print("\nMost common errors:")
+        for message, count in messages.most_common(5):
+            print(f"  {count:>5} x {message}")
+
+def main():
+    """Seed a sandbox, run the load, report and check the data"""
+    parser = argparse.ArgumentParser(description="Load test the scheduler with a realistic request mix")
+    add_scale_arguments(parser)
+    parser.add_argument('--target', choices=('wsgi', 'gunicorn'), default='wsgi',
+                        help="In-process test client or a local gunicorn (default: wsgi)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Virtual users (default: 8)")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds to run (default: 20)")
+    parser.add_argument('--requests', type=int, help="Stop after this many scenarios instead of at --duration")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument('--think-time', type=float, default=0.0,
+                        help="Average pause between a user's scenarios in seconds (default: 0, closed loop)")
+    parser.add_argument('--workers', type=int, default=1, help="gunicorn workers (default: 1)")
+    parser.add_argument('--threads', type=int, default=2, help="gunicorn threads per worker (default: 2)")
+    parser.add_argument('--check-interval', type=float, default=1.0,
+                        help="Seconds between background JSON scans, 0 to only check at the end (default: 1)")
+    parser.add_argument('--max-error-rate', type=float, default=1.0,
+                        help="Error rate in percent above which the run fails (default: 1)")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON instead of a table")
+    parser.add_argument('--keep', action='store_true', help="Keep the sandbox directory afterwards")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        print(f"Invalid --mix: {e}")
+        return False
+
+    logging.basicConfig(level=logging.WARNING)
+    # Every virtual user logs in from 127.0.0.1, and per-request warnings would swamp the output
+    os.environ.setdefault('LOGIN_ATTEMPTS_PER_MINUTE_IP', str(10 ** 6))
+    os.environ.setdefault('SLOW_REQUEST_MS', str(10 ** 9))
+
+    sandbox = create_sandbox()
+    if not args.keep:
+        # Registered before the app is imported so it runs after the app's own exit
+        # handlers (which flush access stats into the sandbox)
+        atexit.register(remove_sandbox, sandbox)
+    server = None
+    try:
+        activate_sandbox(sandbox)
+        data_dir = os.path.join(sandbox, 'data')
+        manifest = generate_dataset(scale_from_args(args), args.seed)
+        seed = seed_run_data(manifest)
+
+        if args.target == 'gunicorn':
+            server = GunicornServer(sandbox, args.workers, args.threads)
+            server.start()
+            make_client = lambda: HTTPClient(server.base_url)
+            target = f"gunicorn {args.workers} worker(s) x {args.threads} thread(s) at {server.base_url}"
+        else:
+            from app import app
+            logging.getLogger().setLevel(logging.ERROR)
+            make_client = lambda: WSGIClient(app)
+            target = 'in-process WSGI test client'
+
+        if not args.json:
+            print("Film Scheduler - Load Test")
+            print("==========================")
+            print(f"Target: {target}")
+            print(f"Data: {args.scale} ({len(seed['users'])} users, {len(seed['projects'])} projects)")
+            print(f"Virtual users: {args.concurrency}, mix: {args.mix}")
+            print(f"Running for {args.duration:.0f}s..." if not args.requests else f"Running {args.requests} scenarios...")
+            print()
+
+        results = Results()
+        users = [VirtualUser(i, make_client, seed, results.record, args.seed) for i in range(args.concurrency)]
+        watcher = CorruptionWatcher(data_dir, args.check_interval) if args.check_interval > 0 else None
+        if watcher:
+            watcher.start()
+        duration = float('inf') if args.requests else args.duration
+        elapsed = run_load(users, mix, duration, args.requests, results, args.think_time)
+        if watcher:
+            watcher.stop()
+        if server:
+            server.stop()
+
+        files_checked, json_problems = scan_json_files(data_dir)
+        if watcher:
+            json_problems = watcher.problems + json_problems
+        published = [entry for user in users for entry in user.published]
+        data_problems = check_project_data(seed, published)
+    finally:
+        if server:
+            server.stop()
+        if args.keep:
+            print(f"Sandbox kept at {sandbox}")
+
+    report = summarize(results, elapsed)
+    report['target'] = target
+    report['corruption'] = {
+        'background_scans': watcher.scans if watcher else 0,
+        'files_checked': files_checked + (watcher.files_checked if watcher else 0),
+        'json_problems': json_problems,
+        'data_problems': data_problems,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, results.messages)
+        corruption = report['corruption']
+        print(f"\nData checks: {corruption['files_checked']} JSON reads in {corruption['background_scans']} "
+              f"background scans plus a final scan")
+        for problem in json_problems[:10]:
+            print(f"  CORRUPT JSON {problem}")
+        for problem in data_problems[:10]:
+            print(f"  DATA {problem}")
+        if len(json_problems) > 10 or len(data_problems) > 10:
+            print(f"  ({len(json_problems)} JSON and {len(data_problems)} data problems in total)")
+        if not json_problems and not data_problems:
+            print("  No corruption or lost writes found")
+
+    error_rate = report['errors'] / report['requests'] * 100 if report['requests'] else 0.0
+    return not json_problems and not data_problems and error_rate <= args.max_error_rate
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
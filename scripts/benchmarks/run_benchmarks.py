@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Film Scheduler benchmark suite
+Times the hot paths against synthetic production data (see synthetic_data.py)
+and compares the results with a stored baseline, so regressions are caught
+before deploy.
+
+    # Record a baseline
+    python scripts/benchmarks/run_benchmarks.py --scale medium --save-baseline benchmarks-baseline.json
+
+    # After a change: exits 1 if any benchmark's median is more than 25% slower
+    python scripts/benchmarks/run_benchmarks.py --scale medium --compare benchmarks-baseline.json
+
+Benchmarks: calendar generation, department/location counts, sun times (cold and
+warm cache), get_projects, viewer rendering (full page, all rows, one month),
+publish and move-day. Compare baselines recorded at the same scale on the same machine.
+"""
+
+import os
+import sys
+import json
+import time
+import copy
+import shutil
+import logging
+import argparse
+import platform
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_data import (
+    add_scale_arguments, scale_from_args, create_sandbox, activate_sandbox, remove_sandbox, generate_dataset
+)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Linear-interpolated percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Millisecond statistics for a list of durations in seconds"""
+    values = sorted(sample * 1000 for sample in samples)
+    return {
+        'n': len(values),
+        'mean': sum(values) / len(values) if values else 0.0,
+        'p50': percentile(values, 0.50),
+        'p90': percentile(values, 0.90),
+        'p95': percentile(values, 0.95),
+        'max': values[-1] if values else 0.0,
+    }
+
+
+class Benchmark:
+    """A named operation, optionally with untimed setup run before every iteration
+
+    Args:
+        name: Identifier used in reports and baselines
+        run: Called with whatever setup returned; this is what is timed
+        setup: Prepares fresh input (copies, cache clears, file restores)
+    """
+
+    def __init__(self, name: str, run: Callable, setup: Optional[Callable] = None):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda: None)
+
+    def measure(self, iterations: int, warmup: int) -> List[float]:
+        samples = []
+        for i in range(warmup + iterations):
+            argument = self.setup()
+            started = time.perf_counter()
+            self.run(argument)
+            elapsed = time.perf_counter() - started
+            if i >= warmup:
+                samples.append(elapsed)
+        return samples
+
+
+def _check(response, expected=(200,)):
+    """Fail loudly if a request didn't do what the benchmark assumes"""
+    if response.status_code not in expected:
+        raise RuntimeError(f"Unexpected status {response.status_code} for {response.request.path}")
+    return response
+
+def build_benchmarks(app, manifest: Dict) -> List[Benchmark]:
+    """Benchmarks for the largest synthetic project"""
+    from utils.helpers import get_projects, get_project, get_project_calendar, get_user_projects_dir
+    from utils.calendar_generator import (
+        generate_calendar_days, calculate_department_counts, calculate_location_counts,
+        calculate_sun_times_for_calendar
+    )
+    from utils.sun_utils import clear_sun_times_cache
+
+    target = manifest['largest_project']
+    project_id, user_id = target['id'], target['user_id']
+    project = get_project(project_id, user_id)
+    calendar_data = get_project_calendar(project_id, user_id)
+    days = calendar_data.get('days', [])
+    shoot_dates = [day['date'] for day in days if day.get('isShootDay')]
+    months = sorted({day['date'][:7] for day in days})
+    middle_month = months[len(months) // 2] if months else ''
+
+    def fresh_calendar():
+        return copy.deepcopy(calendar_data)
+
+    def clear_fragments():
+        fragment_cache = getattr(app.jinja_env, 'fragment_cache', None)
+        if fragment_cache is not None:
+            fragment_cache.clear()
+
+    def cold_sun_calendar():
+        clear_sun_times_cache()
+        return fresh_calendar()
+
+    anonymous = app.test_client()
+
+    def viewer_setup():
+        clear_fragments()
+        return None
+
+    # Admin requests run as the project's owner
+    admin = app.test_client()
+    _check(admin.post('/login', data={'username': target['username'], 'password': manifest['password']}),
+           expected=(302,))
+
+    # Publishing adds a version each time; put the project folder back so every
+    # iteration publishes against the same history
+    project_dir = os.path.join(get_user_projects_dir(user_id), project_id)
+    snapshot_dir = project_dir + '.benchmark-snapshot'
+    shutil.copytree(project_dir, snapshot_dir)
+    publish_counter = iter(range(1000, 10 ** 9))
+
+    def restore_project():
+        shutil.rmtree(project_dir)
+        shutil.copytree(snapshot_dir, project_dir)
+        return f"{next(publish_counter)}.0"
+
+    def publish(version_number):
+        _check(admin.post(f"/admin/project/{project_id}/publish",
+                          data={'version_number': version_number, 'notes': 'Benchmark'}))
+
+    # Swapping the same two shoot days back and forth keeps the calendar stable
+    swap = {'from': shoot_dates[0], 'to': shoot_dates[-1]} if len(shoot_dates) > 1 else None
+
+    def move_day(_):
+        _check(admin.post(f"/api/projects/{project_id}/calendar/move-day",
+                          json={'fromDate': swap['from'], 'toDate': swap['to'], 'mode': 'swap'}))
+        swap['from'], swap['to'] = swap['to'], swap['from']
+
+    benchmarks = [
+        Benchmark('generate_calendar_days', lambda existing: generate_calendar_days(project, existing), fresh_calendar),
+        Benchmark('calculate_department_counts', calculate_department_counts, fresh_calendar),
+        Benchmark('calculate_location_counts', calculate_location_counts, fresh_calendar),
+        Benchmark('sun_times_cold', lambda data: calculate_sun_times_for_calendar(data, include_enhanced=True),
+                  cold_sun_calendar),
+        Benchmark('sun_times_warm', lambda data: calculate_sun_times_for_calendar(data, include_enhanced=True),
+                  fresh_calendar),
+        Benchmark('get_projects', lambda _: get_projects(user_id)),
+        Benchmark('viewer_page', lambda _: _check(anonymous.get(f"/viewer/{project_id}")).get_data(), viewer_setup),
+        Benchmark('viewer_all_rows', lambda _: _check(anonymous.get(f"/viewer/{project_id}?all=1")).get_data(),
+                  viewer_setup),
+        Benchmark('viewer_month_rows',
+                  lambda _: _check(anonymous.get(f"/viewer/{project_id}/rows?month={middle_month}")).get_data(),
+                  viewer_setup),
+        Benchmark('publish', publish, restore_project),
+    ]
+    if swap:
+        benchmarks.append(Benchmark('move_day', move_day))
+    return benchmarks
+
+
+def compare(results: Dict[str, Dict], baseline: Dict, threshold: float, min_ms: float) -> List[str]:
+    """Names of benchmarks whose median regressed by more than threshold (and min_ms)"""
+    regressions = []
+    print(f"\nComparison with baseline ({baseline.get('meta', {}).get('timestamp', 'unknown date')}):")
+    print(f"{'benchmark':<28} {'base p50':>10} {'now p50':>10} {'change':>9}")
+    for name, stats in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            print(f"{name:<28} {'-':>10} {stats['p50']:>10.2f}       new")
+            continue
+        change = (stats['p50'] - base['p50']) / base['p50'] if base['p50'] else 0.0
+        regressed = change > threshold and stats['p50'] - base['p50'] > min_ms
+        marker = '  REGRESSION' if regressed else ''
+        print(f"{name:<28} {base['p50']:>10.2f} {stats['p50']:>10.2f} {change:>+8.1%}{marker}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+def main():
+    """Generate data, run the benchmarks, report and compare"""
+    parser = argparse.ArgumentParser(description="Benchmark the scheduler's hot paths against synthetic data")
+    add_scale_arguments(parser)
+    parser.add_argument('--iterations', type=int, default=20, help="Timed runs per benchmark (default: 20)")
+    parser.add_argument('--warmup', type=int, default=1, help="Untimed runs first (default: 1)")
+    parser.add_argument('--only', nargs='+', metavar='NAME', help="Run only these benchmarks")
+    parser.add_argument('--save-baseline', metavar='PATH', help="Write the results as a baseline")
+    parser.add_argument('--compare', metavar='PATH', help="Compare with a baseline; exit 1 on regression")
+    parser.add_argument('--threshold', type=float, default=25.0,
+                        help="Median slowdown in percent counted as a regression (default: 25)")
+    parser.add_argument('--min-ms', type=float, default=1.0,
+                        help="Ignore slowdowns smaller than this many milliseconds (default: 1)")
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON instead of a table")
+    parser.add_argument('--keep', action='store_true', help="Keep the sandbox directory afterwards")
+    args = parser.parse_args()
+
+    # Benchmarks need quiet logs; request logging would dominate the timings
+    logging.basicConfig(level=logging.WARNING)
+    os.environ.setdefault('SLOW_REQUEST_MS', str(10 ** 9))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    baseline_path = os.path.abspath(args.save_baseline) if args.save_baseline else None
+
+    scale = scale_from_args(args)
+    sandbox = create_sandbox()
+    try:
+        activate_sandbox(sandbox)
+        started = time.perf_counter()
+        manifest = generate_dataset(scale, args.seed)
+        generated_in = time.perf_counter() - started
+
+        from app import app
+        logging.getLogger().setLevel(logging.WARNING)
+        benchmarks = build_benchmarks(app, manifest)
+        if args.only:
+            unknown = set(args.only) - {benchmark.name for benchmark in benchmarks}
+            if unknown:
+                print(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+                return False
+            benchmarks = [benchmark for benchmark in benchmarks if benchmark.name in args.only]
+
+        if not args.json:
+            print("Film Scheduler - Benchmarks")
+            print("===========================")
+            largest = manifest['largest_project']
+            print(f"Scale: {args.scale} ({len(manifest['users'])} users, {len(manifest['projects'])} projects, "
+                  f"largest {largest['days']} days), generated in {generated_in:.1f}s")
+            print(f"Iterations: {args.iterations} (+{args.warmup} warmup)\n")
+            print(f"{'benchmark':<28} {'n':>4} {'mean':>9} {'p50':>9} {'p90':>9} {'p95':>9} {'max':>9}   (ms)")
+
+        results = {}
+        for benchmark in benchmarks:
+            stats = summarize(benchmark.measure(args.iterations, args.warmup))
+            results[benchmark.name] = stats
+            if not args.json:
+                print(f"{benchmark.name:<28} {stats['n']:>4} {stats['mean']:>9.2f} {stats['p50']:>9.2f} "
+                      f"{stats['p90']:>9.2f} {stats['p95']:>9.2f} {stats['max']:>9.2f}")
+    finally:
+        if args.keep:
+            print(f"\nSandbox kept at {sandbox}")
+        else:
+            remove_sandbox(sandbox)
+
+    report = {
+        'meta': {
+            'scale': args.scale,
+            'dimensions': scale,
+            'seed': args.seed,
+            'iterations': args.iterations,
+            'python': platform.python_version(),
+            'machine': platform.node(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+
+    if baseline_path:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        if not args.json:
+            print(f"\nBaseline saved to {baseline_path}")
+
+    if baseline is not None:
+        if baseline.get('meta', {}).get('dimensions') != scale:
+            print("\nWarning: the baseline was recorded at a different scale; comparisons are not meaningful")
+        regressions = compare(results, baseline, args.threshold / 100, args.min_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return False
+        print("\nNo regressions")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Synthetic production data for benchmarks and load tests
+Builds users, projects, calendars and published versions at a configurable scale
+inside a sandbox: a temporary directory that links to the app's code but has its
+own data/, so the real data directory is never touched.
+
+    python scripts/benchmarks/synthetic_data.py --scale medium --out /tmp/scheduler-bench
+
+The app derives its data paths from the location of its modules, so the sandbox
+must be activated (activate_sandbox) before anything from the app is imported.
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+import tempfile
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Linked into the sandbox; anything else (data/, logs/) is created there
+SANDBOX_LINKS = ('app.py', 'utils', 'routes', 'templates', 'static')
+
+SCALES = {
+    # users, projects per user, days per project, holidays, hiatus periods,
+    # working weekends, locations, departments, areas, published versions per project
+    'small': dict(users=2, projects_per_user=2, days=90, holidays=3, hiatus=1, weekends=2,
+                  locations=20, departments=10, areas=4, versions=2),
+    'medium': dict(users=5, projects_per_user=4, days=180, holidays=6, hiatus=2, weekends=4,
+                   locations=80, departments=25, areas=8, versions=5),
+    'large': dict(users=10, projects_per_user=8, days=365, holidays=10, hiatus=3, weekends=8,
+                  locations=250, departments=40, areas=12, versions=10),
+}
+
+BENCHMARK_PASSWORD = 'Bench-password-1'
+AREA_COLORS = ('#e8f5e9', '#e3f2fd', '#fff3e0', '#fce4ec', '#ede7f6', '#e0f7fa', '#f9fbe7', '#efebe9')
+
+
+def create_sandbox(path: Optional[str] = None) -> str:
+    """Directory with the app's code linked in and an empty data/ directory"""
+    sandbox = path or tempfile.mkdtemp(prefix='scheduler-bench-')
+    os.makedirs(os.path.join(sandbox, 'data'), exist_ok=True)
+    for name in SANDBOX_LINKS:
+        target = os.path.join(sandbox, name)
+        if not os.path.lexists(target):
+            os.symlink(os.path.join(REPO_ROOT, name), target)
+    return sandbox
+
+def activate_sandbox(sandbox: str):
+    """Import the app from the sandbox (so its data/ is used) and work inside it
+
+    Call before importing anything from the app. Cheap password hashing is used
+    unless PASSWORD_HASH_METHOD is already set, so generating users stays fast.
+    """
+    for module in ('app', 'utils', 'routes'):
+        if module in sys.modules:
+            raise RuntimeError(f"'{module}' was imported before the sandbox was activated")
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    sys.path.insert(0, sandbox)
+    os.chdir(sandbox)
+
+def remove_sandbox(sandbox: str):
+    """Delete a sandbox (the links are removed, never what they point to)"""
+    shutil.rmtree(sandbox, ignore_errors=True)
+
+
+def _reference_data(rng: random.Random, scale: Dict) -> Dict[str, List[Dict]]:
+    areas = [
+        {'id': f"area-{i}", 'name': f"Area {i}", 'color': AREA_COLORS[i % len(AREA_COLORS)]}
+        for i in range(scale['areas'])
+    ]
+    departments = [
+        {'id': f"dept-{i}", 'name': f"Department {i}", 'code': f"D{i:02d}",
+         'description': 'Synthetic department', 'color': f"#{rng.randrange(0x1000000):06x}"}
+        for i in range(scale['departments'])
+    ]
+    locations = [
+        {
+            'id': f"location-{i}",
+            'name': f"Location {i}",
+            'address': f"{i} Synthetic Road, Ireland",
+            'areaId': rng.choice(areas)['id'] if areas else None,
+            # Spread across Ireland so sun times differ between locations
+            'latitude': round(rng.uniform(51.5, 55.3), 5),
+            'longitude': round(rng.uniform(-10.3, -6.0), 5),
+        }
+        for i in range(scale['locations'])
+    ]
+    return {'areas': areas, 'departments': departments, 'locations': locations}
+
+def _special_dates(rng: random.Random, scale: Dict, prep_start: date, wrap: date) -> Dict[str, List[Dict]]:
+    span = (wrap - prep_start).days
+    holidays = [
+        {'id': f"holiday-{i}", 'date': (prep_start + timedelta(days=rng.randrange(span))).isoformat(),
+         'name': f"Holiday {i}", 'isWorking': False, 'isShootDay': False}
+        for i in range(scale['holidays'])
+    ]
+    hiatus = []
+    for i in range(scale['hiatus']):
+        start = prep_start + timedelta(days=rng.randrange(span))
+        hiatus.append({'id': f"hiatus-{i}", 'name': f"Break {i}", 'startDate': start.isoformat(),
+                       'endDate': (start + timedelta(days=rng.randint(2, 7))).isoformat(), 'isVisible': True})
+    saturdays = [prep_start + timedelta(days=d) for d in range(span) if (prep_start + timedelta(days=d)).weekday() == 5]
+    weekends = [
+        {'id': f"weekend-{i}", 'date': day.isoformat(), 'description': 'Weekend shoot', 'isShootDay': True}
+        for i, day in enumerate(rng.sample(saturdays, min(scale['weekends'], len(saturdays))))
+    ]
+    return {'holidays': holidays, 'hiatus': hiatus, 'weekends': weekends}
+
+def _fill_days(rng: random.Random, days: List[Dict], reference: Dict[str, List[Dict]]):
+    """Give shoot days the locations, departments and details a real schedule has"""
+    codes = [dept['code'] for dept in reference['departments']]
+    for day in days:
+        if not day.get('isShootDay'):
+            continue
+        location = rng.choice(reference['locations']) if reference['locations'] else None
+        day['location'] = location['name'] if location else ''
+        day['sequence'] = f"Sc. {rng.randint(1, 120)}, {rng.randint(1, 120)}"
+        day['mainUnit'] = rng.choice(('Main Unit', 'Main Unit', 'Splinter Unit'))
+        day['extras'] = rng.randint(0, 60)
+        day['featuredExtras'] = rng.randint(0, 8)
+        day['departments'] = rng.sample(codes, min(len(codes), rng.randint(0, 5)))
+        day['notes'] = rng.choice(('', '', 'Night shoot', 'Weather cover available', 'Unit move at lunch'))
+
+def generate_dataset(scale: Dict, seed: int = 42) -> Dict:
+    """Write reference data, users, projects, calendars and versions into data/
+
+    Must run inside an activated sandbox.
+
+    Returns:
+        Manifest with the users (and their password), projects and the largest project
+    """
+    from utils.helpers import (
+        DATA_DIR, PROJECTS_DIR, save_global_data, save_project, generate_calendar, get_project_calendar,
+        save_project_calendar, migrate_project_to_versioned_structure, create_project_version,
+        publish_project_version
+    )
+    from utils.user_helpers import create_user
+
+    rng = random.Random(seed)
+    reference = _reference_data(rng, scale)
+    for name, items in reference.items():
+        save_global_data(f"{name}.json", items)
+
+    manifest = {'scale': scale, 'seed': seed, 'password': BENCHMARK_PASSWORD, 'users': [], 'projects': []}
+    today = date.today()
+    for u in range(scale['users']):
+        user, error = create_user(f"bench{u}", f"bench{u}@example.com", BENCHMARK_PASSWORD, role='admin')
+        if not user:
+            raise RuntimeError(f"Could not create user bench{u}: {error}")
+        manifest['users'].append({'id': user['id'], 'username': user['username']})
+
+        for p in range(scale['projects_per_user']):
+            project_id = f"bench-{u}-{p}"
+            prep_start = today - timedelta(days=rng.randint(0, scale['days'] // 2))
+            shoot_start = prep_start + timedelta(days=max(1, scale['days'] // 5))
+            wrap = prep_start + timedelta(days=scale['days'] - 1)
+            project = {
+                'id': project_id,
+                'title': f"Synthetic Production {u}-{p}",
+                'director': 'Synthetic Director',
+                'productionCompany': 'Benchmark Pictures',
+                'prepStartDate': prep_start.isoformat(),
+                'shootStartDate': shoot_start.isoformat(),
+                'wrapDate': wrap.isoformat(),
+            }
+
+            # Bank holidays, hiatus and working weekends are read from the legacy project folder
+            special_dir = os.path.join(PROJECTS_DIR, project_id)
+            os.makedirs(special_dir, exist_ok=True)
+            for name, items in _special_dates(rng, scale, prep_start, wrap).items():
+                with open(os.path.join(special_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+                    json.dump(items, f, indent=2)
+
+            save_project(project, user['id'])
+            generate_calendar(project, user['id'])
+            calendar_data = get_project_calendar(project_id, user['id'])
+            _fill_days(rng, calendar_data.get('days', []), reference)
+            save_project_calendar(project_id, calendar_data, user['id'])
+
+            # Migration publishes version 1.0; the rest are created and published on top of it
+            migrate_project_to_versioned_structure(project_id, user['id'])
+            for v in range(2, scale['versions'] + 1):
+                version = create_project_version(project_id, f"{v}.0", f"Synthetic version {v}", user['id'])
+                if version:
+                    publish_project_version(project_id, version['id'], user['id'])
+
+            manifest['projects'].append({'id': project_id, 'user_id': user['id'],
+                                         'username': user['username'], 'days': len(calendar_data.get('days', []))})
+
+    manifest['largest_project'] = max(manifest['projects'], key=lambda item: item['days'])
+    with open(os.path.join(DATA_DIR, 'benchmark_manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def add_scale_arguments(parser: argparse.ArgumentParser):
+    """--scale preset plus per-dimension overrides"""
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help="Dataset size preset (default: small)")
+    for name in SCALES['small']:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name, help=f"Override {name.replace('_', ' ')}")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed (default: 42)")
+
+def scale_from_args(args) -> Dict:
+    scale = dict(SCALES[args.scale])
+    for name in scale:
+        if getattr(args, name, None) is not None:
+            scale[name] = getattr(args, name)
+    return scale
+
+def main():
+    """Generate a dataset into a sandbox directory and print where it is"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_scale_arguments(parser)
+    parser.add_argument('--out', help="Sandbox directory to create (default: a new temporary directory)")
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+
+    sandbox = create_sandbox(args.out)
+    activate_sandbox(sandbox)
+    manifest = generate_dataset(scale_from_args(args), args.seed)
+
+    print("Film Scheduler - Synthetic Production Data")
+    print("==========================================")
+    print(f"Sandbox: {sandbox}")
+    print(f"Users: {len(manifest['users'])} (password: {manifest['password']})")
+    print(f"Projects: {len(manifest['projects'])}, largest {manifest['largest_project']['id']} "
+          f"({manifest['largest_project']['days']} days)")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
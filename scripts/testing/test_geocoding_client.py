@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test script for the pooled, rate-limited geocoding HTTP client
+Runs against a local stand-in for Nominatim, so no network access is needed
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.http_client import RateLimitedClient, RateLimitExceeded
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers /search like Nominatim; /flaky fails twice before succeeding"""
+    protocol_version = 'HTTP/1.1'
+    hits = {}
+    connections = set()
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        StandInHandler.hits[path] = StandInHandler.hits.get(path, 0) + 1
+        StandInHandler.connections.add(self.client_address)
+
+        if path == '/flaky' and StandInHandler.hits[path] <= 2:
+            self._send(503, {'error': 'busy'}, {'Retry-After': '0'})
+            return
+        if path == '/slow':
+            time.sleep(0.3)
+        self._send(200, [{'lat': '53.3498', 'lon': '-6.2603', 'display_name': 'Dublin, Ireland'}])
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def test_rate_limit(base_url):
+    """Test that waiting requests (background jobs) are spaced by the token bucket"""
+    print("=== Testing Rate Limiting ===")
+    client = RateLimitedClient(base_url, requests_per_second=5)
+    start = time.perf_counter()
+    for i in range(4):
+        client.get_json('/search', {'q': f'place {i}'}, wait=True)
+    elapsed = time.perf_counter() - start
+    print(f"4 requests at 5 req/s took {elapsed:.2f}s")
+    if elapsed < 0.55:
+        print("✗ Requests were not throttled")
+        return False
+    print("✓ Requests throttled")
+    return True
+
+def test_rate_limit_no_wait(base_url):
+    """Test that a request thread is turned away instead of sleeping for a token"""
+    print("\n=== Testing Rate Limiting Without Waiting ===")
+    client = RateLimitedClient(base_url, requests_per_second=1)
+    client.get_json('/search', {'q': 'first'})
+    start = time.perf_counter()
+    try:
+        client.get_json('/search', {'q': 'second'})
+    except RateLimitExceeded as e:
+        elapsed = time.perf_counter() - start
+        print(f"Rejected after {elapsed:.3f}s, retry after {e.retry_after:.2f}s")
+        if elapsed > 0.1 or e.retry_after <= 0:
+            print("✗ Rejection was slow or had no retry time")
+            return False
+        print("✓ Rejected immediately")
+        return True
+    print("✗ Second request was not rate limited")
+    return False
+
+def test_connection_reuse(base_url):
+    """Test that the session keeps connections alive"""
+    print("\n=== Testing Connection Pooling ===")
+    StandInHandler.connections.clear()
+    client = RateLimitedClient(base_url, requests_per_second=50)
+    for i in range(5):
+        client.get_json('/search', {'q': f'pooled {i}'}, wait=True)
+    print(f"5 requests used {len(StandInHandler.connections)} connection(s)")
+    if len(StandInHandler.connections) != 1:
+        print("✗ Connections were not reused")
+        return False
+    print("✓ Connection reused")
+    return True
+
+def test_coalescing(base_url):
+    """Test that identical concurrent queries share one request"""
+    print("\n=== Testing Request Coalescing ===")
+    StandInHandler.hits.pop('/slow', None)
+    client = RateLimitedClient(base_url, requests_per_second=50)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get_json('/slow', {'q': 'Dublin'})))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    hits = StandInHandler.hits.get('/slow', 0)
+    print(f"5 concurrent callers -> {hits} upstream request(s), {client.stats()['coalesced']} coalesced")
+    if hits != 1 or len(results) != 5:
+        print("✗ Identical queries were not coalesced")
+        return False
+    print("✓ Identical queries coalesced")
+    return True
+
+def test_retry(base_url):
+    """Test retry with backoff on transient 503s"""
+    print("\n=== Testing Retry ===")
+    client = RateLimitedClient(base_url, requests_per_second=50, max_retries=2, backoff_seconds=0.05)
+    data = client.get_json('/flaky', wait=True)
+    print(f"Stats: {client.stats()}")
+    if not data or client.stats()['retries'] != 2:
+        print("✗ Retry did not recover")
+        return False
+    print("✓ Recovered after retries")
+    return True
+
+def main():
+    """Run all tests"""
+    print("Geocoding HTTP Client Test Suite")
+    print("=" * 50)
+
+    server, base_url = start_server()
+    tests = [test_rate_limit, test_rate_limit_no_wait, test_connection_reuse, test_coalescing, test_retry]
+    passed = 0
+    try:
+        for test in tests:
+            try:
+                if test(base_url):
+                    passed += 1
+                else:
+                    print(f"✗ {test.__name__} failed")
+            except Exception as e:
+                print(f"✗ {test.__name__} threw exception: {e}")
+    finally:
+        server.shutdown()
+
+    print("\n" + "=" * 50)
+    print(f"Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test script for public calendar access codes and tokens
+Publishes into a temporary data directory, so real published calendars are untouched
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import shutil
+import tempfile
+
+from utils.access_manager import ProjectAccessManager
+
+PROJECT = {'name': 'Access Test'}
+
+def calendar_with(note):
+    return {'days': [{'date': '2025-03-01', 'isShootDay': True, 'notes': note}]}
+
+def payload_files(manager):
+    return sorted(name for name in os.listdir(manager.payloads_root) if name.endswith('.json'))
+
+def test_unchanged_republish(manager):
+    """Test that republishing identical content keeps the code and token"""
+    print("=== Testing Unchanged Republish ===")
+    first = manager.publish_calendar_with_access('user-1', 'project-1', calendar_with('v1'), PROJECT)
+    again = manager.publish_calendar_with_access('user-1', 'project-1', calendar_with('v1'), PROJECT)
+    print(f"Code {first['access_code']} -> {again['access_code']}")
+    if (first['access_code'], first['access_token']) != (again['access_code'], again['access_token']):
+        print("✗ Identical content got new identifiers")
+        return False
+    print("✓ Existing code and token kept")
+    return True
+
+def test_changed_republish(manager):
+    """Test that new content retires the old code, token and payload"""
+    print("\n=== Testing Changed Republish ===")
+    old = manager.get_project_access_info('user-1', 'project-1')
+    new = manager.publish_calendar_with_access('user-1', 'project-1', calendar_with('v2'), PROJECT)
+    print(f"Code {old['access_code']} -> {new['access_code']}, payloads: {len(payload_files(manager))}")
+
+    if manager.resolve_access_token(old['access_token']) or manager.resolve_access_code(old['access_code']):
+        print("✗ Old token or code still resolves")
+        return False
+    if manager.get_calendar_by_token(old['access_token']) is not None:
+        print("✗ Old token still serves a calendar")
+        return False
+    calendar = manager.get_calendar_by_token(new['access_token'])
+    if not calendar or calendar['calendar']['days'][0]['notes'] != 'v2':
+        print("✗ New token does not serve the new calendar")
+        return False
+    if len(payload_files(manager)) != 1:
+        print("✗ Old payload file was left behind")
+        return False
+    print("✓ Old identifiers stop resolving and the old payload is gone")
+    return True
+
+def test_shared_payload(manager):
+    """Test that a payload still used by another project is kept"""
+    print("\n=== Testing Shared Payload ===")
+    manager.publish_calendar_with_access('user-2', 'project-2', calendar_with('v2'), PROJECT)
+    manager.publish_calendar_with_access('user-1', 'project-1', calendar_with('v3'), PROJECT)
+    other = manager.get_project_access_info('user-2', 'project-2')
+    if manager.get_calendar_by_code(other['access_code']) is None:
+        print("✗ Payload still used by another project was deleted")
+        return False
+    print("✓ Shared payload kept")
+    return True
+
+def main():
+    """Run all tests"""
+    print("Public Access Test Suite")
+    print("=" * 50)
+
+    data_root = tempfile.mkdtemp(prefix='public-access-test-')
+    manager = ProjectAccessManager(data_root)
+    tests = [test_unchanged_republish, test_changed_republish, test_shared_payload]
+    passed = 0
+    try:
+        for test in tests:
+            try:
+                if test(manager):
+                    passed += 1
+                else:
+                    print(f"✗ {test.__name__} failed")
+            except Exception as e:
+                print(f"✗ {test.__name__} threw exception: {e}")
+    finally:
+        shutil.rmtree(data_root, ignore_errors=True)
+
+    print("\n" + "=" * 50)
+    print(f"Test Results: {passed}/{len(tests)} tests passed")
+    return passed == len(tests)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Geocode every location in data/locations.json that is missing coordinates
+Run this script from the project root directory:
+
+    python scripts/tools/geocode_locations.py [--dry-run]
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import argparse
+import logging
+
+from utils.bulk_geocoding import BulkGeocodingJob
+
+def main():
+    """Run a bulk geocoding job in the foreground and print its report"""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help="Report matches without writing locations.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    print("Film Scheduler - Bulk Location Geocoding")
+    print("========================================")
+
+    job = BulkGeocodingJob(dry_run=args.dry_run)
+    job.run()
+
+    if job.status == 'failed':
+        print(f"\nJob failed: {job.error}")
+        return False
+
+    print(f"\nLocations missing coordinates: {job.total}")
+    for item in job.geocoded:
+        print(f"  ✓ {item['name']}: {item['latitude']:.5f}, {item['longitude']:.5f} ({item['match']})")
+    for item in job.failed:
+        print(f"  ✗ {item['name']}: {item['reason']} (query: '{item['query']}')")
+
+    print(f"\nGeocoded: {len(job.geocoded)}, Failed: {len(job.failed)}")
+    if args.dry_run:
+        print("Dry run - locations.json was not modified.")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
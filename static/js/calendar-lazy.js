@@ -0,0 +1,156 @@
+/**
+ * Lazy-loaded calendar months
+ * The viewer renders the current and next month; every other month is a
+ * placeholder <tbody class="calendar-month" data-loaded="false"> whose rows are
+ * fetched from the table's data-rows-url when it scrolls near the viewport.
+ * window.calendarData likewise starts with only the rendered months' days; each
+ * fetched month's days are merged into it.
+ * File: static/js/calendar-lazy.js
+ */
+
+const CalendarLazyLoader = {
+    table: null,
+    pending: {},
+
+    init() {
+        this.table = document.querySelector('.calendar-table[data-rows-url]');
+        if (!this.table || !this.unloadedMonths().length) return;
+
+        if ('IntersectionObserver' in window) {
+            const observer = new IntersectionObserver(entries => {
+                entries.forEach(entry => {
+                    if (entry.isIntersecting) {
+                        observer.unobserve(entry.target);
+                        this.loadMonth(entry.target.dataset.month);
+                    }
+                });
+            }, { rootMargin: '800px 0px' });
+            this.unloadedMonths().forEach(tbody => observer.observe(tbody));
+        } else {
+            this.loadAll();
+        }
+
+        // Search, printing and jumping to a day all need rows that may not be loaded yet
+        const searchInput = document.getElementById('calendar-search');
+        if (searchInput) {
+            searchInput.addEventListener('input', () => this.loadAll(), { once: true });
+        }
+        window.addEventListener('beforeprint', () => this.loadAll());
+
+        // The grid view draws every month from window.calendarData
+        document.addEventListener('click', event => {
+            if (event.target.closest('.view-toggle-btn[data-view="calendar"]')) {
+                this.loadAll();
+            }
+        });
+
+        const todayButton = document.getElementById('go-to-today-btn');
+        if (todayButton) {
+            // Capture phase so today's month is in the table before goToToday() looks for it
+            todayButton.addEventListener('click', event => {
+                const today = new Date().toISOString().split('T')[0];
+                if (!this.isMonthLoaded(today.slice(0, 7))) {
+                    event.stopImmediatePropagation();
+                    this.loadMonth(today.slice(0, 7)).then(() => goToToday());
+                }
+            }, true);
+        }
+
+        const anchor = window.location.hash.match(/^#day-(\d{4}-\d{2})-\d{2}$/);
+        if (anchor && !this.isMonthLoaded(anchor[1])) {
+            this.loadMonth(anchor[1]).then(() => scrollToDay(window.location.hash.slice(5)));
+        }
+    },
+
+    unloadedMonths() {
+        return Array.from(this.table.querySelectorAll('tbody.calendar-month[data-loaded="false"]'));
+    },
+
+    monthBody(month) {
+        return this.table.querySelector(`tbody.calendar-month[data-month="${month}"]`);
+    },
+
+    isMonthLoaded(month) {
+        const tbody = this.monthBody(month);
+        return !tbody || tbody.dataset.loaded === 'true';
+    },
+
+    loadMonth(month) {
+        const tbody = this.monthBody(month);
+        if (!tbody || tbody.dataset.loaded === 'true') return Promise.resolve();
+        if (this.pending[month]) return this.pending[month];
+
+        const url = new URL(this.table.dataset.rowsUrl, window.location.origin);
+        url.searchParams.set('month', month);
+
+        this.pending[month] = fetch(url, { credentials: 'same-origin' })
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.text();
+            })
+            .then(html => {
+                tbody.innerHTML = html;
+                tbody.dataset.loaded = 'true';
+                const daysScript = tbody.querySelector('script.calendar-month-days');
+                if (daysScript) {
+                    this.mergeDays(month, JSON.parse(daysScript.textContent));
+                    daysScript.remove();
+                }
+                this.refreshRows();
+            })
+            .catch(error => {
+                console.error(`Error loading calendar month ${month}:`, error);
+                delete this.pending[month];
+            });
+        return this.pending[month];
+    },
+
+    /**
+     * Add one month's days to window.calendarData, keeping the days in date order
+     */
+    mergeDays(month, days) {
+        const calendarData = window.calendarData;
+        if (!calendarData || !Array.isArray(calendarData.days)) return;
+        calendarData.days = calendarData.days
+            .filter(day => !(day.date || '').startsWith(month))
+            .concat(days)
+            .sort((a, b) => (a.date || '').localeCompare(b.date || ''));
+        calendarData.loadedMonths = Array.from(new Set((calendarData.loadedMonths || []).concat(month))).sort();
+    },
+
+    loadAll() {
+        return Promise.all(this.unloadedMonths().map(tbody => this.loadMonth(tbody.dataset.month)));
+    },
+
+    /**
+     * Re-run the DOM passes from calendar.js so new rows match the rendered ones
+     */
+    refreshRows() {
+        try {
+            applyLocationAreaColors(getLocationAreas());
+            applyDepartmentTagColors();
+            addAnchorIdsToCalendarRows();
+            applyAllFilters();
+            if (window.locationFilter) {
+                window.locationFilter.applyFilters();
+            }
+
+            const searchInput = document.getElementById('calendar-search');
+            if (searchInput && searchInput.value.trim()) {
+                applySearchFilter(searchInput.value.trim());
+            }
+
+            if (window.calendarView) {
+                window.calendarView.updateData(window.calendarData || extractCalendarDataFromDOM(),
+                    window.calendarView.locations, window.calendarView.departments);
+            }
+            updateGoToTodayButton();
+        } catch (error) {
+            console.error('Error refreshing lazy-loaded calendar rows:', error);
+        }
+    }
+};
+
+window.CalendarLazyLoader = CalendarLazyLoader;
+
+document.addEventListener('DOMContentLoaded', () => CalendarLazyLoader.init());
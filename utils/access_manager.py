@@ -1,37 +1,187 @@
 import os
 import json
+import time
+import atexit
+import hashlib
 import secrets
 import string
+import logging
+import threading
 from datetime import datetime, timezone
 from typing import Dict, Optional, Tuple, List
 
+from .file_utils import load_json_file, save_json_file_atomic
+from .compression import write_precompressed
+
+logger = logging.getLogger(__name__)
+
+# Seconds between flushes of buffered view counts to access_stats.json
+ACCESS_STATS_FLUSH_INTERVAL = float(os.environ.get('ACCESS_STATS_FLUSH_INTERVAL', 30))
+
+
+class AccessStatsCounter:
+    """Write-behind view counters for public calendars
+    
+    Views are counted in memory and merged into a small stats file every
+    flush_interval seconds and at interpreter exit, so the published
+    calendar payloads are never rewritten on the read path.
+    """
+    
+    def __init__(self, stats_file: str, flush_interval: float = ACCESS_STATS_FLUSH_INTERVAL):
+        self.stats_file = stats_file
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+    
+    def record(self, key: str):
+        """Count one view for key"""
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            entry = self._pending.setdefault(key, {'view_count': 0, 'last_accessed': None})
+            entry['view_count'] += 1
+            entry['last_accessed'] = now
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='access-stats-flush', daemon=True)
+                self._flusher.start()
+    
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+    
+    def flush(self):
+        """Merge buffered counts into the stats file"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            
+            stats = load_json_file(self.stats_file, default={}) or {}
+            for key, delta in pending.items():
+                entry = stats.setdefault(key, {'view_count': 0, 'last_accessed': None})
+                entry['view_count'] = entry.get('view_count', 0) + delta['view_count']
+                entry['last_accessed'] = delta['last_accessed']
+            
+            if not save_json_file_atomic(self.stats_file, stats):
+                # Put the counts back so they are retried on the next flush
+                with self._lock:
+                    for key, delta in pending.items():
+                        entry = self._pending.setdefault(key, {'view_count': 0, 'last_accessed': None})
+                        entry['view_count'] += delta['view_count']
+                        entry['last_accessed'] = entry['last_accessed'] or delta['last_accessed']
+                logger.warning(f"Could not flush access stats to {self.stats_file}")
+    
+    def get_all(self) -> Dict[str, Dict]:
+        """Persisted stats combined with counts not yet flushed"""
+        stats = load_json_file(self.stats_file, default={}) or {}
+        with self._lock:
+            for key, delta in self._pending.items():
+                entry = dict(stats.get(key) or {'view_count': 0, 'last_accessed': None})
+                entry['view_count'] = entry.get('view_count', 0) + delta['view_count']
+                entry['last_accessed'] = delta['last_accessed']
+                stats[key] = entry
+        return stats
+    
+    def remove(self, key: str):
+        """Forget stats for key (e.g. when access is revoked)"""
+        with self._flush_lock:
+            with self._lock:
+                self._pending.pop(key, None)
+            stats = load_json_file(self.stats_file, default={}) or {}
+            if stats.pop(key, None) is not None:
+                save_json_file_atomic(self.stats_file, stats)
+
+
+_stats_counters: Dict[str, AccessStatsCounter] = {}
+_stats_counters_lock = threading.Lock()
+
+def get_access_stats_counter(stats_file: str) -> AccessStatsCounter:
+    """Return the process-wide counter for a stats file
+    
+    Shared so every ProjectAccessManager instance sees unflushed views.
+    """
+    stats_file = os.path.abspath(stats_file)
+    with _stats_counters_lock:
+        counter = _stats_counters.get(stats_file)
+        if counter is None:
+            counter = AccessStatsCounter(stats_file)
+            _stats_counters[stats_file] = counter
+            atexit.register(counter.flush)
+        return counter
+
+
 class ProjectAccessManager:
     """Manages public access codes and tokens for calendar sharing"""
     
     def __init__(self, data_root="data"):
         self.data_root = data_root
         self.public_root = os.path.join(data_root, "public")
+        self.payloads_root = os.path.join(self.public_root, "payloads")
         self.access_registry = os.path.join(self.public_root, "access_registry.json")
+        self.access_stats = get_access_stats_counter(os.path.join(self.public_root, "access_stats.json"))
+        # In-memory registry, revalidated against the file's mtime/size
+        self._registry: Dict = self._empty_registry()
+        self._registry_signature = None
+        self._lock = threading.RLock()
+        # Registry lookups served from memory vs. re-read from disk
+        self.registry_hits = 0
+        self.registry_reloads = 0
         self._ensure_directories()
     
     def _ensure_directories(self):
         """Create necessary directories for public access"""
         os.makedirs(self.public_root, exist_ok=True)
     
+    @staticmethod
+    def _empty_registry() -> Dict:
+        return {'codes': {}, 'tokens': {}, 'projects': {}}
+    
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.access_registry)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
     def _load_registry(self) -> Dict:
-        """Load the access registry"""
-        if os.path.exists(self.access_registry):
-            try:
-                with open(self.access_registry, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                return {}
-        return {}
+        """Return the access registry, re-reading the file only if it changed
+        
+        The returned dict is shared; callers that modify it must hold self._lock
+        and call _save_registry.
+        """
+        with self._lock:
+            signature = self._file_signature()
+            if signature == self._registry_signature:
+                self.registry_hits += 1
+                return self._registry
+            
+            self.registry_reloads += 1
+            registry = self._empty_registry()
+            if signature is not None:
+                try:
+                    with open(self.access_registry, 'r') as f:
+                        registry.update(json.load(f))
+                except (json.JSONDecodeError, IOError):
+                    pass
+            for section in ('codes', 'tokens', 'projects'):
+                registry.setdefault(section, {})
+            
+            self._registry = registry
+            self._registry_signature = signature
+            return registry
     
     def _save_registry(self, registry: Dict):
-        """Save the access registry"""
-        with open(self.access_registry, 'w') as f:
-            json.dump(registry, f, indent=2)
+        """Save the access registry atomically and keep it as the cached copy"""
+        with self._lock:
+            if not save_json_file_atomic(self.access_registry, registry):
+                # Drop the (possibly modified) cached copy so the next read reloads the file
+                self._registry_signature = None
+                raise IOError(f"Could not write access registry {self.access_registry}")
+            self._registry = registry
+            self._registry_signature = self._file_signature()
     
     def generate_access_code(self, length: int = 8) -> str:
         """Generate human-friendly access code like 'HAMLET24'
@@ -46,8 +196,8 @@ class ProjectAccessManager:
         code = ''.join(secrets.choice(safe_chars) for _ in range(length))
         
         # Ensure code doesn't already exist
-        registry = self._load_registry()
-        while code in registry.get('codes', {}):
+        codes = self._load_registry()['codes']
+        while code in codes:
             code = ''.join(secrets.choice(safe_chars) for _ in range(length))
         
         return code
@@ -61,81 +211,110 @@ class ProjectAccessManager:
         token = ''.join(secrets.choice(safe_chars) for _ in range(length))
         
         # Ensure token doesn't already exist
-        registry = self._load_registry()
-        while token in registry.get('tokens', {}):
+        tokens = self._load_registry()['tokens']
+        while token in tokens:
             token = ''.join(secrets.choice(safe_chars) for _ in range(length))
         
         return token
     
+    def _payload_path(self, payload_hash: str) -> str:
+        return os.path.join(self.payloads_root, f"{payload_hash}.json")
+    
+    def _store_payload(self, public_data: Dict) -> str:
+        """Write a public payload under its content hash, skipping identical content
+        
+        Returns the payload hash
+        """
+        serialized = json.dumps(public_data, sort_keys=True, separators=(',', ':'))
+        payload_hash = hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+        payload_path = self._payload_path(payload_hash)
+        if not os.path.exists(payload_path):
+            if not save_json_file_atomic(payload_path, public_data):
+                raise IOError(f"Could not write public payload {payload_path}")
+            # Compress once at publish time; payloads are immutable
+            try:
+                write_precompressed(payload_path)
+            except OSError as e:
+                logger.warning(f"Could not precompress public payload {payload_path}: {e}")
+        return payload_hash
+    
     def publish_calendar_with_access(self, user_id: str, project_id: str, 
                                    calendar_data: Dict, project_data: Dict) -> Dict:
         """Publish calendar and create public access
         
+        The payload is stored once, addressed by its content hash; the access
+        code and token are registry entries pointing at it. Republishing
+        unchanged content returns the existing access info without writing;
+        new content replaces the project's previous code and token, so old
+        links stop resolving, and deletes the payload they pointed at.
+        
         Returns access info with code and token
         """
-        # Generate access identifiers
-        access_code = self.generate_access_code()
-        access_token = self.generate_access_token()
+        # Create public calendar data
+        public_data = {
+            "project": {
+                "name": project_data.get("name", "Unknown Project"),
+                "id": project_id
+            },
+            "calendar": calendar_data
+        }
+        payload_hash = self._store_payload(public_data)
+        
+        with self._lock:
+            registry = self._load_registry()
+            project_key = f"{user_id}:{project_id}"
+            current = registry['projects'].get(project_key)
+            if current and current.get('payload') == payload_hash:
+                return self.get_project_access_info(user_id, project_id)
+            
+            # Generate access identifiers
+            access_code = self.generate_access_code()
+            access_token = self.generate_access_token()
+            created_at = datetime.now(timezone.utc).isoformat()
+            
+            if current:
+                registry['codes'].pop(current.get('access_code'), None)
+                registry['tokens'].pop(current.get('access_token'), None)
+            self._register_access(registry, user_id, project_id, access_code, access_token,
+                                  created_at, payload_hash)
+            self._save_registry(registry)
+            if current:
+                self._remove_unused_payload(registry, current.get('payload'))
+        
+        if current:
+            self.access_stats.remove(current.get('access_code'))
+            self._remove_legacy_copies(current.get('access_code'), current.get('access_token'))
         
-        # Create access info
-        access_info = {
+        return {
             "access_code": access_code,
             "access_token": access_token,
             "user_id": user_id,
             "project_id": project_id,
-            "created_at": datetime.now(timezone.utc).isoformat(),
+            "created_at": created_at,
             "expires_at": None,  # No expiration for now
             "view_count": 0,
             "last_accessed": None
         }
-        
-        # Create public calendar data
-        public_data = {
-            "project": {
-                "name": project_data.get("name", "Unknown Project"),
-                "id": project_id,
-                "published_at": access_info["created_at"]
-            },
-            "calendar": calendar_data,
-            "access": access_info
-        }
-        
-        # Save to both code and token directories
-        code_dir = os.path.join(self.public_root, access_code)
-        token_dir = os.path.join(self.public_root, access_token)
-        
-        os.makedirs(code_dir, exist_ok=True)
-        os.makedirs(token_dir, exist_ok=True)
-        
-        # Save calendar data
-        with open(os.path.join(code_dir, "calendar.json"), 'w') as f:
-            json.dump(public_data, f, indent=2)
-        
-        with open(os.path.join(token_dir, "calendar.json"), 'w') as f:
-            json.dump(public_data, f, indent=2)
-        
-        # Update registry
-        registry = self._load_registry()
-        if 'codes' not in registry:
-            registry['codes'] = {}
-        if 'tokens' not in registry:
-            registry['tokens'] = {}
-        if 'projects' not in registry:
-            registry['projects'] = {}
-        
-        # Map access identifiers to project
+    
+    @staticmethod
+    def _register_access(registry: Dict, user_id: str, project_id: str,
+                         access_code: str, access_token: str, created_at: str,
+                         payload_hash: str):
+        """Map access identifiers to a project and its payload in the registry"""
         registry['codes'][access_code] = {
             "user_id": user_id,
             "project_id": project_id,
             "token": access_token,
-            "created_at": access_info["created_at"]
+            "payload": payload_hash,
+            "created_at": created_at
         }
         
         registry['tokens'][access_token] = {
             "user_id": user_id,
             "project_id": project_id,
             "code": access_code,
-            "created_at": access_info["created_at"]
+            "payload": payload_hash,
+            "created_at": created_at
         }
         
         # Map project to current access
@@ -143,127 +322,163 @@ class ProjectAccessManager:
         registry['projects'][project_key] = {
             "access_code": access_code,
             "access_token": access_token,
-            "created_at": access_info["created_at"]
+            "payload": payload_hash,
+            "created_at": created_at
         }
-        
-        self._save_registry(registry)
-        
-        return access_info
+    
+    def _remove_unused_payload(self, registry: Dict, payload_hash: Optional[str]):
+        """Delete a payload (and its compressed copies) once no code points at it"""
+        if not payload_hash or any(entry.get('payload') == payload_hash
+                                   for entry in registry['codes'].values()):
+            return
+        payload_path = self._payload_path(payload_hash)
+        for path in (payload_path, payload_path + '.gz', payload_path + '.br'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def resolve_access_code(self, access_code: str) -> Optional[Dict]:
+        """Look up the registry entry (user_id, project_id, token) for an access code"""
+        return self._load_registry()['codes'].get(access_code)
+    
+    def resolve_access_token(self, access_token: str) -> Optional[Dict]:
+        """Look up the registry entry (user_id, project_id, code) for an access token"""
+        return self._load_registry()['tokens'].get(access_token)
+    
+    def get_payload_file(self, access_identifier: str) -> Optional[Tuple[str, str]]:
+        """(payload hash, file path) of the published payload for a code or token"""
+        access_entry = self.resolve_access_code(access_identifier) or self.resolve_access_token(access_identifier)
+        if not access_entry or not access_entry.get('payload'):
+            return None
+        payload_path = os.path.abspath(self._payload_path(access_entry['payload']))
+        if not os.path.exists(payload_path):
+            return None
+        return access_entry['payload'], payload_path
     
     def get_calendar_by_code(self, access_code: str) -> Optional[Dict]:
         """Retrieve calendar data by access code"""
-        return self._get_calendar_data(access_code)
+        return self._get_calendar_data(self.resolve_access_code(access_code), access_code)
     
     def get_calendar_by_token(self, access_token: str) -> Optional[Dict]:
         """Retrieve calendar data by access token"""
-        return self._get_calendar_data(access_token)
+        return self._get_calendar_data(self.resolve_access_token(access_token), access_token)
     
-    def _get_calendar_data(self, access_identifier: str) -> Optional[Dict]:
+    def _get_calendar_data(self, access_entry: Optional[Dict], access_identifier: str) -> Optional[Dict]:
         """Internal method to get calendar data"""
-        calendar_path = os.path.join(self.public_root, access_identifier, "calendar.json")
+        if access_entry and access_entry.get('payload'):
+            calendar_path = self._payload_path(access_entry['payload'])
+        else:
+            # Publications made before payloads were shared keep a copy per identifier
+            calendar_path = os.path.join(self.public_root, access_identifier, "calendar.json")
         
         if not os.path.exists(calendar_path):
             return None
         
         try:
             with open(calendar_path, 'r') as f:
-                data = json.load(f)
-            
-            # Update access stats
-            self.update_access_stats(access_identifier)
-            
-            return data
+                return json.load(f)
         except (json.JSONDecodeError, IOError):
             return None
     
     def update_access_stats(self, access_identifier: str):
-        """Track view counts and last access"""
-        calendar_path = os.path.join(self.public_root, access_identifier, "calendar.json")
+        """Track view counts and last access
         
-        if not os.path.exists(calendar_path):
+        Counts are buffered in memory and flushed to access_stats.json; code and
+        token views are both counted against the access code.
+        """
+        registry = self._load_registry()
+        if access_identifier in registry['codes']:
+            access_code = access_identifier
+        elif access_identifier in registry['tokens']:
+            access_code = registry['tokens'][access_identifier].get('code')
+        else:
             return
-        
-        try:
-            with open(calendar_path, 'r') as f:
-                data = json.load(f)
-            
-            # Update stats
-            data['access']['view_count'] = data['access'].get('view_count', 0) + 1
-            data['access']['last_accessed'] = datetime.now(timezone.utc).isoformat()
-            
-            # Save updated data
-            with open(calendar_path, 'w') as f:
-                json.dump(data, f, indent=2)
-                
-            # Also update the paired access method (code <-> token)
-            if len(access_identifier) == 8:  # It's a code
-                token = data['access']['access_token']
-                token_path = os.path.join(self.public_root, token, "calendar.json")
-            else:  # It's a token
-                code = data['access']['access_code']
-                token_path = os.path.join(self.public_root, code, "calendar.json")
-            
-            # Update paired access data
-            if os.path.exists(token_path):
-                with open(token_path, 'w') as f:
-                    json.dump(data, f, indent=2)
-                    
-        except (json.JSONDecodeError, IOError):
-            pass
+        self.access_stats.record(access_code)
+    
+    def view_counts_by_project(self) -> Dict[str, int]:
+        """Total public views per project id (access codes themselves stay private)"""
+        registry = self._load_registry()
+        counts: Dict[str, int] = {}
+        for access_code, stats in self.access_stats.get_all().items():
+            project_id = (registry['codes'].get(access_code) or {}).get('project_id')
+            if project_id:
+                counts[project_id] = counts.get(project_id, 0) + stats.get('view_count', 0)
+        return counts
+    
+    def _get_view_stats(self, access_code: str, all_stats: Dict) -> Dict:
+        """View stats for a code, falling back to counts stored by older versions in the payload"""
+        if access_code in all_stats:
+            return all_stats[access_code]
+        if (self.resolve_access_code(access_code) or {}).get('payload'):
+            return {'view_count': 0, 'last_accessed': None}
+        calendar_data = self.get_calendar_by_code(access_code) or {}
+        legacy = calendar_data.get('access', {})
+        return {'view_count': legacy.get('view_count', 0), 'last_accessed': legacy.get('last_accessed')}
     
     def get_project_access_info(self, user_id: str, project_id: str) -> Optional[Dict]:
         """Get access information for a project"""
         registry = self._load_registry()
         project_key = f"{user_id}:{project_id}"
         
-        if project_key not in registry.get('projects', {}):
+        if project_key not in registry['projects']:
             return None
         
         access_data = registry['projects'][project_key]
         access_code = access_data['access_code']
+        view_stats = self._get_view_stats(access_code, self.access_stats.get_all())
         
-        # Get current stats from calendar data
-        calendar_data = self.get_calendar_by_code(access_code)
-        if calendar_data:
-            return calendar_data['access']
-        
-        return None
+        return {
+            "access_code": access_code,
+            "access_token": access_data['access_token'],
+            "user_id": user_id,
+            "project_id": project_id,
+            "created_at": access_data.get('created_at'),
+            "expires_at": None,
+            "view_count": view_stats.get('view_count', 0),
+            "last_accessed": view_stats.get('last_accessed')
+        }
     
     def revoke_access(self, user_id: str, project_id: str) -> bool:
         """Revoke public access for a project"""
-        registry = self._load_registry()
-        project_key = f"{user_id}:{project_id}"
-        
-        if project_key not in registry.get('projects', {}):
-            return False
-        
-        access_data = registry['projects'][project_key]
-        access_code = access_data['access_code']
-        access_token = access_data['access_token']
-        
-        # Remove from registry
-        registry['codes'].pop(access_code, None)
-        registry['tokens'].pop(access_token, None)
-        registry['projects'].pop(project_key, None)
-        
-        # Remove directories
-        code_dir = os.path.join(self.public_root, access_code)
-        token_dir = os.path.join(self.public_root, access_token)
-        
-        try:
-            if os.path.exists(code_dir):
-                import shutil
-                shutil.rmtree(code_dir)
+        with self._lock:
+            registry = self._load_registry()
+            project_key = f"{user_id}:{project_id}"
             
-            if os.path.exists(token_dir):
-                import shutil
-                shutil.rmtree(token_dir)
-        except OSError:
-            pass
+            if project_key not in registry['projects']:
+                return False
+            
+            access_data = registry['projects'][project_key]
+            access_code = access_data['access_code']
+            access_token = access_data['access_token']
+            
+            # Remove from registry
+            registry['codes'].pop(access_code, None)
+            registry['tokens'].pop(access_token, None)
+            registry['projects'].pop(project_key, None)
+            self._save_registry(registry)
+            
+            self._remove_unused_payload(registry, access_data.get('payload'))
+        
+        self.access_stats.remove(access_code)
+        self._remove_legacy_copies(access_code, access_token)
         
-        self._save_registry(registry)
         return True
     
+    def _remove_legacy_copies(self, access_code: str, access_token: str):
+        """Remove directories left by publications made before payloads were shared"""
+        import shutil
+        for identifier in (access_code, access_token):
+            # An empty identifier would name public_root itself
+            if not identifier:
+                continue
+            legacy_dir = os.path.join(self.public_root, identifier)
+            try:
+                if os.path.isdir(legacy_dir):
+                    shutil.rmtree(legacy_dir)
+            except OSError:
+                pass
+    
     def cleanup_expired_access(self) -> int:
         """Clean up expired access codes (future feature)
         
@@ -276,16 +491,15 @@ class ProjectAccessManager:
     def get_access_statistics(self, user_id: str) -> Dict:
         """Get access statistics for a user's projects"""
         registry = self._load_registry()
-        user_projects = {k: v for k, v in registry.get('projects', {}).items() 
+        user_projects = {k: v for k, v in registry['projects'].items() 
                         if k.startswith(f"{user_id}:")}
         
         total_views = 0
         total_projects = len(user_projects)
+        all_stats = self.access_stats.get_all()
         
         for project_key, access_data in user_projects.items():
-            calendar_data = self.get_calendar_by_code(access_data['access_code'])
-            if calendar_data:
-                total_views += calendar_data['access'].get('view_count', 0)
+            total_views += self._get_view_stats(access_data['access_code'], all_stats).get('view_count', 0)
         
         return {
             "total_projects_shared": total_projects,
@@ -299,5 +513,4 @@ class ProjectAccessManager:
             return False
         
         registry = self._load_registry()
-        return (identifier in registry.get('codes', {}) or 
-                identifier in registry.get('tokens', {}))
\ No newline at end of file
+        return identifier in registry['codes'] or identifier in registry['tokens']
\ No newline at end of file
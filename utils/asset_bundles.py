@@ -0,0 +1,269 @@
+"""
+CSS/JS bundling
+Concatenates the stylesheets and scripts each page type loads into one
+fingerprinted CSS and one JS file (stylesheets are also minified), built once
+at startup and held in memory (with gzip/brotli variants). In debug mode the individual files are linked instead.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import posixpath
+from typing import Dict, List, Optional
+
+from flask import abort, request, make_response, url_for
+from markupsafe import Markup, escape
+
+from .compression import brotli, compress_bytes, choose_encoding
+
+logger = logging.getLogger(__name__)
+
+# Bundle name -> files (relative to static/) in the order the templates loaded them
+ASSET_BUNDLES: Dict[str, Dict[str, List[str]]] = {
+    'base': {
+        'css': [
+            'css/style.css',
+            'css/header.css',
+            'css/dashboard.css',
+            'css/components/buttons.css',
+            'css/components/cards.css',
+            'css/components/animations.css',
+            'css/theme.css',
+            'css/components/modals.css',
+            'css/components/calendar-core.css',
+            'css/components/calendar-layout.css',
+        ],
+        'js': [
+            'js/theme-toggle.js',
+            'js/mobile-menu.js',
+            'js/print-manager.js',
+        ],
+    },
+    'viewer': {
+        'css': [
+            'css/components/calendar-viewer.css',
+            'css/components/calendar-table.css',
+            'css/components/calendar-counters.css',
+            'css/components/calendar-filters.css',
+            'css/components/calendar-interactions.css',
+            'css/calendar-view.css',
+            'css/components/calendar-mobile.css',
+            'css/components/calendar-print.css',
+        ],
+        'js': [
+            'js/calendar-view.js',
+            'js/calendar.js',
+            'js/calendar-lazy.js',
+        ],
+    },
+    'admin-calendar': {
+        'css': [
+            'css/components/calendar-viewer.css',
+            'css/components/calendar-table.css',
+            'css/components/calendar-counters.css',
+            'css/components/calendar-filters.css',
+            'css/components/calendar-interactions.css',
+            'css/version-manager.css',
+            'css/calendar-view.css',
+            'css/components/calendar-mobile.css',
+            'css/components/calendar-print.css',
+        ],
+        'js': [
+            'js/version-manager.js',
+            'js/calendar-dragdrop.js',
+            'js/calendar-view.js',
+            'js/calendar.js',
+        ],
+    },
+}
+
+CONTENT_TYPES = {'css': 'text/css; charset=utf-8', 'js': 'text/javascript; charset=utf-8'}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+# --- CSS ---
+
+_CSS_STRING = r'"(?:\\.|[^"\\\n])*"' + r"|'(?:\\.|[^'\\\n])*'"
+# Strings are matched first so a '/*' inside one is not taken for a comment
+_CSS_COMMENT = re.compile(rf'({_CSS_STRING})|/\*.*?\*/', re.S)
+_CSS_STRING_LITERAL = re.compile(_CSS_STRING)
+_CSS_IMPORT = re.compile(r'''@import\s+(?:url\(\s*)?(['"]?)([^'")\s]+)\1\s*\)?\s*([^;]*);''')
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+def strip_css_comments(css: str) -> str:
+    """Remove /* */ comments, leaving quoted strings alone"""
+    return _CSS_COMMENT.sub(lambda m: m.group(1) or '', css)
+
+def minify_css(css: str) -> str:
+    """Strip comments and insignificant whitespace
+
+    Spaces around '+', '-' and before ':' are kept (calc() and descendant
+    pseudo-class selectors depend on them), and quoted strings such as
+    content: " > " are copied verbatim.
+    """
+    literals = []  # verbatim strings, restored after whitespace is stripped
+
+    def keep(match):
+        literals.append(match.group(0))
+        return f"\x00{len(literals) - 1}\x00"
+
+    css = _CSS_STRING_LITERAL.sub(keep, strip_css_comments(css))
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}')
+    return re.sub(r'\x00(\d+)\x00', lambda m: literals[int(m.group(1))], css.strip())
+
+def _absolute_css_urls(css: str, filename: str) -> str:
+    """Rewrite relative url() references so they still resolve from the bundle URL"""
+    base_dir = posixpath.dirname(filename)
+
+    def rewrite(match):
+        quote, target = match.group(1), match.group(2)
+        if re.match(r'^(?:[a-z]+:|/|#)', target, re.I):
+            return match.group(0)
+        resolved = posixpath.normpath(posixpath.join(base_dir, target))
+        return f"url({quote}{url_for('static', filename=resolved)}{quote})"
+
+    return _CSS_URL.sub(rewrite, css)
+
+def _build_css(static_folder: str, files: List[str], remote_imports: List[str], seen: set) -> str:
+    parts = []
+    for filename in files:
+        if filename in seen:
+            continue
+        seen.add(filename)
+        with open(os.path.join(static_folder, filename), 'r', encoding='utf-8') as f:
+            css = strip_css_comments(f.read())
+
+        # Leading @imports are inlined (local) or hoisted (remote); browsers ignore
+        # @imports that follow other rules, so those are dropped
+        body_start = 0
+        for match in _CSS_IMPORT.finditer(css):
+            if css[body_start:match.start()].strip():
+                break
+            body_start = match.end()
+            target, media = match.group(2), match.group(3).strip()
+            if re.match(r'^(?:[a-z]+:)?//', target, re.I):
+                remote_imports.append(match.group(0))
+            elif not media:
+                local = posixpath.normpath(posixpath.join(posixpath.dirname(filename), target))
+                parts.append(_build_css(static_folder, [local], remote_imports, seen))
+        body = _CSS_IMPORT.sub('', css[body_start:])
+        parts.append(f"/* {filename} */\n" + _absolute_css_urls(body, filename))
+    return '\n'.join(parts)
+
+
+# --- JS ---
+
+def _build_js(static_folder: str, files: List[str]) -> str:
+    """Concatenate the scripts unchanged, as the browser would run them one after another
+
+    Scripts are not minified; the gzip/brotli variants take care of the size.
+    """
+    parts = []
+    for filename in files:
+        with open(os.path.join(static_folder, filename), 'r', encoding='utf-8') as f:
+            # Leading ';' guards against a previous file that ends without one;
+            # the newline ends a trailing // comment
+            parts.append(f"/* {filename} */\n;" + f.read() + '\n')
+    return '\n'.join(parts)
+
+
+# --- Bundle registry ---
+
+class AssetBundle:
+    """One built bundle with its fingerprint and compressed variants"""
+
+    def __init__(self, name: str, kind: str, content: str):
+        self.name = name
+        self.kind = kind
+        self.data = content.encode('utf-8')
+        self.fingerprint = hashlib.sha256(self.data).hexdigest()[:12]
+        self.variants = {'gzip': compress_bytes(self.data, 'gzip')}
+        if brotli is not None:
+            self.variants['br'] = compress_bytes(self.data, 'br')
+
+    @property
+    def filename(self) -> str:
+        return f"{self.name}.{self.fingerprint}.{self.kind}"
+
+
+class AssetBundler:
+    """Builds ASSET_BUNDLES at startup and serves them from memory"""
+
+    def __init__(self, static_folder: str, bundles: Dict[str, Dict[str, List[str]]] = ASSET_BUNDLES,
+                 enabled: bool = True):
+        self.static_folder = static_folder
+        self.definitions = bundles
+        self.enabled = enabled
+        self.bundles: Dict[str, AssetBundle] = {}
+
+    def build(self):
+        """Build every bundle; a bundle that fails falls back to separate files"""
+        for name, kinds in self.definitions.items():
+            for kind, files in kinds.items():
+                try:
+                    if kind == 'css':
+                        remote_imports: List[str] = []
+                        body = minify_css(_build_css(self.static_folder, files, remote_imports, set()))
+                        content = ''.join(dict.fromkeys(remote_imports)) + body
+                    else:
+                        content = _build_js(self.static_folder, files)
+                except (OSError, UnicodeDecodeError) as e:
+                    logger.error(f"Could not build {kind} bundle '{name}': {e}")
+                    continue
+                bundle = AssetBundle(name, kind, content)
+                self.bundles[f"{name}.{kind}"] = bundle
+                original = sum(os.path.getsize(os.path.join(self.static_folder, f)) for f in files)
+                logger.info(f"Built bundle {bundle.filename}: {len(files)} files, "
+                            f"{original} -> {len(bundle.data)} bytes")
+
+    def tags(self, name: str, kind: str) -> Markup:
+        """<link>/<script> tags for a bundle (one tag, or one per file when disabled)"""
+        bundle = self.bundles.get(f"{name}.{kind}") if self.enabled else None
+        if bundle:
+            urls = [url_for('asset_bundle', filename=bundle.filename)]
+        else:
+            urls = [url_for('static', filename=f) for f in self.definitions[name][kind]]
+        if kind == 'css':
+            return Markup('\n'.join(f'<link rel="stylesheet" href="{escape(u)}">' for u in urls))
+        return Markup('\n'.join(f'<script src="{escape(u)}"></script>' for u in urls))
+
+    def send(self, filename: str):
+        """Serve a bundle by its fingerprinted filename"""
+        match = re.match(r'^(?P<name>[\w-]+)\.(?P<hash>[0-9a-f]{12})\.(?P<kind>css|js)$', filename)
+        bundle = self.bundles.get(f"{match.group('name')}.{match.group('kind')}") if match else None
+        if not bundle or bundle.fingerprint != match.group('hash'):
+            abort(404)
+
+        if request.if_none_match.contains(bundle.fingerprint):
+            response = make_response('', 304)
+        else:
+            encoding = choose_encoding()
+            response = make_response(bundle.variants.get(encoding, bundle.data) if encoding else bundle.data)
+            if encoding in bundle.variants:
+                response.headers['Content-Encoding'] = encoding
+        response.headers['Content-Type'] = CONTENT_TYPES[bundle.kind]
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.vary.add('Accept-Encoding')
+        response.set_etag(bundle.fingerprint)
+        return response
+
+
+def init_asset_bundles(app) -> AssetBundler:
+    """Build bundles, add the /bundles/ route and the asset_bundle() template helper
+
+    Set ASSET_BUNDLING=0 to link individual files (the default in debug mode).
+    """
+    enabled = os.environ.get('ASSET_BUNDLING', '0' if app.debug else '1') not in ('0', 'false', 'no')
+    bundler = AssetBundler(app.static_folder, enabled=enabled)
+    if enabled:
+        with app.test_request_context():
+            bundler.build()
+
+    app.add_url_rule('/bundles/<path:filename>', 'asset_bundle', bundler.send)
+    app.jinja_env.globals['asset_bundle'] = bundler.tags
+    app.extensions['asset_bundles'] = bundler
+    return bundler
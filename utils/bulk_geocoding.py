@@ -0,0 +1,190 @@
+"""
+Bulk geocoding for locations that are missing coordinates
+Runs in a background worker through the geocoding cache and rate-limited
+Nominatim client, then writes every result back in one atomic update
+"""
+
+import os
+import uuid
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .geocoding import geocode_address
+from .file_utils import load_json_file, save_json_file_atomic
+
+logger = logging.getLogger(__name__)
+
+# Define Constants relative to this file's location
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(UTILS_DIR)  # Project root
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+LOCATIONS_FILE = os.path.join(DATA_DIR, 'locations.json')
+
+# Finished jobs kept in memory for status polling
+MAX_FINISHED_JOBS = 20
+
+_jobs: Dict[str, 'BulkGeocodingJob'] = {}
+_jobs_lock = threading.Lock()
+# Held for every read-modify-write of locations.json (here and in the locations API)
+locations_lock = threading.Lock()
+
+
+def has_coordinates(location: Dict) -> bool:
+    """Return True if the location has usable latitude and longitude"""
+    try:
+        float(location.get('latitude'))
+        float(location.get('longitude'))
+        return True
+    except (TypeError, ValueError):
+        return False
+
+def get_geocoding_query(location: Dict) -> str:
+    """Prefer the address; fall back to the location name"""
+    return (location.get('address') or location.get('name') or '').strip()
+
+def find_locations_missing_coordinates(locations: List[Dict]) -> List[Dict]:
+    """Return locations that have something to geocode but no coordinates"""
+    return [loc for loc in locations if not has_coordinates(loc) and get_geocoding_query(loc)]
+
+
+class BulkGeocodingJob:
+    """Geocodes every location missing coordinates and reports the outcome
+
+    Args:
+        locations_file: Path to locations.json
+        dry_run: Geocode and report without writing results back
+    """
+
+    def __init__(self, locations_file: str = LOCATIONS_FILE, dry_run: bool = False):
+        self.id = str(uuid.uuid4())
+        self.locations_file = locations_file
+        self.dry_run = dry_run
+        self.status = 'pending'
+        self.total = 0
+        self.processed = 0
+        self.geocoded: List[Dict] = []
+        self.failed: List[Dict] = []
+        self.error: Optional[str] = None
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+
+    def run(self):
+        """Geocode all missing locations, then write them back atomically"""
+        self.status = 'running'
+        self.started_at = datetime.utcnow().isoformat() + 'Z'
+        try:
+            locations = load_json_file(self.locations_file, default=[]) or []
+            pending = find_locations_missing_coordinates(locations)
+            self.total = len(pending)
+            logger.info(f"Bulk geocoding job {self.id}: {self.total} locations missing coordinates")
+
+            coordinates = {}
+            for location in pending:
+                query = get_geocoding_query(location)
+                if not location.get('id'):
+                    # Results are matched back to the re-read file by id; without
+                    # one they could land on the wrong location
+                    self.failed.append({
+                        'id': None,
+                        'name': location.get('name', ''),
+                        'query': query,
+                        'reason': 'Location has no id'
+                    })
+                    self.processed += 1
+                    continue
+                try:
+                    # A background thread, so it may wait for the rate limit
+                    results = geocode_address(query, limit=1, wait=True)
+                except Exception as e:
+                    results = []
+                    logger.warning(f"Bulk geocoding failed for '{query}': {e}")
+
+                if results:
+                    best = results[0]
+                    coordinates[location.get('id')] = (best.latitude, best.longitude)
+                    self.geocoded.append({
+                        'id': location.get('id'),
+                        'name': location.get('name', ''),
+                        'query': query,
+                        'latitude': best.latitude,
+                        'longitude': best.longitude,
+                        'match': best.display_name
+                    })
+                else:
+                    self.failed.append({
+                        'id': location.get('id'),
+                        'name': location.get('name', ''),
+                        'query': query,
+                        'reason': 'No results'
+                    })
+                self.processed += 1
+
+            if coordinates and not self.dry_run:
+                self._write_back(coordinates)
+            self.status = 'completed'
+        except Exception as e:
+            logger.error(f"Bulk geocoding job {self.id} failed: {e}")
+            self.error = str(e)
+            self.status = 'failed'
+        finally:
+            self.finished_at = datetime.utcnow().isoformat() + 'Z'
+
+    def _write_back(self, coordinates: Dict[str, tuple]):
+        """Apply coordinates to a fresh copy of locations.json in a single write
+
+        The file is re-read so edits made while the job was running are kept,
+        and locations that gained coordinates in the meantime are left alone.
+        """
+        with locations_lock:
+            locations = load_json_file(self.locations_file, default=[]) or []
+            updated = 0
+            for location in locations:
+                location_coordinates = coordinates.get(location.get('id')) if location.get('id') else None
+                if location_coordinates and not has_coordinates(location):
+                    location['latitude'], location['longitude'] = location_coordinates
+                    updated += 1
+            if not save_json_file_atomic(self.locations_file, locations):
+                raise IOError(f"Could not write {self.locations_file}")
+        logger.info(f"Bulk geocoding job {self.id}: wrote coordinates for {updated} locations")
+
+    def to_dict(self) -> Dict:
+        """Progress and report for the API"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'dryRun': self.dry_run,
+            'total': self.total,
+            'processed': self.processed,
+            'geocodedCount': len(self.geocoded),
+            'failedCount': len(self.failed),
+            'geocoded': self.geocoded,
+            'failed': self.failed,
+            'error': self.error,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at
+        }
+
+
+def start_bulk_geocoding_job(dry_run: bool = False) -> BulkGeocodingJob:
+    """Start a background bulk geocoding job, or return the one already running"""
+    with _jobs_lock:
+        running = next((job for job in _jobs.values() if job.status in ('pending', 'running')), None)
+        if running:
+            return running
+
+        finished = [job_id for job_id, job in _jobs.items() if job.status not in ('pending', 'running')]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS + 1)]:
+            del _jobs[job_id]
+
+        job = BulkGeocodingJob(dry_run=dry_run)
+        _jobs[job.id] = job
+
+    threading.Thread(target=job.run, name=f"bulk-geocode-{job.id[:8]}", daemon=True).start()
+    return job
+
+def get_bulk_geocoding_job(job_id: str) -> Optional[BulkGeocodingJob]:
+    """Look up a bulk geocoding job by id"""
+    with _jobs_lock:
+        return _jobs.get(job_id)
@@ -4,10 +4,12 @@ import logging
 from datetime import datetime, timedelta
 from dateutil import parser
 from dateutil.relativedelta import relativedelta
-from .sun_utils import get_sun_times_for_location, format_sun_times_display, get_cache_size, clear_sun_times_cache
+from .request_timing import timed
+from .sun_utils import get_sun_times_for_location, get_enhanced_sun_times_for_location, format_sun_times_display, format_sun_details, get_cache_size, clear_sun_times_cache
 
 logger = logging.getLogger(__name__)
 
+@timed('generation')
 def generate_calendar_days(project, existing_calendar=None):
     """
     Generate calendar days for a project based on dates
@@ -216,7 +218,7 @@ def generate_calendar_days(project, existing_calendar=None):
         calendar_data = calculate_location_counts(calendar_data)
         
         # Calculate sunrise/sunset times for days with locations
-        calendar_data = calculate_sun_times_for_calendar(calendar_data)
+        calendar_data = calculate_sun_times_for_calendar(calendar_data, include_enhanced=True)
         
         # Log cache performance
         cache_size = get_cache_size()
@@ -566,6 +568,7 @@ def update_calendar_with_departments(calendar_data):
         logger.error(f"Error updating calendar with departments: {str(e)}")
         return calendar_data
 
+@timed('counting')
 def calculate_department_counts(calendar_data):
     """
     Calculate department counts based on the calendar days, only counting
@@ -653,13 +656,58 @@ def calculate_department_counts(calendar_data):
              calendar_data["departmentCounts"] = {}
         return calendar_data
 
+def get_sun_fingerprint(latitude, longitude, date_str):
+    """
+    Build the fingerprint stored alongside a day's sun times
+    
+    Args:
+        latitude (float): Location latitude used for the calculation
+        longitude (float): Location longitude used for the calculation
+        date_str (str): Day date in format YYYY-MM-DD
+        
+    Returns:
+        str: Fingerprint matching the precision of the sun times cache
+    """
+    return f"{float(latitude):.4f},{float(longitude):.4f}@{date_str}"
+
+def clear_stale_sun_times(day):
+    """Remove previously computed sun times from a day whose location no longer resolves"""
+    if not day.get('sunFingerprint'):
+        return
+    day['sunrise'] = None
+    day['sunset'] = None
+    day['sunTimes'] = None
+    day.pop('sunDetails', None)
+    day.pop('sunFingerprint', None)
+
+def get_day_type_class(day):
+    """CSS class for a day's type ('shoot', 'prep', 'weekend', ...), or '' if none applies"""
+    if day.get('dayType'):
+        return day['dayType']
+    for flag, css_class in (('isWeekend', 'weekend'), ('isHoliday', 'holiday'), ('isHiatus', 'hiatus'),
+                            ('isPrep', 'prep'), ('isShootDay', 'shoot')):
+        if day.get(flag):
+            return css_class
+    return ''
+
+def get_day_row_class(day):
+    """Classes added to a day's calendar row: its type, plus has-area-color when coloured"""
+    classes = [get_day_type_class(day)]
+    if day.get('areaColor'):
+        classes.append('has-area-color')
+    return ' '.join(c for c in classes if c)
+
 # This function will calculate how many times each location appears in the calendar
-def calculate_sun_times_for_calendar(calendar_data):
+@timed('sun')
+def calculate_sun_times_for_calendar(calendar_data, include_enhanced=False):
     """
     Calculate sunrise and sunset times for each day that has a location with coordinates
     
     Args:
         calendar_data (dict): Calendar data with days array
+        include_enhanced (bool): Also store dawn, dusk, solar noon and golden hour
+            windows under day['sunDetails']. These come from the same cached sun()
+            evaluation as sunrise/sunset, so they add no extra astronomy.
         
     Returns:
         dict: Updated calendar data with sun times added to days
@@ -680,17 +728,20 @@ def calculate_sun_times_for_calendar(calendar_data):
                 logger.error(f"Error loading locations for sun calculations: {str(e)}")
         
         # Process each day to calculate sun times
+        recalculated = 0
         for day in calendar_data.get('days', []):
             location_name = day.get('location', '').strip()
             
             # Skip if no location specified
             if not location_name:
+                clear_stale_sun_times(day)
                 continue
                 
             # Get location data
             location_data = locations_map.get(location_name)
             if not location_data:
                 logger.debug(f"Location '{location_name}' not found in locations.json")
+                clear_stale_sun_times(day)
                 continue
             
             # Check if location has coordinates
@@ -699,17 +750,31 @@ def calculate_sun_times_for_calendar(calendar_data):
             
             if latitude is None or longitude is None:
                 logger.debug(f"Location '{location_name}' has no coordinates")
+                clear_stale_sun_times(day)
+                continue
+            
+            # Reuse stored values when the day was computed for the same date and coordinates
+            fingerprint = get_sun_fingerprint(latitude, longitude, day.get('date'))
+            if (day.get('sunFingerprint') == fingerprint and day.get('sunrise') and
+                    (not include_enhanced or day.get('sunDetails'))):
                 continue
             
             # Calculate sun times for this day
             try:
                 day_date = datetime.strptime(day['date'], '%Y-%m-%d')
-                sun_times = get_sun_times_for_location(location_data, day_date)
+                if include_enhanced:
+                    sun_times = get_enhanced_sun_times_for_location(location_data, day_date)
+                else:
+                    sun_times = get_sun_times_for_location(location_data, day_date)
                 
                 if sun_times:
                     day['sunrise'] = sun_times.get('sunrise')
                     day['sunset'] = sun_times.get('sunset')
                     day['sunTimes'] = format_sun_times_display(sun_times)
+                    if include_enhanced:
+                        day['sunDetails'] = format_sun_details(sun_times)
+                    day['sunFingerprint'] = fingerprint
+                    recalculated += 1
                     logger.debug(f"Calculated sun times for {day['date']} at {location_name}: {day['sunTimes']}")
                 else:
                     logger.warning(f"Failed to calculate sun times for {day['date']} at {location_name}")
@@ -717,12 +782,16 @@ def calculate_sun_times_for_calendar(calendar_data):
             except Exception as e:
                 logger.error(f"Error calculating sun times for {day['date']} at {location_name}: {str(e)}")
         
+        if recalculated:
+            logger.debug(f"Recalculated sun times for {recalculated} days")
+        
         return calendar_data
         
     except Exception as e:
         logger.error(f"Error in calculate_sun_times_for_calendar: {str(e)}")
         return calendar_data
 
+@timed('counting')
 def calculate_location_counts(calendar_data):
     """
     Calculate how many times each location and location area appears in the calendar
@@ -790,6 +859,12 @@ def calculate_location_counts(calendar_data):
                             area_name = next((a['name'] for a in areas if a['id'] == area_id), None)
                             if area_name:
                                 day['locationArea'] = area_name
+        # Resolve each row's colour and classes once, so templates don't scan the areas per day
+        for day in days:
+            area_id = day.get('locationAreaId')
+            day['areaColor'] = area_color_map.get(area_id) if area_id else None
+            day['rowClass'] = get_day_row_class(day)
+
         # Add counts to calendar data
         calendar_data['locationCounts'] = location_counts
         calendar_data['areaCounts'] = area_counts
@@ -0,0 +1,137 @@
+"""
+Calendar date ranges
+Month/range slicing of calendar days for the paginated calendar API and the
+lazy-loaded viewer, plus a lightweight summary for counters
+"""
+
+import calendar
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from .calendar_generator import get_day_type_class
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMAT = '%Y-%m-%d'
+MONTH_FORMAT = '%Y-%m'
+
+
+def parse_month(value: str) -> Tuple[str, str]:
+    """'2025-03' -> ('2025-03-01', '2025-03-31')
+
+    Raises:
+        ValueError: If value is not a YYYY-MM month
+    """
+    month_start = datetime.strptime(value, MONTH_FORMAT).date()
+    last_day = calendar.monthrange(month_start.year, month_start.month)[1]
+    return month_start.isoformat(), month_start.replace(day=last_day).isoformat()
+
+def parse_range_args(args) -> Tuple[Optional[str], Optional[str]]:
+    """Read 'month' or 'from'/'to' query parameters
+
+    Args:
+        args: request.args (or any mapping)
+
+    Returns:
+        (date_from, date_to) as ISO dates; either may be None for an open end
+
+    Raises:
+        ValueError: On malformed dates or an inverted range
+    """
+    month = args.get('month')
+    if month:
+        return parse_month(month)
+
+    date_from = args.get('from') or None
+    date_to = args.get('to') or None
+    for value in (date_from, date_to):
+        if value:
+            datetime.strptime(value, DATE_FORMAT)
+    if date_from and date_to and date_from > date_to:
+        raise ValueError("'from' must not be after 'to'")
+    return date_from, date_to
+
+def filter_days(days: List[Dict], date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict]:
+    """Days whose ISO date falls within [date_from, date_to] (inclusive, open ends allowed)"""
+    if not date_from and not date_to:
+        return list(days)
+    return [
+        day for day in days
+        if day.get('date')
+        and (not date_from or day['date'] >= date_from)
+        and (not date_to or day['date'] <= date_to)
+    ]
+
+def slice_calendar(calendar_data: Dict, date_from: Optional[str], date_to: Optional[str]) -> Dict:
+    """Shallow copy of calendar_data with only the days in range
+
+    The copy also carries 'range' (the requested bounds) and 'months' (every month
+    of the full calendar) so a client can page through the rest.
+    """
+    days = calendar_data.get('days', [])
+    sliced = dict(calendar_data)
+    sliced['days'] = filter_days(days, date_from, date_to)
+    sliced['range'] = {'from': date_from, 'to': date_to}
+    sliced['months'] = group_months(days)
+    return sliced
+
+def group_months(days: List[Dict]) -> List[Dict]:
+    """One entry per calendar month present in days, in date order
+
+    Returns:
+        List of {'month': 'YYYY-MM', 'label': 'March 2025', 'days': count}
+    """
+    months: Dict[str, int] = {}
+    for day in days:
+        day_date = day.get('date') or ''
+        if len(day_date) >= 7:
+            months[day_date[:7]] = months.get(day_date[:7], 0) + 1
+
+    grouped = []
+    for month in sorted(months):
+        try:
+            label = datetime.strptime(month, MONTH_FORMAT).strftime('%B %Y')
+        except ValueError:
+            logger.warning(f"Skipping calendar days with malformed date prefix '{month}'")
+            continue
+        grouped.append({'month': month, 'label': label, 'days': months[month]})
+    return grouped
+
+def initial_months(months: List[Dict], count: int = 2, today: Optional[date] = None) -> List[str]:
+    """The months to render up front: the current month and the ones after it
+
+    Before the schedule starts (or after it ends) the first (or last) months are used.
+    """
+    keys = [m['month'] for m in months]
+    if len(keys) <= count:
+        return keys
+
+    current = (today or date.today()).strftime(MONTH_FORMAT)
+    start = next((i for i, key in enumerate(keys) if key >= current), len(keys) - count)
+    start = min(start, len(keys) - count)
+    return keys[start:start + count]
+
+def calendar_summary(calendar_data: Dict) -> Dict:
+    """Counter data for a calendar without its days
+
+    Expects calendar_data to have been through calculate_department_counts and
+    calculate_location_counts.
+    """
+    days = calendar_data.get('days', [])
+    day_types: Dict[str, int] = {}
+    for day in days:
+        day_type = get_day_type_class(day) or 'other'
+        day_types[day_type] = day_types.get(day_type, 0) + 1
+
+    dates = [day['date'] for day in days if day.get('date')]
+    return {
+        'totalDays': len(days),
+        'shootDays': sum(1 for day in days if day.get('isShootDay')),
+        'dayTypes': day_types,
+        'dateRange': {'from': min(dates) if dates else None, 'to': max(dates) if dates else None},
+        'months': group_months(days),
+        'departmentCounts': calendar_data.get('departmentCounts', {}),
+        'locationCounts': calendar_data.get('locationCounts', {}),
+        'areaCounts': calendar_data.get('areaCounts', {}),
+    }
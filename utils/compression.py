@@ -0,0 +1,145 @@
+"""
+Response compression for HTML, JSON, CSS and JS
+gzip is always available; brotli is used when the optional 'brotli' package is installed
+"""
+
+import os
+import gzip
+import zlib
+import logging
+from typing import Iterable, Iterator, Optional
+
+from flask import request, send_file
+
+from .http_cache import ENCODING_ETAG_SUFFIXES
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # Optional dependency
+    brotli = None
+
+# Responses smaller than this are sent as-is; compression would not pay off
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+
+COMPRESSIBLE_TYPES = {
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+}
+
+# Suffixes of precompressed files written next to an artifact, in preference order
+PRECOMPRESSED_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def choose_encoding() -> Optional[str]:
+    """Best encoding the client accepts: 'br', 'gzip' or None"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(COMPRESSION_LEVEL, 11))
+    return gzip.compress(data, compresslevel=COMPRESSION_LEVEL, mtime=0)
+
+def compress_stream(chunks: Iterable, encoding: str) -> Iterator[bytes]:
+    """Compress a streamed body chunk by chunk, flushing after each so nothing is held back"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=min(COMPRESSION_LEVEL, 11))
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+        process, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = process(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+def write_precompressed(file_path: str):
+    """Write .gz (and .br when available) variants next to file_path"""
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    for encoding, suffix in PRECOMPRESSED_SUFFIXES:
+        if encoding == 'br' and brotli is None:
+            continue
+        temp_path = f"{file_path}{suffix}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(compress_bytes(data, encoding))
+        os.replace(temp_path, file_path + suffix)
+
+def send_precompressed(file_path: str, mimetype: str, etag: Optional[str] = None, **kwargs):
+    """send_file that serves a precompressed variant when the client accepts it
+
+    Args:
+        file_path: Uncompressed artifact; variants are file_path + '.br' / '.gz'
+        mimetype: Content type of the uncompressed artifact
+        etag: Strong ETag for the artifact; an encoding suffix is added per variant
+    """
+    encoding = choose_encoding()
+    for variant_encoding, suffix in PRECOMPRESSED_SUFFIXES:
+        if variant_encoding == encoding and os.path.exists(file_path + suffix):
+            variant_etag = etag + ENCODING_ETAG_SUFFIXES[encoding] if etag else True
+            response = send_file(file_path + suffix, mimetype=mimetype, etag=variant_etag, **kwargs)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_file(file_path, mimetype=mimetype, etag=etag or True, **kwargs)
+    response.vary.add('Accept-Encoding')
+    return response
+
+def compress_response(response):
+    """after_request hook: compress eligible responses in place"""
+    if response.status_code == 304:
+        response.vary.add('Accept-Encoding')
+        return response
+    if (response.status_code < 200 or response.status_code >= 300 or response.status_code == 204
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if not encoding:
+        return response
+
+    if response.is_streamed:
+        # Streamed pages (utils/streaming.py) are compressed as they are generated
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_SIZE:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+
+    # A different representation needs a different strong validator
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + ENCODING_ETAG_SUFFIXES[encoding], weak=weak)
+    return response
+
+def init_compression(app):
+    """Register response compression on the app"""
+    app.after_request(compress_response)
+    logger.info(f"Response compression enabled (gzip{', br' if brotli else ''}, min {COMPRESSION_MIN_SIZE} bytes)")
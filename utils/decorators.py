@@ -1,13 +1,28 @@
 # utils/decorators.py
 from functools import wraps
 from flask import session, flash, redirect, url_for, request
+from .session_store import current_user
+
+def _logged_in_user():
+    """The session's user record if they are still an active account"""
+    if not session.get('user_id'):
+        return None
+    user = current_user()
+    if not user or not user.get('active', True):
+        return None
+    return user
+
+def is_admin():
+    """True if the session belongs to an active admin account"""
+    user = _logged_in_user()
+    return bool(user) and user.get('role', 'admin') == 'admin'
 
 def login_required(f):
     """Decorator to require user login."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # Check if user is logged in (has user_id in session)
-        if not session.get('user_id'):
+        if not _logged_in_user():
             flash('Please log in to access this page.', 'warning')
             return redirect(url_for('auth.login', next=request.url))
         return f(*args, **kwargs)
@@ -18,7 +33,7 @@ def viewer_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # For backward compatibility, allow any logged-in user
-        if not session.get('user_id'):
+        if not _logged_in_user():
             flash('Login required to view this page.', 'warning')
             return redirect(url_for('auth.login', next=request.url))
         return f(*args, **kwargs)
@@ -29,11 +44,12 @@ def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # Check if user is logged in and is admin
-        if not session.get('user_id'):
+        user = _logged_in_user()
+        if not user:
             flash('Please log in to access this page.', 'warning')
             return redirect(url_for('auth.login', next=request.url))
         
-        if session.get('user_role') != 'admin':
+        if user.get('role', 'admin') != 'admin':
             flash('Admin access required.', 'error')
             return redirect(url_for('auth.login', next=request.url))
         
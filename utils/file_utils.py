@@ -1,9 +1,13 @@
 import os
 import json
 import shutil
+import tempfile
 import logging
 from datetime import datetime
 
+from .metrics import record_file_read, record_file_write
+from .request_timing import timed
+
 logger = logging.getLogger(__name__)
 
 def ensure_directory(directory_path):
@@ -17,6 +21,7 @@ def ensure_directory(directory_path):
         logger.error(f"Error creating directory {directory_path}: {str(e)}")
         return False
 
+@timed('write')
 def save_json_file(file_path, data):
     """
     Save data to a JSON file
@@ -35,6 +40,35 @@ def save_json_file(file_path, data):
         logger.error(f"Error saving JSON file {file_path}: {str(e)}")
         return False
 
+@timed('write')
+def save_json_file_atomic(file_path, data):
+    """
+    Save data to a JSON file atomically
+
+    The data is written to a temporary file in the same directory and moved into
+    place with os.replace, so readers never see a partially written file.
+    """
+    directory = os.path.dirname(file_path) or '.'
+    ensure_directory(directory)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+            written = f.tell()
+        os.replace(temp_path, file_path)
+        record_file_write(written)
+        return True
+    except Exception as e:
+        logger.error(f"Error saving JSON file {file_path}: {str(e)}")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+
+@timed('storage')
 def load_json_file(file_path, default=None):
     """
     Load data from a JSON file
@@ -44,7 +78,9 @@ def load_json_file(file_path, default=None):
             return default
         
         with open(file_path, 'r') as f:
-            return json.load(f)
+            data = json.load(f)
+            record_file_read(f.tell())
+        return data
     except Exception as e:
         logger.error(f"Error loading JSON file {file_path}: {str(e)}")
         return default
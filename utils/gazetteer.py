@@ -0,0 +1,274 @@
+"""
+Offline gazetteer for instant location autocomplete
+Loads a bundled IE/GB place list (and optionally a GeoNames dump) into a
+sorted-array prefix index so lookups never need the network
+"""
+
+import os
+import re
+import heapq
+import logging
+import threading
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLED_GAZETTEER_FILE = os.path.join(UTILS_DIR, 'gazetteer_data', 'ie_gb_places.tsv')
+
+# Display names for country codes used by the bundled list
+COUNTRY_NAMES = {
+    'IE': 'Ireland',
+    'GB': 'UK',
+    'FR': 'France',
+    'IT': 'Italy',
+    'CZ': 'Czech Republic',
+    'HU': 'Hungary',
+    'ES': 'Spain',
+    'NL': 'Netherlands',
+}
+
+# GB regions people expect to see instead of "UK"
+GB_DISPLAY_REGIONS = {'Scotland', 'Wales', 'Northern Ireland'}
+
+# GeoNames admin1 codes for GB, mapped to the names used by the bundled list
+GB_ADMIN1_NAMES = {'ENG': 'England', 'NIR': 'Northern Ireland', 'SCT': 'Scotland', 'WLS': 'Wales'}
+
+# Prefixes up to this length match too many keys to rank on every keystroke once
+# a GeoNames dump is loaded; their most populous entries are kept at build time
+SHORT_PREFIX_LENGTH = 3
+SHORT_PREFIX_TOP = 20
+
+# Shorter words in a query ("co", "st") are not looked up as place names on their own
+MIN_CONTAINED_NAME_LENGTH = 3
+
+
+def normalize_place_name(name: str) -> str:
+    """Lowercase, strip accents and punctuation so 'Dún Laoghaire' matches 'dun laoghaire'"""
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(ch for ch in name if not unicodedata.combining(ch))
+    name = re.sub(r"[^\w\s]", ' ', name.lower())
+    return re.sub(r'\s+', ' ', name).strip()
+
+
+class GazetteerEntry:
+    """A single place in the gazetteer"""
+    __slots__ = ('name', 'latitude', 'longitude', 'country_code', 'admin1', 'population', 'feature')
+
+    def __init__(self, name: str, latitude: float, longitude: float, country_code: str = "",
+                 admin1: str = "", population: int = 0, feature: str = "town"):
+        self.name = name
+        self.latitude = latitude
+        self.longitude = longitude
+        self.country_code = country_code
+        self.admin1 = admin1
+        self.population = population
+        self.feature = feature
+
+    @property
+    def country(self) -> str:
+        if self.country_code == 'GB' and self.admin1 in GB_DISPLAY_REGIONS:
+            return self.admin1
+        return COUNTRY_NAMES.get(self.country_code, self.country_code)
+
+    @property
+    def display_name(self) -> str:
+        return f"{self.name}, {self.country}" if self.country else self.name
+
+
+class Gazetteer:
+    """Place list with a sorted-array prefix index
+
+    Every name and alternate name is normalized and stored in a sorted list of
+    keys; a prefix lookup is a binary search followed by a forward scan over the
+    matching keys. Short prefixes are answered from a per-prefix list of the
+    most populous entries instead of scanning.
+    """
+
+    def __init__(self):
+        self.entries: List[GazetteerEntry] = []
+        self._pending: List[tuple] = []
+        # (sorted keys, entry index per key, short prefix -> top entry indexes);
+        # replaced as one tuple so readers never see parts of different builds
+        self._index: Tuple[List[str], List[int], Dict[str, List[int]]] = ([], [], {})
+        self._index_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, entry: GazetteerEntry, alternate_names: Optional[List[str]] = None):
+        """Add an entry; the index is rebuilt lazily on the next search"""
+        keys = [normalize_place_name(name) for name in [entry.name] + list(alternate_names or [])]
+        with self._index_lock:
+            index = len(self.entries)
+            self.entries.append(entry)
+            self._pending.extend((key, index) for key in keys if key)
+
+    def load_file(self, file_path: str) -> int:
+        """Load a bundled TSV or a GeoNames cities*.txt dump
+
+        Returns the number of entries loaded
+        """
+        loaded = 0
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                columns = line.rstrip('\n').split('\t')
+                try:
+                    if len(columns) >= 15:
+                        # GeoNames layout: name=1, alternatenames=3, lat=4, lng=5, class=6,
+                        # country=8, admin1=10, population=14. Only populated places are kept.
+                        if columns[6] != 'P':
+                            continue
+                        admin1 = columns[10]
+                        if columns[8] == 'GB':
+                            admin1 = GB_ADMIN1_NAMES.get(admin1, admin1)
+                        entry = GazetteerEntry(
+                            name=columns[1],
+                            latitude=float(columns[4]),
+                            longitude=float(columns[5]),
+                            country_code=columns[8],
+                            admin1=admin1,
+                            population=int(columns[14] or 0)
+                        )
+                        alternates = [columns[2]] + [a for a in columns[3].split(',') if a]
+                    else:
+                        entry = GazetteerEntry(
+                            name=columns[0],
+                            latitude=float(columns[1]),
+                            longitude=float(columns[2]),
+                            country_code=columns[3] if len(columns) > 3 else "",
+                            admin1=columns[4] if len(columns) > 4 else "",
+                            population=int(columns[5] or 0) if len(columns) > 5 else 0
+                        )
+                        alternates = [a for a in columns[6].split(',') if a] if len(columns) > 6 else []
+                except (ValueError, IndexError) as e:
+                    logger.debug(f"Skipping invalid gazetteer line in {file_path}: {e}")
+                    continue
+                self.add(entry, alternates)
+                loaded += 1
+        logger.info(f"Loaded {loaded} gazetteer entries from {file_path}")
+        return loaded
+
+    def _build_index(self):
+        if not self._pending:
+            return
+        with self._index_lock:
+            if not self._pending:
+                return
+            keys, refs, _ = self._index
+            pairs = sorted(set(zip(keys, refs)) | set(self._pending))
+            self._index = ([key for key, _ in pairs], [ref for _, ref in pairs], self._short_prefix_top(pairs))
+            self._pending = []
+
+    def _short_prefix_top(self, pairs: List[tuple]) -> Dict[str, List[int]]:
+        """Most populous entries for every prefix of up to SHORT_PREFIX_LENGTH characters"""
+        candidates: Dict[str, set] = {}
+        for key, ref in pairs:
+            for length in range(1, min(len(key), SHORT_PREFIX_LENGTH) + 1):
+                candidates.setdefault(key[:length], set()).add(ref)
+        return {
+            prefix: heapq.nsmallest(SHORT_PREFIX_TOP, refs, key=lambda ref: -self.entries[ref].population)
+            for prefix, refs in candidates.items()
+        }
+
+    def search(self, query: str, limit: int = 5) -> List[GazetteerEntry]:
+        """Return entries whose name or alternate name starts with query
+
+        Exact matches come first, then larger places; when nothing matches the
+        whole query, each comma-separated part is tried (e.g. "Temple Bar, Dublin"),
+        and then place names contained in the query ("Dublin Castle", "Co. Wicklow").
+        """
+        results = self._prefix_search(normalize_place_name(query), limit)
+        if results:
+            return results
+
+        seen = set()
+        if ',' in query:
+            for part in query.split(','):
+                for entry in self._prefix_search(normalize_place_name(part), limit):
+                    if id(entry) not in seen:
+                        seen.add(id(entry))
+                        results.append(entry)
+            if results:
+                return results[:limit]
+
+        return self._contained_search(normalize_place_name(query), limit)
+
+    def _contained_search(self, query: str, limit: int) -> List[GazetteerEntry]:
+        """Entries whose whole name appears as a run of words in query, longest names first"""
+        words = query.split()
+        self._build_index()
+        keys, refs, _ = self._index
+        matches: Dict[int, int] = {}  # entry index -> words matched
+        for size in range(len(words), 0, -1):
+            for start in range(len(words) - size + 1):
+                phrase = ' '.join(words[start:start + size])
+                if len(phrase) < MIN_CONTAINED_NAME_LENGTH:
+                    continue
+                position = bisect_left(keys, phrase)
+                while position < len(keys) and keys[position] == phrase:
+                    matches.setdefault(refs[position], size)
+                    position += 1
+
+        ranked = heapq.nsmallest(limit, matches.items(),
+                                 key=lambda item: (-item[1], -self.entries[item[0]].population))
+        return [self.entries[ref] for ref, _ in ranked]
+
+    def _prefix_search(self, prefix: str, limit: int) -> List[GazetteerEntry]:
+        if not prefix:
+            return []
+        self._build_index()
+
+        keys, refs, short_prefix_top = self._index
+        matches: Dict[int, bool] = {}  # entry index -> exact match
+        position = bisect_left(keys, prefix)
+        if len(prefix) <= SHORT_PREFIX_LENGTH and limit <= SHORT_PREFIX_TOP:
+            # Exact matches plus the largest places; nothing else can outrank them
+            while position < len(keys) and keys[position] == prefix:
+                matches[refs[position]] = True
+                position += 1
+            for ref in short_prefix_top.get(prefix, []):
+                matches.setdefault(ref, False)
+        else:
+            while position < len(keys):
+                key = keys[position]
+                if not key.startswith(prefix):
+                    break
+                ref = refs[position]
+                matches[ref] = matches.get(ref, False) or key == prefix
+                position += 1
+
+        ranked = heapq.nsmallest(limit, matches.items(),
+                                 key=lambda item: (not item[1], -self.entries[item[0]].population))
+        return [self.entries[ref] for ref, _ in ranked]
+
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+def get_gazetteer() -> Gazetteer:
+    """Return the process-wide gazetteer, loading it on first use
+
+    Set GAZETTEER_FILE to a GeoNames dump (e.g. IE.txt, GB.txt, cities1000.txt)
+    to extend the bundled list; separate several files with os.pathsep.
+    """
+    global _gazetteer
+    if _gazetteer is not None:
+        return _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is not None:
+            return _gazetteer
+        gazetteer = Gazetteer()
+        files = [BUNDLED_GAZETTEER_FILE]
+        files += [p for p in os.environ.get('GAZETTEER_FILE', '').split(os.pathsep) if p]
+        for file_path in files:
+            try:
+                gazetteer.load_file(file_path)
+            except OSError as e:
+                logger.warning(f"Could not load gazetteer file {file_path}: {e}")
+        _gazetteer = gazetteer
+    return _gazetteer
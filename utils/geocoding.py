@@ -3,17 +3,41 @@ Geocoding utilities for converting addresses to coordinates
 Supports multiple geocoding services with fallbacks
 """
 
-import requests
 import logging
+import re
+import sqlite3
+import threading
+import time
 from typing import Dict, List, Optional, Tuple
 import os
+import json
 from datetime import datetime, timedelta
 
+from .gazetteer import Gazetteer, GazetteerEntry, get_gazetteer
+from .http_client import RateLimitedClient, RateLimitExceeded
+
 logger = logging.getLogger(__name__)
 
-# Cache for geocoding results to avoid API spam
-_geocoding_cache = {}
-_cache_expiry = {}
+# Define Constants relative to this file's location
+UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(UTILS_DIR)  # Project root
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
+# Persistent cache for geocoding results to avoid API spam
+GEOCODING_CACHE_FILE = os.environ.get('GEOCODING_CACHE_FILE', os.path.join(DATA_DIR, 'geocoding_cache.db'))
+GEOCODING_CACHE_TTL_HOURS = int(os.environ.get('GEOCODING_CACHE_TTL_HOURS', 24 * 30))
+GEOCODING_CACHE_MAX_ENTRIES = int(os.environ.get('GEOCODING_CACHE_MAX_ENTRIES', 5000))
+# Results from the built-in fallback list are kept briefly so Nominatim is retried soon
+FALLBACK_CACHE_TTL_HOURS = 24
+
+# Nominatim usage policy: identify the app and send at most 1 request per second.
+# NOMINATIM_URL can point at a self-hosted instance or a local stand-in for testing.
+NOMINATIM_URL = os.environ.get('NOMINATIM_URL', 'https://nominatim.openstreetmap.org')
+NOMINATIM_REQUESTS_PER_SECOND = float(os.environ.get('NOMINATIM_REQUESTS_PER_SECOND', 1.0))
+NOMINATIM_USER_AGENT = 'FilmProductionCalendar/1.0 (contact@filmcalendar.example)'
+# Preferred search area (Ireland and Great Britain) as lon1,lat1,lon2,lat2. With
+# bounded=0 it only ranks matches inside it higher; places elsewhere still resolve
+NOMINATIM_VIEWBOX = os.environ.get('NOMINATIM_VIEWBOX', '-11.0,61.0,2.0,49.8')
 
 class GeocodingResult:
     """Represents a geocoding result with formatted data"""
@@ -26,31 +50,239 @@ class GeocodingResult:
         self.country = country
         self.formatted_address = formatted_address
 
-def geocode_address(query: str, limit: int = 5) -> List[GeocodingResult]:
+    def to_dict(self) -> Dict:
+        """Serialize for the persistent cache and JSON responses"""
+        return {
+            'display_name': self.display_name,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'city': self.city,
+            'country': self.country,
+            'formatted_address': self.formatted_address
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'GeocodingResult':
+        """Rebuild a result stored by to_dict"""
+        return cls(
+            display_name=data.get('display_name', ''),
+            latitude=data['latitude'],
+            longitude=data['longitude'],
+            city=data.get('city', ''),
+            country=data.get('country', ''),
+            formatted_address=data.get('formatted_address', '')
+        )
+
+
+class GeocodingCache:
+    """SQLite-backed geocoding cache with TTL expiry and LRU eviction
+
+    Entries survive restarts and are shared by every worker process. When the
+    cache grows past max_entries the least recently used rows are evicted.
+    """
+
+    def __init__(self, db_path: str, ttl_hours: int = GEOCODING_CACHE_TTL_HOURS,
+                 max_entries: int = GEOCODING_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        if not self._initialized:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocoding_cache ("
+                "query_key TEXT PRIMARY KEY, "
+                "results TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "expires_at REAL NOT NULL, "
+                "last_accessed REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_geocoding_last_accessed "
+                "ON geocoding_cache (last_accessed)"
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def get(self, key: str) -> Optional[List[GeocodingResult]]:
+        """Return cached results for key, or None if missing or expired"""
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                try:
+                    row = conn.execute(
+                        "SELECT results, expires_at FROM geocoding_cache WHERE query_key = ?",
+                        (key,)
+                    ).fetchone()
+                    if row is None:
+                        self.misses += 1
+                        return None
+                    if row[1] < now:
+                        conn.execute("DELETE FROM geocoding_cache WHERE query_key = ?", (key,))
+                        conn.commit()
+                        self.misses += 1
+                        return None
+                    conn.execute(
+                        "UPDATE geocoding_cache SET last_accessed = ? WHERE query_key = ?",
+                        (now, key)
+                    )
+                    conn.commit()
+                    self.hits += 1
+                finally:
+                    conn.close()
+            return [GeocodingResult.from_dict(item) for item in json.loads(row[0])]
+        except (sqlite3.Error, ValueError, KeyError) as e:
+            logger.warning(f"Geocoding cache read failed for '{key}': {e}")
+            return None
+
+    def set(self, key: str, results: List[GeocodingResult], ttl_hours: Optional[int] = None):
+        """Store results for key and evict least recently used entries if over capacity"""
+        now = time.time()
+        ttl_seconds = ttl_hours * 3600 if ttl_hours is not None else self.ttl_seconds
+        payload = json.dumps([result.to_dict() for result in results])
+        try:
+            with self._lock:
+                conn = self._connect()
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO geocoding_cache "
+                        "(query_key, results, created_at, expires_at, last_accessed) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, payload, now, now + ttl_seconds, now)
+                    )
+                    self._evict(conn, now)
+                    conn.commit()
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Geocoding cache write failed for '{key}': {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drop expired rows, then trim to max_entries by least recent access"""
+        expired = conn.execute("DELETE FROM geocoding_cache WHERE expires_at < ?", (now,)).rowcount
+        overflow = conn.execute("SELECT COUNT(*) FROM geocoding_cache").fetchone()[0] - self.max_entries
+        trimmed = 0
+        if overflow > 0:
+            trimmed = conn.execute(
+                "DELETE FROM geocoding_cache WHERE query_key IN ("
+                "SELECT query_key FROM geocoding_cache ORDER BY last_accessed ASC LIMIT ?)",
+                (overflow,)
+            ).rowcount
+        if expired or trimmed:
+            self.evictions += expired + trimmed
+            logger.debug(f"Geocoding cache evicted {expired} expired and {trimmed} LRU entries")
+
+    def clear(self):
+        """Remove every cached entry and reset counters"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                try:
+                    conn.execute("DELETE FROM geocoding_cache")
+                    conn.commit()
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Geocoding cache clear failed: {e}")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict:
+        """Summarize cache contents and hit ratio"""
+        entries = []
+        expired = 0
+        try:
+            with self._lock:
+                conn = self._connect()
+                try:
+                    now = time.time()
+                    entries = [row[0] for row in conn.execute(
+                        "SELECT query_key FROM geocoding_cache ORDER BY last_accessed DESC"
+                    )]
+                    expired = conn.execute(
+                        "SELECT COUNT(*) FROM geocoding_cache WHERE expires_at < ?", (now,)
+                    ).fetchone()[0]
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Geocoding cache stats failed: {e}")
+
+        lookups = self.hits + self.misses
+        return {
+            'cache_size': len(entries),
+            'cached_queries': entries,
+            'expired_entries': expired,
+            'max_entries': self.max_entries,
+            'ttl_hours': self.ttl_seconds / 3600,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+_geocoding_cache = GeocodingCache(GEOCODING_CACHE_FILE)
+
+# One pooled, rate-limited client shared by every request thread
+_nominatim_client = RateLimitedClient(
+    NOMINATIM_URL,
+    headers={'User-Agent': NOMINATIM_USER_AGENT},
+    requests_per_second=NOMINATIM_REQUESTS_PER_SECOND
+)
+
+def normalize_query(query: str) -> str:
+    """Normalize an address so trivially different spellings share a cache entry"""
+    normalized = query.lower().strip()
+    normalized = re.sub(r'\s*,\s*', ', ', normalized)  # Consistent comma spacing
+    normalized = re.sub(r'\s+', ' ', normalized)       # Collapse whitespace
+    return normalized.strip(' ,.')
+
+def geocode_address(query: str, limit: int = 5, wait: bool = False) -> List[GeocodingResult]:
     """
     Geocode an address using multiple services with fallbacks
     
     Args:
         query: Address or place name to search for
         limit: Maximum number of results to return
+        wait: Block for a Nominatim rate-limit token instead of falling back
+              to the gazetteer (background jobs only, never request threads)
         
     Returns:
         List of GeocodingResult objects
+        
+    Raises:
+        RateLimitExceeded: Nominatim is rate limited and the gazetteer has no match
     """
     # Check cache first
-    cache_key = f"{query.lower()}:{limit}"
-    if cache_key in _geocoding_cache:
-        if datetime.now() < _cache_expiry.get(cache_key, datetime.now()):
-            logger.debug(f"Using cached geocoding result for: {query}")
-            return _geocoding_cache[cache_key]
+    cache_key = f"{normalize_query(query)}:{limit}"
+    cached = _geocoding_cache.get(cache_key)
+    if cached is not None:
+        logger.debug(f"Using cached geocoding result for: {query}")
+        return cached
     
     results = []
+    cache_ttl_hours = None
+    rate_limited = None
     
     # Try Nominatim (OpenStreetMap) first - free and reliable
     try:
-        results = _geocode_nominatim(query, limit)
+        results = _geocode_nominatim(query, limit, wait)
         if results:
             logger.info(f"Geocoded '{query}' using Nominatim: {len(results)} results")
+    except RateLimitExceeded as e:
+        rate_limited = e
+        logger.info(f"Nominatim rate limit reached, answering '{query}' from the gazetteer")
     except Exception as e:
         logger.warning(f"Nominatim geocoding failed for '{query}': {e}")
     
@@ -58,47 +290,41 @@ def geocode_address(query: str, limit: int = 5) -> List[GeocodingResult]:
     if not results:
         try:
             results = _geocode_fallback(query, limit)
+            cache_ttl_hours = FALLBACK_CACHE_TTL_HOURS
             if results:
                 logger.info(f"Geocoded '{query}' using fallback service: {len(results)} results")
         except Exception as e:
             logger.warning(f"Fallback geocoding failed for '{query}': {e}")
     
-    # Cache results for 24 hours
+    if rate_limited is not None:
+        # Not cached, so the next lookup asks Nominatim again
+        if not results:
+            raise rate_limited
+        return results
+    
+    # Cache results persistently (fallback results expire sooner)
     if results:
-        _geocoding_cache[cache_key] = results
-        _cache_expiry[cache_key] = datetime.now() + timedelta(hours=24)
+        _geocoding_cache.set(cache_key, results, ttl_hours=cache_ttl_hours)
     
     return results
 
-def _geocode_nominatim(query: str, limit: int) -> List[GeocodingResult]:
-    """Geocode using Nominatim (OpenStreetMap)"""
+def _geocode_nominatim(query: str, limit: int, wait: bool = False) -> List[GeocodingResult]:
+    """Geocode using Nominatim (OpenStreetMap) through the shared pooled client"""
     
-    # Add bias for Ireland/UK for film production locations
-    ireland_bias = "&countrycodes=ie,gb"
-    
-    url = "https://nominatim.openstreetmap.org/search"
     params = {
         'q': query,
         'format': 'json',
         'limit': limit,
         'addressdetails': 1,
         'extratags': 1,
-        'namedetails': 1
+        'namedetails': 1,
+        # Prefer Ireland/UK for film production locations without excluding
+        # anywhere else (countrycodes would be a hard filter)
+        'viewbox': NOMINATIM_VIEWBOX,
+        'bounded': 0
     }
     
-    headers = {
-        'User-Agent': 'FilmProductionCalendar/1.0 (contact@filmcalendar.example)'
-    }
-    
-    # Try with Ireland/UK bias first
-    response = requests.get(url + ireland_bias, params=params, headers=headers, timeout=10)
-    
-    if response.status_code != 200:
-        # Try without bias
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-    
-    response.raise_for_status()
-    data = response.json()
+    data = _nominatim_client.get_json('/search', params, wait=wait)
     
     results = []
     for item in data:
@@ -141,106 +367,79 @@ def _geocode_nominatim(query: str, limit: int) -> List[GeocodingResult]:
     
     return results
 
-def _geocode_fallback(query: str, limit: int) -> List[GeocodingResult]:
-    """Fallback geocoding using built-in city database"""
-    
-    # Common film production locations with coordinates
-    COMMON_LOCATIONS = {
-        # Ireland
-        'dublin': (53.3498, -6.2603, "Dublin, Ireland"),
-        'cork': (51.8985, -8.4756, "Cork, Ireland"), 
-        'galway': (53.2707, -9.0568, "Galway, Ireland"),
-        'kilkenny': (52.6541, -7.2448, "Kilkenny, Ireland"),
-        'wicklow': (52.9808, -6.0331, "Wicklow, Ireland"),
-        'waterford': (52.2593, -7.1101, "Waterford, Ireland"),
-        
-        # UK
-        'london': (51.5074, -0.1278, "London, UK"),
-        'edinburgh': (55.9533, -3.1883, "Edinburgh, Scotland"),
-        'cardiff': (51.4816, -3.1791, "Cardiff, Wales"),
-        'belfast': (54.5973, -5.9301, "Belfast, Northern Ireland"),
-        'manchester': (53.4808, -2.2426, "Manchester, UK"),
-        'birmingham': (52.4862, -1.8904, "Birmingham, UK"),
-        
-        # Common international locations
-        'paris': (48.8566, 2.3522, "Paris, France"),
-        'rome': (41.9028, 12.4964, "Rome, Italy"),
-        'prague': (50.0755, 14.4378, "Prague, Czech Republic"),
-        'budapest': (47.4979, 19.0402, "Budapest, Hungary"),
-        'barcelona': (41.3851, 2.1734, "Barcelona, Spain"),
-        'amsterdam': (52.3676, 4.9041, "Amsterdam, Netherlands"),
-    }
-    
-    query_lower = query.lower().strip()
-    results = []
+# Popular filming locations offered for quick selection (also indexed for autocomplete)
+POPULAR_FILM_LOCATIONS = [
+    # Ireland
+    {"name": "Dublin City Centre", "lat": 53.3498, "lng": -6.2603, "country": "Ireland"},
+    {"name": "Trinity College Dublin", "lat": 53.3444, "lng": -6.2567, "country": "Ireland"},
+    {"name": "Temple Bar, Dublin", "lat": 53.3453, "lng": -6.2659, "country": "Ireland"},
+    {"name": "Cliffs of Moher", "lat": 52.9715, "lng": -9.4309, "country": "Ireland"},
+    {"name": "Ring of Kerry", "lat": 51.8847, "lng": -10.1239, "country": "Ireland"},
+    {"name": "Giant's Causeway", "lat": 55.2408, "lng": -6.5116, "country": "Northern Ireland"},
+    {"name": "Ashford Castle", "lat": 53.5451, "lng": -9.3117, "country": "Ireland"},
+    {"name": "Kilmainham Gaol", "lat": 53.3420, "lng": -6.3098, "country": "Ireland"},
     
-    # Exact matches first
-    if query_lower in COMMON_LOCATIONS:
-        lat, lng, display = COMMON_LOCATIONS[query_lower]
-        city_name = display.split(',')[0]
-        country_name = display.split(',')[1].strip()
-        
-        result = GeocodingResult(
-            display_name=display,
-            latitude=lat,
-            longitude=lng,
-            city=city_name,
-            country=country_name,
-            formatted_address=display
-        )
-        results.append(result)
+    # UK Popular Film Locations
+    {"name": "Tower Bridge, London", "lat": 51.5055, "lng": -0.0754, "country": "UK"},
+    {"name": "Windsor Castle", "lat": 51.4839, "lng": -0.6044, "country": "UK"},
+    {"name": "Edinburgh Castle", "lat": 55.9486, "lng": -3.1999, "country": "Scotland"},
+    {"name": "Stonehenge", "lat": 51.1789, "lng": -1.8262, "country": "UK"},
+    {"name": "Oxford University", "lat": 51.7548, "lng": -1.2544, "country": "UK"},
+    {"name": "Canterbury Cathedral", "lat": 51.2798, "lng": 1.0830, "country": "UK"},
     
-    # Partial matches
-    for location_key, (lat, lng, display) in COMMON_LOCATIONS.items():
-        if query_lower in location_key or location_key in query_lower:
-            if not any(r.display_name == display for r in results):  # Avoid duplicates
-                city_name = display.split(',')[0]
-                country_name = display.split(',')[1].strip()
-                
-                result = GeocodingResult(
-                    display_name=display,
-                    latitude=lat,
-                    longitude=lng,
-                    city=city_name,
-                    country=country_name,
-                    formatted_address=display
-                )
-                results.append(result)
-                
-                if len(results) >= limit:
-                    break
-    
-    return results
+    # Studio Locations
+    {"name": "Ardmore Studios", "lat": 53.2034, "lng": -6.1031, "country": "Ireland"},
+    {"name": "Pinewood Studios", "lat": 51.5439, "lng": -0.6769, "country": "UK"},
+    {"name": "Shepperton Studios", "lat": 51.3956, "lng": -0.4535, "country": "UK"},
+]
+
+_popular_locations_indexed = False
+_popular_locations_lock = threading.Lock()
+
+def _get_location_index() -> Gazetteer:
+    """Offline gazetteer with the popular filming locations added to it"""
+    global _popular_locations_indexed
+    gazetteer = get_gazetteer()
+    if _popular_locations_indexed:
+        return gazetteer
+    with _popular_locations_lock:
+        if _popular_locations_indexed:
+            return gazetteer
+        for location in POPULAR_FILM_LOCATIONS:
+            gazetteer.add(GazetteerEntry(
+                name=location['name'],
+                latitude=location['lat'],
+                longitude=location['lng'],
+                admin1=location['country'],
+                feature='landmark'
+            ))
+        _popular_locations_indexed = True
+    return gazetteer
+
+def _entry_to_result(entry: GazetteerEntry) -> GeocodingResult:
+    """Convert a gazetteer entry to the shape returned by geocode_address"""
+    country = entry.country if entry.feature != 'landmark' else entry.admin1
+    display_name = entry.name if entry.feature == 'landmark' else entry.display_name
+    return GeocodingResult(
+        display_name=display_name,
+        latitude=entry.latitude,
+        longitude=entry.longitude,
+        city=entry.name if entry.feature != 'landmark' else "",
+        country=country,
+        formatted_address=f"{entry.name}, {country}" if entry.feature == 'landmark' else display_name
+    )
+
+def autocomplete_location(query: str, limit: int = 5) -> List[GeocodingResult]:
+    """Instant prefix lookup against the offline gazetteer (no network access)"""
+    return [_entry_to_result(entry) for entry in _get_location_index().search(query, limit)]
+
+def _geocode_fallback(query: str, limit: int) -> List[GeocodingResult]:
+    """Fallback geocoding using the offline gazetteer"""
+    return autocomplete_location(query, limit)
 
 def get_popular_film_locations() -> List[Dict]:
     """Get a list of popular filming locations for quick selection"""
-    
-    popular_locations = [
-        # Ireland
-        {"name": "Dublin City Centre", "lat": 53.3498, "lng": -6.2603, "country": "Ireland"},
-        {"name": "Trinity College Dublin", "lat": 53.3444, "lng": -6.2567, "country": "Ireland"},
-        {"name": "Temple Bar, Dublin", "lat": 53.3453, "lng": -6.2659, "country": "Ireland"},
-        {"name": "Cliffs of Moher", "lat": 52.9715, "lng": -9.4309, "country": "Ireland"},
-        {"name": "Ring of Kerry", "lat": 51.8847, "lng": -10.1239, "country": "Ireland"},
-        {"name": "Giant's Causeway", "lat": 55.2408, "lng": -6.5116, "country": "Northern Ireland"},
-        {"name": "Ashford Castle", "lat": 53.5451, "lng": -9.3117, "country": "Ireland"},
-        {"name": "Kilmainham Gaol", "lat": 53.3420, "lng": -6.3098, "country": "Ireland"},
-        
-        # UK Popular Film Locations
-        {"name": "Tower Bridge, London", "lat": 51.5055, "lng": -0.0754, "country": "UK"},
-        {"name": "Windsor Castle", "lat": 51.4839, "lng": -0.6044, "country": "UK"},
-        {"name": "Edinburgh Castle", "lat": 55.9486, "lng": -3.1999, "country": "Scotland"},
-        {"name": "Stonehenge", "lat": 51.1789, "lng": -1.8262, "country": "UK"},
-        {"name": "Oxford University", "lat": 51.7548, "lng": -1.2544, "country": "UK"},
-        {"name": "Canterbury Cathedral", "lat": 51.2798, "lng": 1.0830, "country": "UK"},
-        
-        # Studio Locations
-        {"name": "Ardmore Studios", "lat": 53.2034, "lng": -6.1031, "country": "Ireland"},
-        {"name": "Pinewood Studios", "lat": 51.5439, "lng": -0.6769, "country": "UK"},
-        {"name": "Shepperton Studios", "lat": 51.3956, "lng": -0.4535, "country": "UK"},
-    ]
-    
-    return popular_locations
+    return [dict(location) for location in POPULAR_FILM_LOCATIONS]
 
 def validate_coordinates(latitude: float, longitude: float) -> bool:
     """Validate that coordinates are within reasonable bounds"""
@@ -253,14 +452,11 @@ def validate_coordinates(latitude: float, longitude: float) -> bool:
 
 def clear_geocoding_cache():
     """Clear the geocoding cache"""
-    global _geocoding_cache, _cache_expiry
     _geocoding_cache.clear()
-    _cache_expiry.clear()
     logger.info("Geocoding cache cleared")
 
 def get_cache_stats() -> Dict:
     """Get geocoding cache statistics"""
-    return {
-        'cache_size': len(_geocoding_cache),
-        'cached_queries': list(_geocoding_cache.keys())
-    }
\ No newline at end of file
+    stats = _geocoding_cache.stats()
+    stats['nominatim'] = _nominatim_client.stats()
+    return stats
\ No newline at end of file
@@ -4,11 +4,15 @@ import json
 import uuid
 import logging
 import shutil
+import threading
 from flask import session
 from datetime import datetime
+from functools import wraps
 # Import necessary functions from calendar_generator directly
 # Adjust based on actual functions needed by these helpers
 from .calendar_generator import generate_calendar_days, calculate_department_counts
+from .file_utils import save_json_file_atomic
+from .request_timing import timed
 
 # Define Constants relative to this file's location
 UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -24,12 +28,24 @@ VERSION_DATA_DIR = 'versions'
 # Setup logger for helpers
 logger = logging.getLogger(__name__)
 
+# Creating and publishing versions read, modify and rewrite versions.json; they
+# are serialised per project so concurrent publishes can't overwrite each other
+_version_locks = {}
+_version_locks_guard = threading.Lock()
+
 # --- Helper Functions ---
 
 def get_user_projects_dir(user_id):
     """Get the projects directory path for a specific user"""
     return os.path.join(USERS_DIR, user_id, 'projects')
 
+def get_project_dir(project_id, user_id=None):
+    """Get the directory of a project (user-scoped, or legacy if no user_id)"""
+    if user_id:
+        return os.path.join(get_user_projects_dir(user_id), project_id)
+    return os.path.join(PROJECTS_DIR, project_id)
+
+@timed('storage')
 def get_projects(user_id=None):
     """Get all projects for a user (or legacy projects if no user_id)"""
     projects = []
@@ -73,6 +89,7 @@ def get_projects(user_id=None):
         logger.error(f"Error listing projects directory: {str(e)}")
         return []
 
+@timed('storage')
 def get_project(project_id, user_id=None):
     """Get a specific project"""
     if not project_id or project_id == 'new': # Handle 'new' case explicitly
@@ -96,6 +113,7 @@ def get_project(project_id, user_id=None):
         logger.error(f"Error getting project {project_id} for user {user_id}: {str(e)}")
         return None
 
+@timed('write')
 def save_project(project, user_id=None):
     """Save a project"""
     try:
@@ -123,8 +141,8 @@ def save_project(project, user_id=None):
         project['updated'] = now
 
         main_file = os.path.join(project_dir, 'main.json')
-        with open(main_file, 'w', encoding='utf-8') as f:
-            json.dump(project, f, indent=2, ensure_ascii=False)
+        if not save_json_file_atomic(main_file, project):
+            raise IOError(f"Could not write {main_file}")
 
         logger.info(f"Project {project_id} saved successfully for user {user_id}")
         return project
@@ -133,6 +151,7 @@ def save_project(project, user_id=None):
         raise # Re-raise the exception so route can handle it
 
 # Update the existing get_project_calendar function to use workspace
+@timed('storage')
 def get_project_calendar(project_id, user_id=None):
     """
     Get calendar data for a project (from workspace)
@@ -160,6 +179,7 @@ def get_project_calendar(project_id, user_id=None):
             return {"days": []}
 
 # Update the save_project_calendar function to save to workspace
+@timed('write')
 def save_project_calendar(project_id, calendar_data, user_id=None):
     """Save calendar data for a project (to workspace)"""
     if not project_id:
@@ -186,8 +206,8 @@ def save_project_calendar(project_id, calendar_data, user_id=None):
             os.makedirs(project_dir, exist_ok=True)
             calendar_file = os.path.join(project_dir, 'calendar.json')
 
-            with open(calendar_file, 'w', encoding='utf-8') as f:
-                json.dump(calendar_data, f, indent=2, ensure_ascii=False)
+            if not save_json_file_atomic(calendar_file, calendar_data):
+                raise IOError(f"Could not write {calendar_file}")
 
             logger.info(f"Calendar data for project {project_id} saved successfully for user {user_id}")
             return calendar_data
@@ -333,6 +353,7 @@ def update_all_projects_department_counts():
 # --- Global Data Loaders (Example for locations/areas/departments) ---
 # Consider placing these here or in a dedicated data_loader util file
 
+@timed('storage')
 def load_global_data(filename, default=[]):
     """Helper to load global JSON data like areas.json, locations.json"""
     filepath = os.path.join(DATA_DIR, filename)
@@ -344,6 +365,7 @@ def load_global_data(filename, default=[]):
             logger.error(f"Error loading global data file {filename}: {e}")
     return default
 
+@timed('write')
 def save_global_data(filename, data):
     """Helper to save global JSON data"""
     filepath = os.path.join(DATA_DIR, filename)
@@ -453,6 +475,7 @@ def migrate_project_to_versioned_structure(project_id, user_id=None):
         return False
 
 
+@timed('storage')
 def get_project_versions(project_id, user_id=None):
     """
     Get all versions for a project
@@ -478,6 +501,7 @@ def get_project_versions(project_id, user_id=None):
         logger.error(f"Error getting versions for project {project_id} user {user_id}: {str(e)}")
         return []
 
+@timed('storage')
 def get_project_workspace(project_id, user_id=None):
     """
     Get the current workspace for a project
@@ -525,6 +549,7 @@ def get_project_workspace(project_id, user_id=None):
         return None
 
 
+@timed('write')
 def save_project_workspace(project_id, workspace_data, user_id=None):
     """
     Save the workspace for a project
@@ -542,8 +567,8 @@ def save_project_workspace(project_id, workspace_data, user_id=None):
         workspace_data['lastModified'] = datetime.utcnow().isoformat() + 'Z'
         workspace_data['isDraft'] = True
         
-        with open(workspace_file, 'w') as f:
-            json.dump(workspace_data, f, indent=2)
+        if not save_json_file_atomic(workspace_file, workspace_data):
+            return False
             
         logger.info(f"Saved workspace for project {project_id} user {user_id}")
         return True
@@ -553,6 +578,18 @@ def save_project_workspace(project_id, workspace_data, user_id=None):
         return False
 
 
+def _versions_locked(func):
+    """Run func(project_id, ...) while holding that project's versions lock"""
+    @wraps(func)
+    def wrapper(project_id, *args, **kwargs):
+        with _version_locks_guard:
+            lock = _version_locks.setdefault(project_id, threading.RLock())
+        with lock:
+            return func(project_id, *args, **kwargs)
+    return wrapper
+
+@timed('write')
+@_versions_locked
 def create_project_version(project_id, version_number, notes=None, user_id=None):
     """
     Create a new version from the current workspace
@@ -604,8 +641,8 @@ def create_project_version(project_id, version_number, notes=None, user_id=None)
         versions_data['versions'].append(new_version)
         
         # Save versions file
-        with open(versions_file, 'w') as f:
-            json.dump(versions_data, f, indent=2)
+        if not save_json_file_atomic(versions_file, versions_data):
+            raise IOError(f"Could not write {versions_file}")
             
         # Update workspace to reference this version
         workspace_data['baseVersionId'] = version_id
@@ -619,6 +656,8 @@ def create_project_version(project_id, version_number, notes=None, user_id=None)
         logger.error(f"Error creating version for project {project_id}: {str(e)}")
         return None
 
+@timed('write')
+@_versions_locked
 def publish_project_version(project_id, version_id, user_id=None):
     """
     Publish a specific version of a project
@@ -663,8 +702,8 @@ def publish_project_version(project_id, version_id, user_id=None):
         versions_data['latestPublishedId'] = version_id
         
         # Save updated versions
-        with open(versions_file, 'w') as f:
-            json.dump(versions_data, f, indent=2)
+        if not save_json_file_atomic(versions_file, versions_data):
+            raise IOError(f"Could not write {versions_file}")
             
         logger.info(f"Published version {version_id} for project {project_id}")
         return True
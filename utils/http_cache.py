@@ -0,0 +1,136 @@
+"""
+HTTP conditional GET helpers
+Builds strong ETags from cheap inputs (file mtimes/sizes, version ids, content
+hashes) so a matching If-None-Match returns 304 before any data is loaded
+"""
+
+import os
+import json
+import hashlib
+from datetime import date, datetime, timezone
+from typing import Callable, Iterable, Optional, Tuple
+
+from flask import request, make_response, session
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Files whose content shapes rendered pages (templates, view code, bundled CSS/JS)
+RENDER_SOURCES = (('templates', ('.html',)), ('routes', ('.py',)), ('utils', ('.py',)), ('static', ('.css', '.js')))
+
+# Cache-Control values
+REVALIDATE = 'private, no-cache'
+
+# Appended to an ETag when the body is sent compressed (see utils/compression.py)
+ENCODING_ETAG_SUFFIXES = {'gzip': '-gzip', 'br': '-br'}
+
+
+def file_signature(paths: Iterable[str]) -> tuple:
+    """(mtime_ns, size) for each path, or None if it does not exist"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None))
+    return tuple(signature)
+
+def last_modified_of(paths: Iterable[str]) -> Optional[datetime]:
+    """Most recent mtime of the existing paths"""
+    mtimes = []
+    for path in paths:
+        try:
+            mtimes.append(os.stat(path).st_mtime)
+        except OSError:
+            continue
+    if not mtimes:
+        return None
+    return datetime.fromtimestamp(int(max(mtimes)), tz=timezone.utc)
+
+def _render_revision() -> Tuple[str, Optional[datetime]]:
+    """Content hash and newest mtime of the render sources
+
+    Hashing content rather than using the process start makes the value the same
+    in every worker and across restarts, and change only when a deploy does.
+    """
+    digest = hashlib.sha1()
+    paths = []
+    for directory, extensions in RENDER_SOURCES:
+        for root, dirs, files in os.walk(os.path.join(APP_ROOT, directory)):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            paths += [os.path.join(root, name) for name in sorted(files) if name.endswith(extensions)]
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            continue
+        digest.update(os.path.relpath(path, APP_ROOT).encode('utf-8'))
+        digest.update(content)
+    return digest.hexdigest(), last_modified_of(paths)
+
+RENDER_REVISION, RENDER_MODIFIED = _render_revision()
+
+def page_last_modified(paths: Iterable[str], day: Optional[date] = None) -> Optional[datetime]:
+    """Last-Modified from the same inputs as a page's ETag
+
+    The newest of the data files, the render sources and, for pages that depend
+    on the current date, the start of that day.
+    """
+    candidates = [last_modified_of(paths), RENDER_MODIFIED]
+    if day is not None:
+        candidates.append(datetime(day.year, day.month, day.day, tzinfo=timezone.utc))
+    candidates = [candidate for candidate in candidates if candidate]
+    return max(candidates) if candidates else None
+
+def make_etag(*parts) -> str:
+    """Strong ETag value (unquoted) from any repr-able parts"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+def content_etag(data) -> str:
+    """Strong ETag value (unquoted) from a JSON-serializable object"""
+    serialized = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+def conditional_response(etag: str, build: Callable, last_modified: Optional[datetime] = None,
+                         cache_control: str = REVALIDATE):
+    """Return 304 if the client's copy is current, otherwise build() the response
+
+    Args:
+        etag: Unquoted strong ETag for the resource
+        build: Called only on a cache miss; returns anything make_response accepts
+        last_modified: Optional Last-Modified timestamp
+        cache_control: Cache-Control header value for both 200 and 304
+
+    Returns:
+        Flask response with ETag, Last-Modified and Cache-Control set
+    """
+    # Pending flash messages are rendered into the next page, so never skip it
+    current_etag = None if session.get('_flashes') else _current_etag(etag, last_modified)
+    if current_etag:
+        response = make_response('', 304)
+        response.set_etag(current_etag)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+        response.set_etag(etag)
+
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    # Session values are part of the ETag; for If-Modified-Since the browser keeps
+    # them apart by keying its cached copy on the cookie
+    response.vary.add('Cookie')
+    return response
+
+def _current_etag(etag: str, last_modified: Optional[datetime]) -> Optional[str]:
+    """The validator the client already holds for this resource, if its copy is current"""
+    if request.if_none_match:
+        # Compressed representations carry an encoding suffix on the same ETag
+        for candidate in [etag] + [etag + suffix for suffix in ENCODING_ETAG_SUFFIXES.values()]:
+            if request.if_none_match.contains(candidate):
+                return candidate
+        return None
+    if last_modified and request.if_modified_since and last_modified <= request.if_modified_since:
+        return etag
+    return None
@@ -0,0 +1,209 @@
+"""
+Pooled, rate-limited HTTP client for external JSON APIs
+Shares one requests.Session (keep-alive connection pool), throttles with a
+token bucket and coalesces identical in-flight requests. Request threads never
+sleep: when no token is free they get RateLimitExceeded straight away. Only
+background jobs wait for a token and retry with backoff.
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying - rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class RateLimitExceeded(requests.RequestException):
+    """No token was free for a non-waiting call, or the service answered 429
+
+    retry_after is how many seconds the caller should wait before trying again.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Thread-safe token bucket
+
+    acquire() blocks until a token is available; try_acquire() takes one only if
+    it can do so immediately, for callers that would rather reject than wait.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        """Add tokens earned since the last update (caller holds the lock)"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self) -> bool:
+        """Take a token if one is available now; never blocks"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def wait_time(self) -> float:
+        """Seconds until a token will be available (0 if one is available now)"""
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+    def is_full(self) -> bool:
+        """True once the bucket has refilled completely (it holds no state worth keeping)"""
+        with self._lock:
+            self._refill()
+            return self._tokens >= self.capacity
+
+
+class _InFlightRequest:
+    """Result slot shared by callers coalesced onto the same request"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class RateLimitedClient:
+    """JSON GET client with connection pooling, throttling, coalescing and retries
+
+    Args:
+        base_url: Service root, e.g. "https://nominatim.openstreetmap.org"
+        headers: Default headers sent with every request (User-Agent etc.)
+        requests_per_second: Sustained request rate allowed by the service
+        max_retries: Retries after the first attempt for transient failures
+        backoff_seconds: Initial backoff, doubled after each failed attempt
+        timeout: Per-request timeout in seconds
+        pool_size: Maximum keep-alive connections held by the session
+    """
+
+    def __init__(self, base_url: str, headers: Optional[Dict[str, str]] = None,
+                 requests_per_second: float = 1.0, max_retries: int = 2,
+                 backoff_seconds: float = 1.0, timeout: float = 10, pool_size: int = 4):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.rate_limiter = TokenBucket(requests_per_second)
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._in_flight: Dict[Tuple, _InFlightRequest] = {}
+        self._in_flight_lock = threading.Lock()
+
+        self.requests_sent = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def get_json(self, path: str, params: Optional[Dict[str, Any]] = None, wait: bool = False) -> Any:
+        """GET base_url + path and return decoded JSON
+
+        Concurrent calls with the same path, params and wait share a single request.
+        By default a call makes one attempt and raises RateLimitExceeded at once
+        if no token is free, so a request thread never sleeps. Background jobs
+        pass wait=True to block for a token and retry transient failures.
+        Raises requests.RequestException if every attempt fails.
+        """
+        key = (path, tuple(sorted((params or {}).items())), wait)
+
+        with self._in_flight_lock:
+            pending = self._in_flight.get(key)
+            leader = pending is None
+            if leader:
+                pending = _InFlightRequest()
+                self._in_flight[key] = pending
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            pending.done.wait()
+            if pending.error:
+                raise pending.error
+            return pending.result
+
+        try:
+            pending.result = self._get_with_retries(path, params, wait)
+            return pending.result
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._in_flight_lock:
+                self._in_flight.pop(key, None)
+            pending.done.set()
+
+    def _get_with_retries(self, path: str, params: Optional[Dict[str, Any]], wait: bool) -> Any:
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        delay = self.backoff_seconds
+        last_attempt = self.max_retries if wait else 0
+
+        for attempt in range(last_attempt + 1):
+            if wait:
+                self.rate_limiter.acquire()
+            elif not self.rate_limiter.try_acquire():
+                self.rate_limited += 1
+                raise RateLimitExceeded(f"Rate limit reached for {url}", self.rate_limiter.wait_time())
+            self.requests_sent += 1
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                # Honour Retry-After when the service tells us how long to wait
+                retry_after = response.headers.get('Retry-After', '')
+                pause = float(retry_after) if retry_after.isdigit() else delay
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt == last_attempt:
+                    if response.status_code == 429:
+                        self.rate_limited += 1
+                        raise RateLimitExceeded(f"{url} returned 429", pause)
+                    response.raise_for_status()
+                    return response.json()
+                logger.warning(f"{url} returned {response.status_code}, retrying in {pause:.1f}s")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == last_attempt:
+                    raise
+                pause = delay
+                logger.warning(f"{url} failed ({e}), retrying in {pause:.1f}s")
+
+            self.retries += 1
+            time.sleep(pause)
+            delay *= 2
+
+    def stats(self) -> Dict:
+        """Counters for monitoring"""
+        return {
+            'requests_sent': self.requests_sent,
+            'coalesced': self.coalesced,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited
+        }
@@ -0,0 +1,155 @@
+"""
+Login throttling
+Password hashing is the most CPU-expensive thing the app does, so login attempts
+are rate limited per client IP and failed attempts per account (token buckets
+held in memory), and only a few hashes run at once so a burst of logins can't
+take every worker thread away from the viewer.
+"""
+
+import os
+import math
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from flask import request
+
+from .http_client import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+LOGIN_ATTEMPTS_PER_MINUTE_IP = float(os.environ.get('LOGIN_ATTEMPTS_PER_MINUTE_IP', 10))
+LOGIN_FAILURES_PER_MINUTE_ACCOUNT = float(os.environ.get('LOGIN_FAILURES_PER_MINUTE_ACCOUNT', 5))
+# Request threads per worker (gunicorn --threads in the Dockerfile)
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 2))
+# Hashes allowed to run at once, and how long a request waits for a free slot
+LOGIN_MAX_CONCURRENT_HASHES = int(os.environ.get('LOGIN_MAX_CONCURRENT_HASHES', SERVER_THREADS))
+LOGIN_HASH_WAIT_SECONDS = float(os.environ.get('LOGIN_HASH_WAIT_SECONDS', 2))
+LOGIN_THROTTLE_MAX_KEYS = int(os.environ.get('LOGIN_THROTTLE_MAX_KEYS', 10000))
+# Reverse proxies in front of the app that append to X-Forwarded-For (0 = use the socket address)
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+
+
+class _BucketTable:
+    """LRU of token buckets keyed by IP or account name"""
+
+    def __init__(self, per_minute: float, max_keys: int):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, per_minute)
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def peek(self, key: str) -> Optional[TokenBucket]:
+        with self._lock:
+            return self._buckets.get(key)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class LoginThrottle:
+    """Per-IP attempt and per-account failure limits plus a cap on concurrent hashing
+
+    Args:
+        ip_per_minute: Login attempts allowed per client IP per minute (also the burst size)
+        account_failures_per_minute: Failed logins allowed per account per minute (also the burst size)
+        max_concurrent_hashes: Password checks allowed to run at the same time
+        hash_wait_seconds: How long a request waits for a hashing slot before giving up
+        max_keys: Buckets kept per table; the least recently used are dropped first
+    """
+
+    def __init__(self, ip_per_minute: float = LOGIN_ATTEMPTS_PER_MINUTE_IP,
+                 account_failures_per_minute: float = LOGIN_FAILURES_PER_MINUTE_ACCOUNT,
+                 max_concurrent_hashes: int = LOGIN_MAX_CONCURRENT_HASHES,
+                 hash_wait_seconds: float = LOGIN_HASH_WAIT_SECONDS,
+                 max_keys: int = LOGIN_THROTTLE_MAX_KEYS):
+        self._ips = _BucketTable(ip_per_minute, max_keys)
+        self._accounts = _BucketTable(account_failures_per_minute, max_keys)
+        self._hash_slots = threading.BoundedSemaphore(max(1, max_concurrent_hashes))
+        self.hash_wait_seconds = hash_wait_seconds
+
+    @staticmethod
+    def _account_key(username_or_email: str) -> str:
+        return username_or_email.strip().lower()
+
+    def check(self, ip: str, username_or_email: str) -> float:
+        """Count a login attempt; returns 0 if it may proceed, else seconds to wait
+
+        Every attempt spends one of the IP's tokens. An account that has used up its
+        failures is refused before any hashing is done.
+        """
+        ip_bucket = self._ips.get(ip)
+        if not ip_bucket.try_acquire():
+            logger.warning(f"Login attempts from {ip} throttled")
+            return ip_bucket.wait_time()
+
+        account_bucket = self._accounts.peek(self._account_key(username_or_email))
+        if account_bucket is not None:
+            wait = account_bucket.wait_time()
+            if wait > 0:
+                logger.warning(f"Login attempts for {username_or_email} throttled")
+                return wait
+        return 0.0
+
+    def record_failure(self, username_or_email: str):
+        """Spend one of the account's failure tokens"""
+        self._accounts.get(self._account_key(username_or_email)).try_acquire()
+
+    def record_success(self, username_or_email: str):
+        """Forget an account's earlier failures"""
+        self._accounts.discard(self._account_key(username_or_email))
+
+    @contextmanager
+    def hashing_slot(self) -> Iterator[bool]:
+        """Hold one of the concurrent-hash slots; yields False if none freed up in time"""
+        acquired = self._hash_slots.acquire(timeout=self.hash_wait_seconds)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._hash_slots.release()
+
+    def stats(self) -> dict:
+        return {'ip_buckets': len(self._ips), 'account_buckets': len(self._accounts)}
+
+
+_login_throttle = LoginThrottle()
+
+def get_login_throttle() -> LoginThrottle:
+    """The process-wide login throttle"""
+    return _login_throttle
+
+def client_ip() -> str:
+    """The requesting client's address
+
+    With TRUSTED_PROXY_COUNT set, the address the outermost trusted proxy saw is
+    taken from X-Forwarded-For; otherwise the socket address is used, since the
+    header can be forged by anyone talking to the app directly.
+    """
+    if TRUSTED_PROXY_COUNT > 0:
+        forwarded = [addr.strip() for addr in request.headers.get('X-Forwarded-For', '').split(',') if addr.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_COUNT:
+            return forwarded[-TRUSTED_PROXY_COUNT]
+    return request.remote_addr or 'unknown'
+
+def retry_after_header(seconds: float) -> str:
+    """Retry-After value (whole seconds, at least 1)"""
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,273 @@
+"""
+In-process metrics
+Counters and histograms kept in memory and served at /metrics in the Prometheus
+text format, so any Prometheus-compatible scraper (or curl) can read them without
+an extra service or client library.
+
+Collected:
+- requests and latency per blueprint/endpoint (from utils/request_timing.py)
+- per-phase durations, including calendar generation
+- JSON file reads/writes and bytes
+- cache hits/misses: sun times, geocoding, users.json, access registry, template fragments
+- public calendar views per project
+
+Counts are per worker process. /metrics answers logged-in admins, and scrapers
+sending "Authorization: Bearer <METRICS_TOKEN>"; anyone else gets a 401, since
+the output names project ids.
+"""
+
+import os
+import hmac
+import time
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') not in ('0', 'false', 'no')
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Sample = Tuple[Dict[str, str], float]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+def _family(name: str, kind: str, documentation: str, samples: Iterable[Tuple[str, Dict[str, str], float]]) -> List[str]:
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    lines += [f"{sample_name}{_format_labels(labels)} {_format_value(value)}" for sample_name, labels, value in samples]
+    return lines
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return _family(self.name, 'counter', self.documentation,
+                       ((self.name, dict(zip(self.labelnames, key)), value) for key, value in values))
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple, List[float]] = {}  # key -> bucket counts + [sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(state)) for key, state in self._values.items())
+
+        def samples():
+            for key, state in values:
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    yield f"{self.name}_bucket", dict(labels, le=_format_value(bound)), cumulative
+                yield f"{self.name}_bucket", dict(labels, le='+Inf'), state[-1]
+                yield f"{self.name}_sum", labels, state[-2]
+                yield f"{self.name}_count", labels, state[-1]
+        return _family(self.name, 'histogram', self.documentation, samples())
+
+
+class MetricsRegistry:
+    """Metrics plus collectors that read current values from elsewhere at scrape time
+
+    A collector returns (name, type, help, samples) tuples, where samples is a list
+    of (labels, value).
+    """
+
+    def __init__(self):
+        self._metrics: List = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines += metric.collect()
+        for collector in self._collectors:
+            try:
+                for name, kind, documentation, samples in collector():
+                    lines += _family(name, kind, documentation, ((name, labels, value) for labels, value in samples))
+            except Exception as e:
+                logger.error(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.register(Counter(
+    'app_requests_total', 'HTTP requests handled', ('blueprint', 'endpoint', 'method', 'status')))
+REQUEST_DURATION = registry.register(Histogram(
+    'app_request_duration_seconds', 'HTTP request latency', ('blueprint', 'endpoint')))
+PHASE_DURATION = registry.register(Histogram(
+    'app_phase_duration_seconds', 'Time per request spent in each phase (storage, generation, counting, sun, render, write)',
+    ('phase',)))
+FILE_READS = registry.register(Counter('app_file_reads_total', 'JSON files read by load_json_file'))
+FILE_READ_BYTES = registry.register(Counter('app_file_read_bytes_total', 'Bytes of JSON read'))
+FILE_WRITES = registry.register(Counter('app_file_writes_total', 'JSON files written by save_json_file_atomic'))
+FILE_WRITE_BYTES = registry.register(Counter('app_file_write_bytes_total', 'Bytes of JSON written'))
+
+STARTED_AT = time.time()
+
+
+def record_file_read(nbytes: int):
+    FILE_READS.inc()
+    FILE_READ_BYTES.inc(nbytes)
+
+def record_file_write(nbytes: int):
+    FILE_WRITES.inc()
+    FILE_WRITE_BYTES.inc(nbytes)
+
+def record_request(method: str, blueprint: Optional[str], endpoint: Optional[str], status: int, timings):
+    """Request listener for utils/request_timing.py"""
+    blueprint = blueprint or ''
+    endpoint = endpoint or 'unmatched'
+    REQUESTS.inc(blueprint=blueprint, endpoint=endpoint, method=method, status=status)
+    REQUEST_DURATION.observe(timings.elapsed(), blueprint=blueprint, endpoint=endpoint)
+    for phase, (seconds, _) in timings.phases.items():
+        PHASE_DURATION.observe(seconds, phase=phase)
+
+
+# --- Collectors (values owned by other modules, read at scrape time) ---
+
+_access_manager = None
+# Set by init_metrics when the app has a template fragment cache
+_fragment_cache = None
+
+def _cache_samples():
+    from .sun_utils import get_cache_stats as sun_cache_stats
+    from .geocoding import get_cache_stats as geocoding_cache_stats
+    from .user_helpers import get_user_store
+
+    caches: Dict[str, Dict] = {}
+    sun = sun_cache_stats()
+    caches['sun'] = sun
+    geocoding = geocoding_cache_stats()
+    caches['geocoding'] = {'hits': geocoding.get('hits', 0), 'misses': geocoding.get('misses', 0),
+                           'entries': geocoding.get('cache_size', 0)}
+    store = get_user_store()
+    caches['users_json'] = {'hits': store.hits, 'misses': store.reloads, 'entries': len(store.users())}
+    manager = _get_access_manager()
+    caches['access_registry'] = {'hits': manager.registry_hits, 'misses': manager.registry_reloads}
+    if _fragment_cache is not None:
+        caches['template_fragments'] = _fragment_cache.stats()
+
+    def samples(field):
+        return [({'cache': name}, stats.get(field, 0)) for name, stats in caches.items() if field in stats]
+
+    return [
+        ('app_cache_hits_total', 'counter', 'Cache lookups answered from memory', samples('hits')),
+        ('app_cache_misses_total', 'counter', 'Cache lookups that had to compute or reload', samples('misses')),
+        ('app_cache_entries', 'gauge', 'Entries currently held per cache', samples('entries')),
+    ]
+
+def _get_access_manager():
+    global _access_manager
+    if _access_manager is None:
+        from .access_manager import ProjectAccessManager
+        _access_manager = ProjectAccessManager()
+    return _access_manager
+
+def _public_view_samples():
+    counts = _get_access_manager().view_counts_by_project()
+    return [('app_public_views_total', 'counter', 'Public calendar views per project (link and access code)',
+             [({'project': project_id}, views) for project_id, views in sorted(counts.items())])]
+
+def _process_samples():
+    return [('app_uptime_seconds', 'gauge', 'Seconds since this worker started', [({}, round(time.time() - STARTED_AT, 3))])]
+
+registry.register_collector(_cache_samples)
+registry.register_collector(_public_view_samples)
+registry.register_collector(_process_samples)
+
+
+def _authorized(request) -> bool:
+    from .decorators import is_admin
+
+    if METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '')
+        if hmac.compare_digest(supplied.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+            return True
+    return is_admin()
+
+def init_metrics(app):
+    """Record request metrics and serve /metrics
+
+    Request counts and latency come from utils/request_timing.py, so
+    REQUEST_TIMING must be enabled for them.
+    """
+    if not METRICS_ENABLED:
+        return None
+
+    from flask import Response, request
+    from .request_timing import add_request_listener
+
+    global _fragment_cache
+    _fragment_cache = getattr(app.jinja_env, 'fragment_cache', None)
+    add_request_listener(record_request)
+
+    @app.route('/metrics')
+    def metrics():
+        if not _authorized(request):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain',
+                            headers={'WWW-Authenticate': 'Bearer'})
+        response = Response(registry.render(), mimetype='text/plain; version=0.0.4')
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    logger.info(f"Metrics enabled at /metrics ({'admins and bearer token' if METRICS_TOKEN else 'admins only'})")
+    return registry
@@ -0,0 +1,270 @@
+"""
+Request profiler
+Lets an admin profile a single live request by adding ?_profile=cprofile or
+?_profile=sample to its URL (or sending an X-Profile header with either value):
+
+- cprofile: deterministic cProfile of the request's thread, stored as a .prof
+  file (pstats, snakeviz)
+- sample: a sampling profiler that records the request's stack every
+  PROFILE_SAMPLE_INTERVAL_MS, stored as collapsed stacks (.folded, for
+  flamegraph.pl or speedscope)
+
+The response carries an X-Profile header with the stored profile's URL; add
+_profile_output=inline (or X-Profile-Output: inline) to get the report as the
+response instead. Stored profiles are listed at /admin/profiles.
+
+Only the profiled request's thread is traced, one profile runs at a time, and
+the switch is ignored for anyone who isn't a logged-in admin.
+"""
+
+import os
+import io
+import re
+import sys
+import time
+import uuid
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+
+from flask import Response, abort, jsonify, request, send_from_directory
+
+from .helpers import BASE_DIR, DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '1') not in ('0', 'false', 'no')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(DATA_DIR, 'profiles'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 2))
+# Functions listed in the inline cProfile report
+PROFILE_REPORT_LINES = int(os.environ.get('PROFILE_REPORT_LINES', 60))
+
+PROFILERS = ('cprofile', 'sample')
+ENVIRON_KEY = 'app.profiler'
+
+# Held while a request is being profiled
+_profile_slot = threading.Lock()
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """One 'outer;...;inner count' line per distinct stack"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(BASE_DIR):
+        filename = os.path.relpath(filename, BASE_DIR)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+class RequestProfile:
+    """A running profile of the current request"""
+
+    def __init__(self, kind: str, inline: bool):
+        self.kind = kind
+        self.inline = inline
+        self.id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self._profiler = None
+
+    def start(self):
+        if self.kind == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = SamplingProfiler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_MS / 1000)
+            self._profiler.start()
+
+    def stop(self):
+        if self.kind == 'cprofile':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def filename(self) -> str:
+        endpoint = re.sub(r'[^A-Za-z0-9_.-]', '_', request.endpoint or 'unmatched')
+        return f"{self.id}-{endpoint}.{'prof' if self.kind == 'cprofile' else 'folded'}"
+
+    def save(self) -> Optional[str]:
+        """Write the profile to PROFILE_DIR; returns the file name"""
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            filename = self.filename
+            path = os.path.join(PROFILE_DIR, filename)
+            if self.kind == 'cprofile':
+                self._profiler.dump_stats(path)
+            else:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(self._profiler.collapsed())
+            _prune_profiles()
+            return filename
+        except Exception as e:
+            logger.error(f"Error saving profile {self.id}: {e}")
+            return None
+
+    def report(self) -> str:
+        """Plain-text report for inline output"""
+        header = (f"# {request.method} {request.full_path.rstrip('?')}\n"
+                  f"# {self.kind} profile, {self.elapsed * 1000:.1f}ms\n")
+        if self.kind == 'cprofile':
+            stream = io.StringIO()
+            stats = pstats.Stats(self._profiler, stream=stream)
+            stats.strip_dirs().sort_stats('cumulative').print_stats(PROFILE_REPORT_LINES)
+            return header + stream.getvalue()
+        return (header + f"# {self._profiler.samples} samples every {PROFILE_SAMPLE_INTERVAL_MS:g}ms, "
+                "collapsed stacks (flamegraph.pl / speedscope)\n" + self._profiler.collapsed())
+
+
+def _prune_profiles():
+    """Keep only the newest PROFILE_KEEP profiles"""
+    for filename in list_profiles()[PROFILE_KEEP:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, filename))
+        except OSError:
+            pass
+
+def list_profiles() -> List[str]:
+    """Stored profile file names, newest first"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(('.prof', '.folded')):
+            try:
+                profiles.append((os.path.getmtime(os.path.join(PROFILE_DIR, name)), name))
+            except OSError:
+                continue
+    return [name for _, name in sorted(profiles, reverse=True)]
+
+def _requested_profiler() -> Optional[str]:
+    kind = (request.args.get('_profile') or request.headers.get('X-Profile') or '').strip().lower()
+    if not kind:
+        return None
+    return kind if kind in PROFILERS else 'cprofile'
+
+def _inline_requested() -> bool:
+    output = request.args.get('_profile_output') or request.headers.get('X-Profile-Output') or ''
+    return output.strip().lower() == 'inline'
+
+def init_profiler(app):
+    """Profile single requests on demand for admins and serve the stored profiles
+
+    Register after the other after_request handlers so the profile is finished
+    (and a streamed page fully rendered) before they run.
+    """
+    if not PROFILING_ENABLED:
+        return
+
+    from .decorators import admin_required, is_admin
+
+    @app.before_request
+    def start_request_profile():
+        kind = _requested_profiler()
+        if kind is None or not is_admin():
+            return
+        if not _profile_slot.acquire(blocking=False):
+            request.environ[ENVIRON_KEY] = None  # Another request is being profiled
+            return
+        profile = RequestProfile(kind, _inline_requested())
+        request.environ[ENVIRON_KEY] = profile
+        profile.start()
+
+    @app.after_request
+    def finish_request_profile(response):
+        if ENVIRON_KEY not in request.environ:
+            return response
+        profile = request.environ.pop(ENVIRON_KEY)
+        if profile is None:
+            response.headers['X-Profile'] = 'busy'
+            return response
+
+        try:
+            if response.is_streamed:
+                # Render the rest of a streamed page now, so it is part of the profile
+                response.get_data()
+        finally:
+            profile.stop()
+            _profile_slot.release()
+
+        filename = profile.save()
+        logger.info(f"Profiled {request.method} {request.path} ({profile.kind}, {profile.elapsed * 1000:.1f}ms)"
+                    f" -> {filename}")
+        if profile.inline:
+            response = Response(profile.report(), mimetype='text/plain')
+        if filename:
+            response.headers['X-Profile'] = f"/admin/profiles/{filename}"
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    @app.teardown_request
+    def release_profile_slot(exc):
+        # The request failed before after_request ran; don't leave the profiler running
+        profile = request.environ.pop(ENVIRON_KEY, None)
+        if profile is not None:
+            profile.stop()
+            _profile_slot.release()
+
+    @app.route('/admin/profiles')
+    @admin_required
+    def admin_profiles():
+        profiles = []
+        for filename in list_profiles():
+            path = os.path.join(PROFILE_DIR, filename)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            profiles.append({'name': filename, 'size': size, 'url': f"/admin/profiles/{filename}"})
+        return jsonify({'profiles': profiles})
+
+    @app.route('/admin/profiles/<filename>')
+    @admin_required
+    def admin_profile_download(filename):
+        if filename not in list_profiles():
+            abort(404)
+        mimetype = 'application/octet-stream' if filename.endswith('.prof') else 'text/plain'
+        return send_from_directory(PROFILE_DIR, filename, mimetype=mimetype, as_attachment=True)
+
+    logger.info(f"Request profiling enabled for admins (profiles in {PROFILE_DIR})")
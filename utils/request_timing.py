@@ -0,0 +1,160 @@
+"""
+Request timing
+Records how long each request spends in named phases and reports it:
+
+    with span('storage'):
+        calendar = load_calendar(...)
+
+    @timed('counting')
+    def calculate_department_counts(calendar_data): ...
+
+Phases used across the app: storage (file reads), generation (calendar days),
+counting (department/location counts), sun (sun times), render (templates) and
+write (file writes). Each response gets a Server-Timing header, visible in the
+browser's network panel, and requests slower than SLOW_REQUEST_MS are logged
+with their breakdown. Outside a request, span() and timed() do nothing.
+"""
+
+import os
+import time
+import logging
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+from flask import before_render_template, has_request_context, request, template_rendered
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMING = os.environ.get('REQUEST_TIMING', '1') not in ('0', 'false', 'no')
+SERVER_TIMING_HEADER = os.environ.get('SERVER_TIMING_HEADER', '1') not in ('0', 'false', 'no')
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 500))
+
+# Called as listener(method, blueprint, endpoint, status, timings) once a response is sent
+_request_listeners: List[Callable] = []
+
+# Kept in the WSGI environ rather than flask.g: a streamed template renders after
+# the view returns, in a fresh app context but with the same request
+ENVIRON_KEY = 'app.request_timings'
+
+
+class RequestTimings:
+    """Phase durations for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}  # name -> [seconds, count]
+        self.active: Dict[str, int] = {}
+        self.render_starts: List[float] = []
+
+    def add(self, name: str, seconds: float):
+        phase = self.phases.setdefault(name, [0.0, 0])
+        phase[0] += seconds
+        phase[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header_value(self, total: Optional[float] = None) -> str:
+        """Server-Timing value, e.g. 'storage;dur=4.1, render;dur=12.0, total;dur=18.3'"""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, (seconds, _) in self.phases.items()]
+        entries.append(f"total;dur={(self.elapsed() if total is None else total) * 1000:.1f}")
+        return ', '.join(entries)
+
+    def summary(self) -> str:
+        """Log-friendly breakdown, e.g. 'storage=4.1ms(3) render=12.0ms(1)'"""
+        return ' '.join(f"{name}={seconds * 1000:.1f}ms({count})" for name, (seconds, count) in self.phases.items())
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """Timings of the current request, or None outside a (timed) request"""
+    if not has_request_context():
+        return None
+    return request.environ.get(ENVIRON_KEY)
+
+@contextmanager
+def span(name: str):
+    """Time the enclosed block as part of phase name
+
+    Nested spans of the same phase are counted once (by the outermost span), so
+    helpers that call each other don't double their phase's time.
+    """
+    timings = current_timings()
+    if timings is None or timings.active.get(name):
+        yield
+        return
+
+    timings.active[name] = 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+        timings.active[name] = 0
+
+def timed(name: str) -> Callable:
+    """Decorator: time every call of the function as part of phase name"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def add_request_listener(listener: Callable):
+    """Call listener(method, blueprint, endpoint, status, timings) after every timed request"""
+    _request_listeners.append(listener)
+
+def _request_finished(method: str, path: str, blueprint: Optional[str], endpoint: Optional[str],
+                      status: int, timings: RequestTimings):
+    elapsed_ms = timings.elapsed() * 1000
+    if elapsed_ms >= SLOW_REQUEST_MS:
+        logger.warning(f"Slow request {method} {path} {status} {elapsed_ms:.1f}ms: {timings.summary() or 'no phases recorded'}")
+    for listener in _request_listeners:
+        try:
+            listener(method, blueprint, endpoint, status, timings)
+        except Exception as e:
+            logger.error(f"Request listener {getattr(listener, '__name__', listener)} failed: {e}")
+
+def init_request_timing(app):
+    """Time every request, add Server-Timing headers and log slow requests
+
+    Register before other after_request handlers (such as compression) so their
+    work is included in the total.
+    """
+    if not REQUEST_TIMING:
+        return
+
+    @app.before_request
+    def start_request_timing():
+        request.environ[ENVIRON_KEY] = RequestTimings()
+
+    @app.after_request
+    def finish_request_timing(response):
+        timings = current_timings()
+        if timings is None:
+            return response
+
+        if SERVER_TIMING_HEADER:
+            # A streamed body is still to be rendered; its header covers the work done so far
+            response.headers['Server-Timing'] = timings.header_value()
+
+        # Report once the body has been sent, so streamed rendering is included
+        details = (request.method, request.path, request.blueprint, request.endpoint, response.status_code)
+        response.call_on_close(lambda: _request_finished(*details, timings))
+        return response
+
+    def on_render_start(sender, template, context, **extra):
+        timings = current_timings()
+        if timings is not None:
+            timings.render_starts.append(time.perf_counter())
+
+    def on_render_end(sender, template, context, **extra):
+        timings = current_timings()
+        if timings is not None and timings.render_starts:
+            timings.add('render', time.perf_counter() - timings.render_starts.pop())
+
+    before_render_template.connect(on_render_start, app, weak=False)
+    template_rendered.connect(on_render_end, app, weak=False)
+    logger.info(f"Request timing enabled (slow request threshold {SLOW_REQUEST_MS:.0f}ms)")
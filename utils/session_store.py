@@ -0,0 +1,391 @@
+"""
+Server-side sessions
+Optional replacement for Flask's signed-cookie session: the cookie carries only a
+random session id and the session data lives in SQLite or in one file per session
+under data/. Because the data no longer travels with every request, the session
+can also cache what authorization needs - the user record and the ids of the
+projects the user owns - so checks are dict lookups instead of file reads.
+
+SESSION_BACKEND=cookie (default) keeps Flask's built-in session.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import secrets
+import sqlite3
+import threading
+from typing import Dict, Optional, Set
+
+from flask import session
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+from .file_utils import save_json_file_atomic
+from .helpers import DATA_DIR, get_user_projects_dir
+from .user_helpers import get_user_store
+
+logger = logging.getLogger(__name__)
+
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'cookie').strip().lower()
+SESSION_DB_FILE = os.environ.get('SESSION_DB_FILE', os.path.join(DATA_DIR, 'sessions.db'))
+SESSION_DIR = os.environ.get('SESSION_DIR', os.path.join(DATA_DIR, 'sessions'))
+# An unchanged session is re-stored (to push back its expiry) at most this often
+SESSION_TOUCH_INTERVAL = int(os.environ.get('SESSION_TOUCH_INTERVAL', 3600))
+SESSION_CLEANUP_INTERVAL = int(os.environ.get('SESSION_CLEANUP_INTERVAL', 3600))
+
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{43}$')
+AUTH_CACHE_KEY = '_auth'
+
+
+def _storage_key(sid: str) -> str:
+    """Stored sessions are keyed by a hash, so a leaked store holds no usable ids"""
+    return hashlib.sha256(sid.encode('ascii')).hexdigest()
+
+
+class SQLiteSessionBackend:
+    """Sessions in a SQLite table, shared by every worker process"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        if not self._initialized:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, "
+                "data TEXT NOT NULL, "
+                "expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def get(self, key: str) -> Optional[tuple]:
+        """(serialized data, expires_at) for a live session, or None"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT data, expires_at FROM sessions WHERE id = ? AND expires_at > ?",
+                    (key, time.time())
+                ).fetchone()
+            finally:
+                conn.close()
+        return tuple(row) if row else None
+
+    def set(self, key: str, data: str, expires_at: float):
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)",
+                    (key, data, expires_at)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def delete(self, key: str):
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM sessions WHERE id = ?", (key,))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def cleanup(self) -> int:
+        """Remove expired sessions; returns how many were removed"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                removed = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+        return removed
+
+
+class FileSystemSessionBackend:
+    """Sessions as one JSON file each, written atomically"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[tuple]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return None
+        if stored.get('expires_at', 0) <= time.time():
+            return None
+        return stored['data'], stored['expires_at']
+
+    def set(self, key: str, data: str, expires_at: float):
+        if not save_json_file_atomic(self._path(key), {'data': data, 'expires_at': expires_at}):
+            raise OSError(f"Could not write session file {self._path(key)}")
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def cleanup(self) -> int:
+        removed = 0
+        now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            if not name.endswith('.json') or name.startswith('.tmp-'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    expired = json.load(f).get('expires_at', 0) <= now
+                if expired:
+                    os.remove(path)
+                    removed += 1
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable session file {name}: {e}")
+        return removed
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict identified by sid; tracks access and changes like Flask's cookie session"""
+
+    def __init__(self, initial=None, sid: Optional[str] = None, expires_at: Optional[float] = None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = sid is None
+        self.expires_at = expires_at
+        # The user the session was loaded for; a login or logout issues a new id
+        self.loaded_user_id = (initial or {}).get('user_id')
+        self.modified = False
+        self.accessed = False
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps session data in a backend; the cookie holds only the session id"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._last_cleanup = 0.0
+
+    def open_session(self, app, request) -> ServerSideSession:
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and SESSION_ID_PATTERN.match(sid):
+            try:
+                stored = self.backend.get(_storage_key(sid))
+                if stored:
+                    data, expires_at = stored
+                    return ServerSideSession(session_json_serializer.loads(data), sid=sid, expires_at=expires_at)
+            except Exception as e:
+                logger.error(f"Error loading session: {e}")
+        return ServerSideSession()
+
+    def save_session(self, app, session: ServerSideSession, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.modified and session.sid:
+                self._delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app))
+            return
+
+        now = time.time()
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        if session.sid and session.get('user_id') != session.loaded_user_id:
+            # Don't carry a session id across a change of identity (session fixation)
+            self._delete(session.sid)
+            session.sid = None
+        stale = session.expires_at is None or session.expires_at - now < lifetime - SESSION_TOUCH_INTERVAL
+        if session.sid is None or session.modified or stale:
+            session.sid = session.sid or secrets.token_urlsafe(32)
+            try:
+                self.backend.set(_storage_key(session.sid), session_json_serializer.dumps(dict(session)), now + lifetime)
+            except Exception as e:
+                logger.error(f"Error saving session: {e}")
+                return
+            self._maybe_cleanup(now)
+
+        if self.should_set_cookie(app, session):
+            response.set_cookie(
+                name, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain, path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
+
+    def _delete(self, sid: str):
+        try:
+            self.backend.delete(_storage_key(sid))
+        except Exception as e:
+            logger.error(f"Error deleting session: {e}")
+
+    def _maybe_cleanup(self, now: float):
+        if now - self._last_cleanup < SESSION_CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now
+        try:
+            removed = self.backend.cleanup()
+            if removed:
+                logger.info(f"Removed {removed} expired sessions")
+        except Exception as e:
+            logger.error(f"Error removing expired sessions: {e}")
+
+
+def init_session_store(app):
+    """Install the server-side session interface chosen by SESSION_BACKEND
+
+    Returns:
+        The backend, or None when the default cookie session is kept
+    """
+    if SESSION_BACKEND in ('', 'cookie'):
+        return None
+    if SESSION_BACKEND == 'sqlite':
+        backend = SQLiteSessionBackend(SESSION_DB_FILE)
+    elif SESSION_BACKEND == 'filesystem':
+        os.makedirs(SESSION_DIR, exist_ok=True)
+        backend = FileSystemSessionBackend(SESSION_DIR)
+    else:
+        logger.error(f"Unknown SESSION_BACKEND '{SESSION_BACKEND}', keeping cookie sessions")
+        return None
+
+    app.session_interface = ServerSideSessionInterface(backend)
+    logger.info(f"Server-side sessions enabled ({SESSION_BACKEND})")
+    return backend
+
+
+# --- Authorization cache ---
+
+def _auth_cache() -> Optional[Dict]:
+    """The session's authorization cache, or None with cookie sessions (kept out of the cookie)"""
+    if not isinstance(session._get_current_object(), ServerSideSession):
+        return None
+    cache = session.get(AUTH_CACHE_KEY)
+    if not cache or cache.get('user_id') != session.get('user_id'):
+        cache = {'user_id': session.get('user_id')}
+    return cache
+
+def _store_auth_cache(cache: Dict):
+    # Reassign so the session sees the change and is saved
+    session[AUTH_CACHE_KEY] = cache
+
+def _projects_revision(user_id: str) -> Optional[int]:
+    """Changes when a project directory is added or removed"""
+    try:
+        return os.stat(get_user_projects_dir(user_id)).st_mtime_ns
+    except OSError:
+        return None
+
+def current_user() -> Optional[Dict]:
+    """The logged-in user's record, or None if not logged in (or the account is gone)
+
+    With a server-side session the record is kept in the session until users.json changes.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+
+    store = get_user_store()
+    cache = _auth_cache()
+    if cache is None:
+        return store.get(user_id)
+
+    revision = list(store.revision() or ())
+    if cache.get('users_revision') != revision:
+        user = store.get(user_id)
+        if user is not None:
+            # The session store is not the place for password hashes
+            user.pop('password_hash', None)
+        cache = dict(cache, users_revision=revision, user=user)
+        _store_auth_cache(cache)
+    return cache.get('user')
+
+def accessible_project_ids(user_id: Optional[str] = None) -> Set[str]:
+    """Ids of the projects the logged-in user owns
+
+    With a server-side session the list is kept in the session and re-read only
+    when the user's projects directory changes.
+    """
+    user_id = user_id or session.get('user_id')
+    if not user_id:
+        return set()
+
+    cache = _auth_cache() if user_id == session.get('user_id') else None
+    revision = _projects_revision(user_id)
+    if cache is not None and revision is not None and cache.get('projects_revision') == revision:
+        return set(cache.get('project_ids', ()))
+
+    try:
+        project_ids = sorted(
+            name for name in os.listdir(get_user_projects_dir(user_id))
+            if os.path.isfile(os.path.join(get_user_projects_dir(user_id), name, 'main.json'))
+        )
+    except FileNotFoundError:
+        project_ids = []
+    except OSError as e:
+        logger.error(f"Error listing projects for user {user_id}: {e}")
+        return set()
+
+    if cache is not None:
+        _store_auth_cache(dict(cache, projects_revision=revision, project_ids=project_ids))
+    return set(project_ids)
+
+def owns_project(project_id: str) -> bool:
+    """True if project_id is one of the logged-in user's projects"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return False
+    if _auth_cache() is None:
+        # Nothing to cache into; one stat beats listing every project
+        return os.path.isfile(os.path.join(get_user_projects_dir(user_id), project_id, 'main.json'))
+    return project_id in accessible_project_ids(user_id)
+
+def grant_public_access(method: str, code: str = ''):
+    """Record public access to a project (via shareable link or access code)"""
+    session['public_access'] = True
+    session['access_method'] = method
+    session['access_code'] = code
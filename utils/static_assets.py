@@ -0,0 +1,111 @@
+"""
+Fingerprinted static assets
+url_for('static', filename='css/app.css') becomes /static/css/app.<hash>.css, and
+fingerprinted URLs are served with far-future immutable cache headers. No build
+step: hashes are computed from file contents on first use and cached in memory.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from flask import send_from_directory, abort
+from werkzeug.security import safe_join
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_LENGTH = 12
+FINGERPRINT_PATTERN = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)$' % FINGERPRINT_LENGTH)
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Unfingerprinted URLs (hard-coded paths, CSS @imports) still revalidate cheaply
+DEFAULT_CACHE_CONTROL = 'public, no-cache'
+
+
+class AssetManifest:
+    """Maps static filenames to content fingerprints
+
+    Args:
+        static_folder: Absolute path of the static directory
+        revalidate: Re-hash files whose mtime/size changed (useful in debug mode)
+    """
+
+    def __init__(self, static_folder: str, revalidate: bool = False):
+        self.static_folder = static_folder
+        self.revalidate = revalidate
+        self._entries: Dict[str, Tuple[int, int, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, filename: str) -> Optional[str]:
+        """Content hash of a static file, or None if it does not exist"""
+        entry = self._entries.get(filename)
+        if entry is not None and not self.revalidate:
+            return entry[2]
+
+        path = self._path(filename)
+        if not path:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+            return entry[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                digest.update(chunk)
+        fingerprint = digest.hexdigest()[:FINGERPRINT_LENGTH]
+        with self._lock:
+            self._entries[filename] = (stat.st_mtime_ns, stat.st_size, fingerprint)
+        return fingerprint
+
+    def _path(self, filename: str) -> Optional[str]:
+        """Absolute path inside the static folder, or None if the name escapes it"""
+        return safe_join(self.static_folder, filename)
+
+    def fingerprinted_name(self, filename: str) -> str:
+        """'css/app.css' -> 'css/app.<hash>.css' (unchanged if the file is missing)"""
+        fingerprint = self.fingerprint(filename)
+        if not fingerprint:
+            return filename
+        stem, ext = os.path.splitext(filename)
+        return f"{stem}.{fingerprint}{ext}"
+
+    def resolve(self, requested: str) -> Tuple[str, bool]:
+        """Map a requested static path to (real filename, is current fingerprint)"""
+        match = FINGERPRINT_PATTERN.match(requested)
+        if match:
+            filename = match.group('stem') + match.group('ext')
+            path = self._path(filename)
+            if path and os.path.isfile(path):
+                return filename, self.fingerprint(filename) == match.group('hash')
+        return requested, False
+
+    def send(self, requested: str):
+        """Serve a static file; current fingerprinted URLs are cached forever"""
+        filename, immutable = self.resolve(requested)
+        path = self._path(filename)
+        if not path or not os.path.isfile(path):
+            abort(404)
+        response = send_from_directory(self.static_folder, filename, max_age=0)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else DEFAULT_CACHE_CONTROL
+        return response
+
+
+def init_static_assets(app) -> AssetManifest:
+    """Fingerprint url_for('static', ...) URLs and serve them with immutable caching"""
+    manifest = AssetManifest(app.static_folder, revalidate=app.debug)
+
+    @app.url_defaults
+    def fingerprint_static_urls(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = manifest.fingerprinted_name(values['filename'])
+
+    app.view_functions['static'] = lambda filename: manifest.send(filename)
+    app.extensions['static_assets'] = manifest
+    return manifest
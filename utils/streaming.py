@@ -0,0 +1,54 @@
+"""
+Streaming template responses
+Long pages (full calendars) are sent as they render, so the header and first
+months reach the browser before the last rows are built
+"""
+
+import os
+import logging
+from typing import Iterable, Iterator
+
+from flask import Response, render_template, session, stream_template
+
+logger = logging.getLogger(__name__)
+
+STREAM_TEMPLATES = os.environ.get('STREAM_TEMPLATES', '1') not in ('0', 'false', 'no')
+# Jinja yields many tiny strings; group them so each write carries useful data
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 16384))
+
+
+def buffered(chunks: Iterable[str], size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+    """Join small string chunks into pieces of at least size characters"""
+    pending, pending_size = [], 0
+    try:
+        for chunk in chunks:
+            pending.append(chunk)
+            pending_size += len(chunk)
+            if pending_size >= size:
+                yield ''.join(pending)
+                pending, pending_size = [], 0
+        if pending:
+            yield ''.join(pending)
+    except Exception as e:
+        # Headers are already sent, so the error page can't be shown; end the page instead
+        logger.exception(f"Error while streaming template: {e}")
+        yield ''.join(pending)
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+def render_streamed(template_name: str, **context) -> Response:
+    """render_template, streamed when enabled
+
+    Falls back to a normal render while flash messages are pending: base.html
+    pops them from the session during rendering, and a streamed response has
+    already sent its session cookie by then.
+    """
+    if not STREAM_TEMPLATES or session.get('_flashes'):
+        return render_template(template_name, **context)
+
+    response = Response(buffered(stream_template(template_name, **context)), mimetype='text/html')
+    # Stop reverse proxies (nginx) from holding the stream back until it completes
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -4,7 +4,7 @@ Uses native Python astral library for fast, accurate calculations with caching
 """
 
 import os
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from typing import Optional, Dict, Any
 import logging
 import pytz
@@ -15,6 +15,79 @@ logger = logging.getLogger(__name__)
 
 # Cache for repeated calculations - stores results for same date/location
 _sun_times_cache = {}
+# Lookup counters for monitoring (approximate under concurrency; never reset)
+_sun_cache_hits = 0
+_sun_cache_misses = 0
+
+# All displayed times are local to the production base
+DUBLIN_TZ = pytz.timezone('Europe/Dublin')
+
+def _calculate_sun_events(latitude: float, longitude: float, date_input: datetime) -> Optional[Dict[str, str]]:
+    """
+    Evaluate astral's sun() once for a date/location and format every event we use
+
+    Both the basic and enhanced lookups read from this result, so a day only ever
+    costs one astral evaluation regardless of how many columns are displayed.
+
+    Args:
+        latitude: Latitude in decimal degrees (-90 to 90)
+        longitude: Longitude in decimal degrees (-180 to 180)
+        date_input: Date for calculation (datetime or date object)
+
+    Returns:
+        Dictionary with sunrise, sunset, dawn, dusk, solar noon and golden hour
+        times in HH:MM format (Dublin timezone), or None if calculation fails
+    """
+    # Validate coordinates
+    if not (-90 <= latitude <= 90):
+        logger.error(f"Invalid latitude: {latitude}. Must be between -90 and 90")
+        return None
+
+    if not (-180 <= longitude <= 180):
+        logger.error(f"Invalid longitude: {longitude}. Must be between -180 and 180")
+        return None
+
+    # Single cache key shared by basic and enhanced lookups
+    date_str = date_input.strftime('%Y-%m-%d')
+    cache_key = f"{latitude:.4f},{longitude:.4f},{date_str}"
+
+    # Check cache first
+    global _sun_cache_hits, _sun_cache_misses
+    cached = _sun_times_cache.get(cache_key)
+    if cached is not None:
+        _sun_cache_hits += 1
+        logger.debug(f"Using cached sun times for {cache_key}")
+        return cached
+    _sun_cache_misses += 1
+
+    # Set up location and timezone
+    location = LocationInfo(latitude=latitude, longitude=longitude)
+
+    # Convert datetime to date if needed
+    calculation_date = date_input.date() if isinstance(date_input, datetime) else date_input
+
+    # Calculate all sun times in one pass
+    sun_times = sun(location.observer, date=calculation_date, tzinfo=DUBLIN_TZ)
+
+    # Golden hour is approximated as the hour after sunrise and the hour before sunset
+    golden_hour_morning_end = sun_times['sunrise'] + timedelta(hours=1)
+    golden_hour_evening_start = sun_times['sunset'] - timedelta(hours=1)
+
+    result = {
+        'sunrise': sun_times['sunrise'].strftime('%H:%M'),
+        'sunset': sun_times['sunset'].strftime('%H:%M'),
+        'dawn': sun_times['dawn'].strftime('%H:%M'),
+        'dusk': sun_times['dusk'].strftime('%H:%M'),
+        'solar_noon': sun_times['noon'].strftime('%H:%M'),
+        'golden_hour_morning_end': golden_hour_morning_end.strftime('%H:%M'),
+        'golden_hour_evening_start': golden_hour_evening_start.strftime('%H:%M')
+    }
+
+    # Cache the result
+    _sun_times_cache[cache_key] = result
+    logger.debug(f"Calculated sun times for {cache_key}: {result}")
+
+    return result
 
 def get_sun_times(latitude: float, longitude: float, date_input: datetime) -> Optional[Dict[str, str]]:
     """
@@ -30,48 +103,14 @@ def get_sun_times(latitude: float, longitude: float, date_input: datetime) -> Op
         Returns None if calculation fails
     """
     try:
-        # Validate coordinates
-        if not (-90 <= latitude <= 90):
-            logger.error(f"Invalid latitude: {latitude}. Must be between -90 and 90")
+        events = _calculate_sun_events(latitude, longitude, date_input)
+        if not events:
             return None
-            
-        if not (-180 <= longitude <= 180):
-            logger.error(f"Invalid longitude: {longitude}. Must be between -180 and 180")
-            return None
-        
-        # Create cache key
-        date_str = date_input.strftime('%Y-%m-%d')
-        cache_key = f"{latitude:.4f},{longitude:.4f},{date_str}"
-        
-        # Check cache first
-        if cache_key in _sun_times_cache:
-            logger.debug(f"Using cached sun times for {cache_key}")
-            return _sun_times_cache[cache_key]
-        
-        # Set up location and timezone
-        dublin_tz = pytz.timezone('Europe/Dublin')
-        location = LocationInfo(latitude=latitude, longitude=longitude)
-        
-        # Convert datetime to date if needed
-        if isinstance(date_input, datetime):
-            calculation_date = date_input.date()
-        else:
-            calculation_date = date_input
-        
-        # Calculate sun times for the date
-        sun_times = sun(location.observer, date=calculation_date, tzinfo=dublin_tz)
-        
-        # Format times as HH:MM strings
-        result = {
-            'sunrise': sun_times['sunrise'].strftime('%H:%M'),
-            'sunset': sun_times['sunset'].strftime('%H:%M')
+
+        return {
+            'sunrise': events['sunrise'],
+            'sunset': events['sunset']
         }
-        
-        # Cache the result
-        _sun_times_cache[cache_key] = result
-        logger.debug(f"Calculated sun times for {cache_key}: {result}")
-        
-        return result
                 
     except Exception as e:
         logger.error(f"Error calculating sun times for lat={latitude}, lng={longitude}, date={date_input}: {str(e)}")
@@ -116,6 +155,28 @@ def format_sun_times_display(sun_times: Optional[Dict[str, str]]) -> str:
         
     return f"{sun_times['sunrise']} - {sun_times['sunset']}"
 
+def format_sun_details(sun_times: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    """
+    Format enhanced sun times for storage on a calendar day
+    
+    Args:
+        sun_times: Dictionary from get_enhanced_sun_times
+        
+    Returns:
+        Dictionary with dawn, dusk, solar noon and golden hour windows using the
+        camelCase keys of the day JSON, or None if enhanced times are missing
+    """
+    if not sun_times or not sun_times.get('dawn'):
+        return None
+        
+    return {
+        'dawn': sun_times['dawn'],
+        'dusk': sun_times['dusk'],
+        'solarNoon': sun_times['solar_noon'],
+        'goldenHourMorning': f"{sun_times['sunrise']} - {sun_times['golden_hour_morning_end']}",
+        'goldenHourEvening': f"{sun_times['golden_hour_evening_start']} - {sun_times['sunset']}"
+    }
+
 def get_enhanced_sun_times(latitude: float, longitude: float, date_input: datetime) -> Optional[Dict[str, str]]:
     """
     Calculate enhanced sun times including golden hour information
@@ -130,56 +191,37 @@ def get_enhanced_sun_times(latitude: float, longitude: float, date_input: dateti
         Returns None if calculation fails
     """
     try:
-        # Validate coordinates
-        if not (-90 <= latitude <= 90) or not (-180 <= longitude <= 180):
-            return None
-        
-        # Create cache key for enhanced times
-        date_str = date_input.strftime('%Y-%m-%d')
-        cache_key = f"enhanced_{latitude:.4f},{longitude:.4f},{date_str}"
-        
-        # Check cache first
-        if cache_key in _sun_times_cache:
-            return _sun_times_cache[cache_key]
-        
-        # Set up location and timezone
-        dublin_tz = pytz.timezone('Europe/Dublin')
-        location = LocationInfo(latitude=latitude, longitude=longitude)
-        
-        # Convert datetime to date if needed
-        calculation_date = date_input.date() if isinstance(date_input, datetime) else date_input
-        
-        # Calculate all sun times
-        sun_times = sun(location.observer, date=calculation_date, tzinfo=dublin_tz)
-        
-        # Format enhanced times
-        result = {
-            'sunrise': sun_times['sunrise'].strftime('%H:%M'),
-            'sunset': sun_times['sunset'].strftime('%H:%M'),
-            'dawn': sun_times['dawn'].strftime('%H:%M'),
-            'dusk': sun_times['dusk'].strftime('%H:%M'),
-            'solar_noon': sun_times['noon'].strftime('%H:%M')
-        }
-        
-        # Calculate golden hour times (approximately 1 hour after sunrise and 1 hour before sunset)
-        from datetime import timedelta
-        golden_hour_morning = sun_times['sunrise'] + timedelta(hours=1)
-        golden_hour_evening = sun_times['sunset'] - timedelta(hours=1)
-        
-        result.update({
-            'golden_hour_morning_end': golden_hour_morning.strftime('%H:%M'),
-            'golden_hour_evening_start': golden_hour_evening.strftime('%H:%M')
-        })
-        
-        # Cache the result
-        _sun_times_cache[cache_key] = result
-        
-        return result
+        events = _calculate_sun_events(latitude, longitude, date_input)
+        return dict(events) if events else None
                 
     except Exception as e:
         logger.error(f"Error calculating enhanced sun times: {str(e)}")
         return None
 
+def get_enhanced_sun_times_for_location(location_data: Dict[str, Any], date_input: datetime) -> Optional[Dict[str, str]]:
+    """
+    Calculate enhanced sun times for a location with coordinate data
+    
+    Args:
+        location_data: Location dictionary with 'latitude' and 'longitude' keys
+        date_input: Date for calculation
+        
+    Returns:
+        Dictionary with sunrise, sunset, dawn, dusk, solar noon and golden hour times
+        Returns None if location has no coordinates or calculation fails
+    """
+    if not location_data:
+        return None
+        
+    latitude = location_data.get('latitude')
+    longitude = location_data.get('longitude')
+    
+    if latitude is None or longitude is None:
+        logger.debug(f"Location '{location_data.get('name', 'Unknown')}' has no coordinates")
+        return None
+        
+    return get_enhanced_sun_times(latitude, longitude, date_input)
+
 def clear_sun_times_cache():
     """Clear the sun times cache - useful for memory management"""
     global _sun_times_cache
@@ -190,6 +232,10 @@ def get_cache_size():
     """Get current cache size for monitoring"""
     return len(_sun_times_cache)
 
+def get_cache_stats() -> Dict[str, int]:
+    """Sun times cache size and lookup counters for monitoring"""
+    return {'entries': len(_sun_times_cache), 'hits': _sun_cache_hits, 'misses': _sun_cache_misses}
+
 def validate_sun_calculation_requirements() -> tuple[bool, str]:
     """
     Check if system has requirements for sun calculations
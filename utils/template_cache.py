@@ -0,0 +1,132 @@
+"""
+Template caching
+- A filesystem bytecode cache so workers load compiled templates instead of
+  recompiling them on every start
+- A {% cache %} tag that stores rendered fragments in memory:
+
+    {% cache 'counters', project.id, current_version_id, calendar_revision, reference_version %}
+        ... expensive markup ...
+    {% endcache %}
+
+  The key parts must change whenever the fragment's output would; use
+  revision_of() for calendar files and reference_data_version() for the shared
+  department/location/area definitions.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from jinja2 import FileSystemBytecodeCache, nodes, Undefined
+from jinja2.ext import Extension
+
+from .helpers import DATA_DIR
+from .http_cache import file_signature, make_etag
+
+logger = logging.getLogger(__name__)
+
+JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR', os.path.join(DATA_DIR, 'cache', 'jinja'))
+TEMPLATE_FRAGMENT_CACHE_SIZE = int(os.environ.get('TEMPLATE_FRAGMENT_CACHE_SIZE', 512))
+
+REFERENCE_DATA_FILES = ('departments.json', 'locations.json', 'areas.json')
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered template fragments"""
+
+    def __init__(self, max_entries: int = TEMPLATE_FRAGMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class FragmentCacheExtension(Extension):
+    """Adds {% cache key, ... %}...{% endcache %}
+
+    Rendering is skipped on a hit. If the environment has no fragment_cache, or a
+    key part is undefined (the view didn't pass it), the body is rendered as usual.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_cached', [nodes.List(parts)]), [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None or any(isinstance(part, Undefined) for part in parts):
+            return caller()
+
+        key = make_etag(*parts)
+        value = cache.get(key)
+        if value is None:
+            value = caller()
+            cache.set(key, value)
+        return value
+
+
+def revision_of(paths: Iterable[str]) -> str:
+    """Cache key part that changes whenever any of the files does"""
+    return make_etag(file_signature(paths))
+
+def reference_data_version() -> str:
+    """Cache key part for the shared department/location/area definitions"""
+    return revision_of(os.path.join(DATA_DIR, name) for name in REFERENCE_DATA_FILES)
+
+def init_template_cache(app):
+    """Enable the Jinja bytecode cache and the {% cache %} fragment tag
+
+    Fragment caching is off in debug mode, where templates are edited in place.
+    Set TEMPLATE_FRAGMENT_CACHE=0 to disable it elsewhere.
+    """
+    try:
+        os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_BYTECODE_CACHE_DIR)
+    except OSError as e:
+        logger.error(f"Jinja bytecode cache disabled, cannot use {JINJA_BYTECODE_CACHE_DIR}: {e}")
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    default = '0' if app.debug else '1'
+    if os.environ.get('TEMPLATE_FRAGMENT_CACHE', default) not in ('0', 'false', 'no'):
+        app.jinja_env.fragment_cache = FragmentCache()
+        logger.info(f"Template fragment cache enabled ({TEMPLATE_FRAGMENT_CACHE_SIZE} entries)")
+    return app.jinja_env.fragment_cache
@@ -3,8 +3,12 @@ import os
 import json
 import uuid
 import logging
+import threading
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from typing import Dict, Optional, Tuple
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+from .file_utils import save_json_file_atomic
 
 # Define Constants relative to this file's location
 UTILS_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -16,15 +20,164 @@ USERS_DIR = os.path.join(DATA_DIR, 'users')
 # Setup logger for user helpers
 logger = logging.getLogger(__name__)
 
+# --- Password Hashing ---
+
+def _normalize_hash_method(method: str) -> str:
+    """Expand a PASSWORD_HASH_METHOD value to the full method string werkzeug stores
+
+    'pbkdf2' -> 'pbkdf2:sha256:<default iterations>', 'scrypt' -> 'scrypt:32768:8:1'.
+    Unknown or malformed values fall back to werkzeug's default.
+    """
+    default = f"pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}"
+    parts = method.strip().lower().split(':')
+    try:
+        if parts[0] == 'pbkdf2' and len(parts) <= 3:
+            digest = parts[1] if len(parts) > 1 and parts[1] else 'sha256'
+            iterations = int(parts[2]) if len(parts) > 2 else DEFAULT_PBKDF2_ITERATIONS
+            if iterations > 0:
+                return f"pbkdf2:{digest}:{iterations}"
+        elif parts[0] == 'scrypt' and len(parts) in (1, 4):
+            n, r, p = (int(v) for v in parts[1:]) if len(parts) == 4 else (2 ** 15, 8, 1)
+            if n > 1 and r > 0 and p > 0:
+                return f"scrypt:{n}:{r}:{p}"
+    except ValueError:
+        pass
+    logger.error(f"Invalid PASSWORD_HASH_METHOD '{method}', using {default}")
+    return default
+
+# Cost of new password hashes; existing hashes are upgraded on the next successful login
+PASSWORD_HASH_METHOD = _normalize_hash_method(os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2'))
+PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+
+def hash_password(password: str) -> str:
+    """Hash a password with the configured method and salt length"""
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD, salt_length=PASSWORD_SALT_LENGTH)
+
+def password_needs_rehash(password_hash: str) -> bool:
+    """True if a stored hash was made with different parameters than the configured ones"""
+    if not password_hash or '$' not in password_hash:
+        return True
+    method, salt, _ = password_hash.split('$', 2)
+    return method != PASSWORD_HASH_METHOD or len(salt) != PASSWORD_SALT_LENGTH
+
+# --- User Store ---
+
+class UserStore:
+    """users.json held in memory with username/email indexes
+
+    The file is re-read only when its mtime/size change (another worker wrote it),
+    and written atomically. Lookups are dict hits instead of scans over every user.
+    """
+
+    def __init__(self, users_file: str):
+        self.users_file = users_file
+        self._users: Dict[str, Dict] = {}
+        self._by_username: Dict[str, str] = {}
+        self._by_email: Dict[str, str] = {}
+        self._signature = None
+        self._lock = threading.RLock()
+        # Reads served from memory vs. re-read from disk
+        self.hits = 0
+        self.reloads = 0
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.users_file)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _index(self, users: Dict[str, Dict]):
+        self._users = users
+        self._by_username = {}
+        self._by_email = {}
+        for user_id, user in users.items():
+            # Keep the first match, as the old linear scans did
+            if user.get('username'):
+                self._by_username.setdefault(user['username'], user_id)
+            if user.get('email'):
+                self._by_email.setdefault(user['email'], user_id)
+
+    def users(self) -> Dict[str, Dict]:
+        """Current users, keyed by id
+
+        The returned dict is shared; callers that modify it must hold self.lock
+        and call save().
+        """
+        with self._lock:
+            signature = self._file_signature()
+            if signature == self._signature:
+                self.hits += 1
+            else:
+                self.reloads += 1
+                users = {}
+                if signature is not None:
+                    try:
+                        with open(self.users_file, 'r', encoding='utf-8') as f:
+                            users = json.load(f)
+                    except Exception as e:
+                        logger.error(f"Error loading users: {str(e)}")
+                self._index(users)
+                self._signature = signature
+            return self._users
+
+    @property
+    def lock(self) -> threading.RLock:
+        return self._lock
+
+    def revision(self) -> Optional[Tuple[int, int]]:
+        """Changes whenever users.json does; lets callers keep data derived from a user"""
+        with self._lock:
+            self.users()
+            return self._signature
+
+    def save(self, users: Dict[str, Dict]) -> bool:
+        """Atomically write users and rebuild the indexes"""
+        with self._lock:
+            if not save_json_file_atomic(self.users_file, users):
+                # In-memory changes were not persisted; reload from disk next time
+                self._signature = None
+                return False
+            self._index(users)
+            self._signature = self._file_signature()
+            return True
+
+    def id_for_username(self, username: str) -> Optional[str]:
+        self.users()
+        return self._by_username.get(username)
+
+    def id_for_email(self, email: str) -> Optional[str]:
+        self.users()
+        return self._by_email.get(email)
+
+    def get(self, user_id: Optional[str]) -> Optional[Dict]:
+        """Copy of a user record, or None"""
+        user = self.users().get(user_id) if user_id else None
+        return dict(user) if user is not None else None
+
+    def find_by_username(self, username: str) -> Optional[Dict]:
+        return self.get(self.id_for_username(username))
+
+    def find_by_email(self, email: str) -> Optional[Dict]:
+        return self.get(self.id_for_email(email))
+
+    def find_by_login(self, username_or_email: str) -> Optional[Dict]:
+        """User whose username or email matches"""
+        return self.find_by_username(username_or_email) or self.find_by_email(username_or_email)
+
+
+_user_store = UserStore(USERS_FILE)
+
+def get_user_store() -> UserStore:
+    """The process-wide user store"""
+    return _user_store
+
 # --- User Management Functions ---
 
 def load_users():
-    """Load all users from users.json"""
+    """Load all users from users.json (a copy that is safe to modify)"""
     try:
-        if os.path.exists(USERS_FILE):
-            with open(USERS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        return {user_id: dict(user) for user_id, user in _user_store.users().items()}
     except Exception as e:
         logger.error(f"Error loading users: {str(e)}")
         return {}
@@ -32,11 +185,10 @@ def load_users():
 def save_users(users):
     """Save users to users.json"""
     try:
-        os.makedirs(DATA_DIR, exist_ok=True)
-        with open(USERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(users, f, indent=2, ensure_ascii=False)
-        logger.info("Users data saved successfully")
-        return True
+        if _user_store.save(users):
+            logger.info("Users data saved successfully")
+            return True
+        return False
     except Exception as e:
         logger.error(f"Error saving users: {str(e)}")
         return False
@@ -44,41 +196,42 @@ def save_users(users):
 def create_user(username, email, password, role='admin'):
     """Create a new user account"""
     try:
-        users = load_users()
+        # Hash outside the lock; it is deliberately slow
+        password_hash = hash_password(password)
         
-        # Check if username already exists
-        for user_id, user_data in users.items():
-            if user_data.get('username') == username:
+        with _user_store.lock:
+            users = _user_store.users()
+            
+            # Check if username already exists
+            if _user_store.id_for_username(username):
                 logger.warning(f"Username already exists: {username}")
                 return None, "Username already exists"
-        
-        # Check if email already exists
-        for user_id, user_data in users.items():
-            if user_data.get('email') == email:
+            
+            # Check if email already exists
+            if _user_store.id_for_email(email):
                 logger.warning(f"Email already exists: {email}")
                 return None, "Email already exists"
-        
-        # Generate user ID and hash password
-        user_id = str(uuid.uuid4())
-        password_hash = generate_password_hash(password)
-        
-        # Create user data
-        user_data = {
-            'id': user_id,
-            'username': username,
-            'email': email,
-            'password_hash': password_hash,
-            'role': role,
-            'created': datetime.utcnow().isoformat() + 'Z',
-            'active': True
-        }
-        
-        # Add user to users dict
-        users[user_id] = user_data
-        
-        # Save users
-        if not save_users(users):
-            return None, "Failed to save user data"
+            
+            # Generate user ID
+            user_id = str(uuid.uuid4())
+            
+            # Create user data
+            user_data = {
+                'id': user_id,
+                'username': username,
+                'email': email,
+                'password_hash': password_hash,
+                'role': role,
+                'created': datetime.utcnow().isoformat() + 'Z',
+                'active': True
+            }
+            
+            # Add user to users dict
+            users[user_id] = user_data
+            
+            # Save users
+            if not save_users(users):
+                return None, "Failed to save user data"
         
         # Create user directory structure
         user_dir = os.path.join(USERS_DIR, user_id)
@@ -113,15 +266,8 @@ def create_user(username, email, password, role='admin'):
 def authenticate_user(username_or_email, password):
     """Authenticate user by username/email and password"""
     try:
-        users = load_users()
-        
         # Find user by username or email
-        user_data = None
-        for user_id, user in users.items():
-            if (user.get('username') == username_or_email or 
-                user.get('email') == username_or_email):
-                user_data = user
-                break
+        user_data = _user_store.find_by_login(username_or_email)
         
         if not user_data:
             logger.warning(f"User not found: {username_or_email}")
@@ -133,8 +279,11 @@ def authenticate_user(username_or_email, password):
             return None, "Account is inactive"
         
         # Verify password
-        if check_password_hash(user_data.get('password_hash', ''), password):
+        stored_hash = user_data.get('password_hash', '')
+        if check_password_hash(stored_hash, password):
             logger.info(f"User authenticated successfully: {user_data.get('username')}")
+            if password_needs_rehash(stored_hash):
+                _rehash_password(user_data['id'], stored_hash, password)
             return user_data, None
         else:
             logger.warning(f"Invalid password for user: {username_or_email}")
@@ -144,11 +293,29 @@ def authenticate_user(username_or_email, password):
         logger.error(f"Error authenticating user {username_or_email}: {str(e)}")
         return None, "Authentication failed"
 
+def _rehash_password(user_id, old_hash, password):
+    """Re-hash a verified password with the configured parameters
+
+    Skipped if the stored hash changed while we were hashing (a concurrent
+    password change wins). Failures are logged; the login still succeeds.
+    """
+    try:
+        new_hash = hash_password(password)
+        with _user_store.lock:
+            users = _user_store.users()
+            user = users.get(user_id)
+            if not user or user.get('password_hash') != old_hash:
+                return
+            user['password_hash'] = new_hash
+            if save_users(users):
+                logger.info(f"Password hash upgraded to {PASSWORD_HASH_METHOD} for user: {user_id}")
+    except Exception as e:
+        logger.error(f"Error re-hashing password for user {user_id}: {str(e)}")
+
 def get_user_by_id(user_id):
     """Get user data by ID"""
     try:
-        users = load_users()
-        return users.get(user_id)
+        return _user_store.get(user_id)
     except Exception as e:
         logger.error(f"Error getting user by ID {user_id}: {str(e)}")
         return None
@@ -156,11 +323,7 @@ def get_user_by_id(user_id):
 def get_user_by_username(username):
     """Get user data by username"""
     try:
-        users = load_users()
-        for user_id, user_data in users.items():
-            if user_data.get('username') == username:
-                return user_data
-        return None
+        return _user_store.find_by_username(username)
     except Exception as e:
         logger.error(f"Error getting user by username {username}: {str(e)}")
         return None
@@ -168,21 +331,23 @@ def get_user_by_username(username):
 def update_user_password(user_id, new_password):
     """Update user password"""
     try:
-        users = load_users()
-        
-        if user_id not in users:
-            return False, "User not found"
-        
-        # Hash new password
-        password_hash = generate_password_hash(new_password)
-        users[user_id]['password_hash'] = password_hash
-        users[user_id]['updated'] = datetime.utcnow().isoformat() + 'Z'
+        # Hash outside the lock; it is deliberately slow
+        password_hash = hash_password(new_password)
         
-        if save_users(users):
-            logger.info(f"Password updated for user: {user_id}")
-            return True, None
-        else:
-            return False, "Failed to save password"
+        with _user_store.lock:
+            users = _user_store.users()
+            
+            if user_id not in users:
+                return False, "User not found"
+            
+            users[user_id]['password_hash'] = password_hash
+            users[user_id]['updated'] = datetime.utcnow().isoformat() + 'Z'
+            
+            if save_users(users):
+                logger.info(f"Password updated for user: {user_id}")
+                return True, None
+            else:
+                return False, "Failed to save password"
             
     except Exception as e:
         logger.error(f"Error updating password for user {user_id}: {str(e)}")
@@ -191,25 +356,27 @@ def update_user_password(user_id, new_password):
 def update_user_profile(user_id, email=None, preferences=None):
     """Update user profile information"""
     try:
-        users = load_users()
-        
-        if user_id not in users:
-            return False, "User not found"
-        
-        # Update email if provided
-        if email:
-            # Check if email already exists for another user
-            for uid, user_data in users.items():
-                if uid != user_id and user_data.get('email') == email:
+        with _user_store.lock:
+            users = _user_store.users()
+            
+            if user_id not in users:
+                return False, "User not found"
+            
+            # Update email if provided
+            if email:
+                # Check if email already exists for another user
+                if _user_store.id_for_email(email) not in (None, user_id):
                     return False, "Email already exists"
-            users[user_id]['email'] = email
-        
-        # Update timestamp
-        users[user_id]['updated'] = datetime.utcnow().isoformat() + 'Z'
-        
-        # Save users data
-        if not save_users(users):
-            return False, "Failed to save user data"
+                users[user_id]['email'] = email
+            
+            # Update timestamp
+            users[user_id]['updated'] = datetime.utcnow().isoformat() + 'Z'
+            
+            # Save users data
+            if not save_users(users):
+                return False, "Failed to save user data"
+            username = users[user_id]['username']
+            current_email = users[user_id]['email']
         
         # Update profile file if preferences provided
         if preferences:
@@ -223,8 +390,8 @@ def update_user_profile(user_id, email=None, preferences=None):
                 else:
                     profile_data = {
                         'user_id': user_id,
-                        'username': users[user_id]['username'],
-                        'email': users[user_id]['email'],
+                        'username': username,
+                        'email': current_email,
                         'preferences': {}
                     }
                 
@@ -282,19 +449,20 @@ def initialize_user_system():
 def deactivate_user(user_id):
     """Deactivate a user account"""
     try:
-        users = load_users()
-        
-        if user_id not in users:
-            return False, "User not found"
-        
-        users[user_id]['active'] = False
-        users[user_id]['updated'] = datetime.utcnow().isoformat() + 'Z'
-        
-        if save_users(users):
-            logger.info(f"User deactivated: {user_id}")
-            return True, None
-        else:
-            return False, "Failed to save user data"
+        with _user_store.lock:
+            users = _user_store.users()
+            
+            if user_id not in users:
+                return False, "User not found"
+            
+            users[user_id]['active'] = False
+            users[user_id]['updated'] = datetime.utcnow().isoformat() + 'Z'
+            
+            if save_users(users):
+                logger.info(f"User deactivated: {user_id}")
+                return True, None
+            else:
+                return False, "Failed to save user data"
             
     except Exception as e:
         logger.error(f"Error deactivating user {user_id}: {str(e)}")
@@ -303,19 +471,20 @@ def deactivate_user(user_id):
 def activate_user(user_id):
     """Activate a user account"""
     try:
-        users = load_users()
-        
-        if user_id not in users:
-            return False, "User not found"
-        
-        users[user_id]['active'] = True
-        users[user_id]['updated'] = datetime.utcnow().isoformat() + 'Z'
-        
-        if save_users(users):
-            logger.info(f"User activated: {user_id}")
-            return True, None
-        else:
-            return False, "Failed to save user data"
+        with _user_store.lock:
+            users = _user_store.users()
+            
+            if user_id not in users:
+                return False, "User not found"
+            
+            users[user_id]['active'] = True
+            users[user_id]['updated'] = datetime.utcnow().isoformat() + 'Z'
+            
+            if save_users(users):
+                logger.info(f"User activated: {user_id}")
+                return True, None
+            else:
+                return False, "Failed to save user data"
             
     except Exception as e:
         logger.error(f"Error activating user {user_id}: {str(e)}")
@@ -324,7 +493,7 @@ def activate_user(user_id):
 def get_all_users():
     """Get all users (for admin purposes)"""
     try:
-        users = load_users()
+        users = _user_store.users()
         # Remove password hashes for security
         safe_users = {}
         for user_id, user_data in users.items():